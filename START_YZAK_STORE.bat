@@ -10,7 +10,7 @@ echo.
 cd /d "%~dp0"
 
 echo 📦 Installing packages...
-pip install fastapi uvicorn sqlalchemy pydantic python-jose[cryptography] passlib[bcrypt] python-multipart python-dotenv alembic email-validator requests
+pip install fastapi uvicorn sqlalchemy pydantic python-jose[cryptography] passlib[bcrypt] python-multipart python-dotenv alembic email-validator requests Pillow
 
 echo.
 echo 🗄️ Setting up database...
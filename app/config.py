@@ -18,6 +18,86 @@ class Settings:
     SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production")
     ALGORITHM = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES = 30
+    REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "14"))
+    AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))  # Verified access tokens kept in memory
+    AUTH_REVOCATION_SYNC_SECONDS = float(os.getenv("AUTH_REVOCATION_SYNC_SECONDS", "30"))  # How soon other workers see a logout
+    AUTH_SWEEP_INTERVAL_SECONDS = float(os.getenv("AUTH_SWEEP_INTERVAL_SECONDS", "3600"))  # How often expired tokens are deleted
+    
+    # Order group commit settings (see app/services/order_batches.py)
+    ORDER_GROUP_COMMIT = os.getenv("ORDER_GROUP_COMMIT", "False").lower() == "true"  # Batch concurrent orders into shared commits
+    ORDER_BATCH_MAX_SIZE = int(os.getenv("ORDER_BATCH_MAX_SIZE", "100"))
+    ORDER_BATCH_WAIT_MS = float(os.getenv("ORDER_BATCH_WAIT_MS", "0"))  # Extra wait for more orders before committing a batch
+    
+    # Idempotency settings (safe retries for POST /orders/)
+    IDEMPOTENCY_KEY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24"))
+    IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+    # A key still pending after this long was left by a crashed worker and can be reused - keep it above the slowest order
+    IDEMPOTENCY_PENDING_TIMEOUT_SECONDS = float(os.getenv("IDEMPOTENCY_PENDING_TIMEOUT_SECONDS", "60"))
+    
+    # Image service settings (thumbnails for Product.image_url)
+    IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "./image_cache")
+    IMAGE_CACHE_MAX_MB = int(os.getenv("IMAGE_CACHE_MAX_MB", "500"))
+    IMAGE_MAX_SOURCE_MB = int(os.getenv("IMAGE_MAX_SOURCE_MB", "15"))
+    # The only widths/heights a thumbnail can be resized to, so callers cannot ask for endless variants
+    IMAGE_SIZES = [int(size) for size in os.getenv("IMAGE_SIZES", "100,200,400,800,1200").split(",")]
+    IMAGE_PROXY_ALLOWED_HOSTS = [
+        host.strip()
+        for host in os.getenv("IMAGE_PROXY_ALLOWED_HOSTS", "images.unsplash.com").split(",")
+        if host.strip()
+    ]
+    # A remote image can change behind its URL, so proxied copies are re-fetched (and may be cached by browsers) for only this long
+    IMAGE_PROXY_MAX_AGE_SECONDS = int(os.getenv("IMAGE_PROXY_MAX_AGE_SECONDS", "3600"))
+    
+    # Cache settings (catalog aggregates and sessions, see app/services/cache.py)
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")  # memory, sqlite or redis - use sqlite/redis with several workers
+    CACHE_SQLITE_PATH = os.getenv("CACHE_SQLITE_PATH", "./cache.db")
+    CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+    CACHE_LOCAL_MAX_ENTRIES = int(os.getenv("CACHE_LOCAL_MAX_ENTRIES", "10000"))  # In-process copies per worker
+    CACHE_LOCK_SECONDS = float(os.getenv("CACHE_LOCK_SECONDS", "10"))  # Longest wait for another worker's computation
+    CACHE_POLL_SECONDS = float(os.getenv("CACHE_POLL_SECONDS", "0.5"))  # How often sqlite workers read deletes
+    SESSION_CACHE_TTL_SECONDS = float(os.getenv("SESSION_CACHE_TTL_SECONDS", "300"))
+    
+    # Catalog statistics settings
+    LOW_STOCK_THRESHOLD = int(os.getenv("LOW_STOCK_THRESHOLD", "10"))
+    STATS_CACHE_TTL_SECONDS = float(os.getenv("STATS_CACHE_TTL_SECONDS", "30"))
+    # Upper bounds (ETB) of the price ranges shown as search facets
+    PRICE_FACET_BOUNDS = [int(bound) for bound in os.getenv("PRICE_FACET_BOUNDS", "1000,2000,3000,5000").split(",")]
+    LOW_STOCK_INDEX_REFRESH_SECONDS = float(os.getenv("LOW_STOCK_INDEX_REFRESH_SECONDS", "300"))
+    
+    # Product snapshot settings (pre-rendered product pages and category listings)
+    SNAPSHOT_DIR = os.getenv("SNAPSHOT_DIR", "./snapshots")
+    SNAPSHOT_GZIP = os.getenv("SNAPSHOT_GZIP", "True").lower() == "true"  # Keep a gzipped copy in memory
+    SNAPSHOT_PAGE_SIZE = int(os.getenv("SNAPSHOT_PAGE_SIZE", "10"))  # Listing pages served from snapshots use this limit
+    SNAPSHOT_MEMORY_MAX_ENTRIES = int(os.getenv("SNAPSHOT_MEMORY_MAX_ENTRIES", "50000"))
+    SNAPSHOT_MAX_AGE_SECONDS = float(os.getenv("SNAPSHOT_MAX_AGE_SECONDS", "3600"))  # Older files are re-rendered in the background (0 = never)
+    SNAPSHOT_NOT_FOUND_SECONDS = float(os.getenv("SNAPSHOT_NOT_FOUND_SECONDS", "30"))  # How long a missing product or category is remembered
+    
+    # Live event stream settings
+    EVENTS_QUEUE_SIZE = int(os.getenv("EVENTS_QUEUE_SIZE", "100"))
+    EVENTS_HEARTBEAT_SECONDS = float(os.getenv("EVENTS_HEARTBEAT_SECONDS", "15"))
+    
+    # Shopping cart settings
+    CART_TTL_HOURS = float(os.getenv("CART_TTL_HOURS", "72"))  # Carts expire this long after their last change
+    CART_MAX_ITEMS = int(os.getenv("CART_MAX_ITEMS", "50"))
+    CART_FLUSH_SECONDS = float(os.getenv("CART_FLUSH_SECONDS", "2"))  # 0 writes every change immediately
+    CART_CACHE_MAX_CARTS = int(os.getenv("CART_CACHE_MAX_CARTS", "10000"))  # 0 disables the in-memory cache
+    CART_SNAPSHOT_MAX_AGE_SECONDS = float(os.getenv("CART_SNAPSHOT_MAX_AGE_SECONDS", "300"))
+    CART_SWEEP_INTERVAL_SECONDS = float(os.getenv("CART_SWEEP_INTERVAL_SECONDS", "300"))
+    
+    # Order archive settings (python manage.py archive-orders)
+    ORDER_ARCHIVE_DIR = os.getenv("ORDER_ARCHIVE_DIR", "./order_archive")
+    ORDER_ARCHIVE_AFTER_DAYS = float(os.getenv("ORDER_ARCHIVE_AFTER_DAYS", "90"))  # Delivered/cancelled orders older than this
+    ORDER_ARCHIVE_BATCH_SIZE = int(os.getenv("ORDER_ARCHIVE_BATCH_SIZE", "500"))
+    
+    # Request profiling settings (off unless PROFILING_ENABLED=true, see GET /profiles/)
+    PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "False").lower() == "true"
+    PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0.01"))  # Share of requests always profiled
+    # Also keep any slower request (0 = off) - this records every request, so turn it on only while looking for slow ones
+    PROFILING_SLOW_MS = float(os.getenv("PROFILING_SLOW_MS", "0"))
+    PROFILING_MAX_RECORDINGS = int(os.getenv("PROFILING_MAX_RECORDINGS", "4"))  # Requests recorded at once, others run unprofiled
+    PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "10"))  # Time between stack samples
+    PROFILING_DIR = os.getenv("PROFILING_DIR", "./profiles")
+    PROFILING_MAX_FILES = int(os.getenv("PROFILING_MAX_FILES", "200"))  # Oldest profiles are deleted first
     
     # Application settings
     APP_NAME = "E-Commerce API"
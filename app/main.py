@@ -9,15 +9,17 @@ from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 
 from .config import settings
-from .database import engine, get_db
-from .models import user, product, order  # Import all models
-from .routers import auth, products, orders
+from .database import get_db
+from .models import user, product, order, order_archive, idempotency, cart, token  # Import all models
+from .routers import auth, products, orders, images, events, carts, profiles
+from .services.carts import cart_sweeper
+from .services.snapshots import snapshot_writer
+from .services.order_batches import order_batcher
+from .services.tokens import token_sweeper
+from .services.profiling import ProfilingMiddleware
+from . import schema
 
-# Create database tables
-# This creates all the tables defined in your models
-user.Base.metadata.create_all(bind=engine)
-product.Base.metadata.create_all(bind=engine)
-order.Base.metadata.create_all(bind=engine)
+# Database tables are created and changed by migrations (python manage.py migrate)
 
 # Create FastAPI application instance
 app = FastAPI(
@@ -37,10 +39,18 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Record stack samples of some requests and of slow ones (see app/services/profiling.py)
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
 # Include routers (API endpoints)
 app.include_router(auth.router)
 app.include_router(products.router)
 app.include_router(orders.router)
+app.include_router(carts.router)
+app.include_router(images.router)
+app.include_router(events.router)
+app.include_router(profiles.router)
 
 # Serve static files
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -65,6 +75,54 @@ def health_check(db: Session = Depends(get_db)):
     except Exception as e:
         return {"status": "unhealthy", "database": "disconnected", "error": str(e)}
 
+@app.on_event("startup")
+def check_schema_version():
+    """Warn if the database has not been migrated to the latest schema"""
+    try:
+        if not schema.is_up_to_date():
+            print("⚠️ Database schema is out of date - run: python manage.py migrate")
+    except Exception as e:
+        print(f"❌ Could not check database schema: {e}")
+
+@app.on_event("startup")
+def start_cart_sweeper():
+    """Save changed carts in the background and remove expired ones"""
+    cart_sweeper.start()
+
+@app.on_event("shutdown")
+def stop_cart_sweeper():
+    """Write carts that are still only in memory before the process exits"""
+    cart_sweeper.stop()
+
+@app.on_event("startup")
+def start_token_sweeper():
+    """Delete expired revocations and refresh tokens in the background"""
+    token_sweeper.start()
+
+@app.on_event("shutdown")
+def stop_token_sweeper():
+    token_sweeper.stop()
+
+@app.on_event("startup")
+def start_snapshot_writer():
+    """Re-render product snapshots in the background as products change"""
+    snapshot_writer.start()
+
+@app.on_event("shutdown")
+def stop_snapshot_writer():
+    snapshot_writer.stop()
+
+@app.on_event("startup")
+def start_order_batcher():
+    """Group concurrent orders into shared commits when ORDER_GROUP_COMMIT is on"""
+    if settings.ORDER_GROUP_COMMIT:
+        order_batcher.start()
+
+@app.on_event("shutdown")
+def stop_order_batcher():
+    """Commit the orders still queued before the process exits"""
+    order_batcher.stop()
+
 # Create a default admin user on startup
 @app.on_event("startup")
 def create_default_admin():
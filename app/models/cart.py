@@ -0,0 +1,22 @@
+"""
+Cart model - one server-side shopping cart per user
+The cart lines are stored as one compact JSON document, since a cart is always
+read and written as a whole.
+"""
+from sqlalchemy import Column, Integer, Text, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from ..database import Base
+
+class Cart(Base):
+    """A user's cart: items with their last validated price and stock"""
+    __tablename__ = "carts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, nullable=False)
+
+    # JSON list of cart lines, see app/services/carts.py
+    items = Column(Text, nullable=False, default="[]")
+
+    # Timestamps
+    updated_at = Column(DateTime, server_default=func.now())
+    expires_at = Column(DateTime, nullable=False, index=True)  # Removed by the cart sweeper after this
@@ -0,0 +1,29 @@
+"""
+Idempotency key model - remembers the result of requests sent with an Idempotency-Key header
+"""
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, UniqueConstraint
+from sqlalchemy.sql import func
+from ..database import Base
+
+class IdempotencyKey(Base):
+    """Stored request fingerprint and serialized response for one Idempotency-Key"""
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        # A key is unique per user, so two customers can never collide
+        UniqueConstraint("user_id", "key", name="uq_idempotency_user_key"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    
+    # SHA-256 of the request body, used to reject a key reused for a different request
+    request_fingerprint = Column(String, nullable=False)
+    
+    # Stored response (empty while the first request is still running)
+    response_status = Column(Integer)
+    response_body = Column(Text)
+    
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime, nullable=False, index=True)
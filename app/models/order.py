@@ -1,7 +1,7 @@
 """
 Order models - handles customer orders and order items
 """
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 import enum
@@ -18,6 +18,11 @@ class OrderStatus(enum.Enum):
 class Order(Base):
     """Order model - represents a customer's order"""
     __tablename__ = "orders"
+    __table_args__ = (
+        # Newest-first order feeds, for everyone and per customer
+        Index("ix_orders_created_at", "created_at"),
+        Index("ix_orders_user_created", "user_id", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     order_number = Column(String, unique=True, index=True, nullable=False)
@@ -26,7 +31,7 @@ class Order(Base):
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     
     # Order details
-    total_amount = Column(Float, nullable=False)
+    total_amount_santim = Column(Integer, nullable=False)  # In santim (1 ETB = 100 santim)
     status = Column(Enum(OrderStatus), default=OrderStatus.PENDING)
     
     # Shipping information
@@ -34,9 +39,9 @@ class Order(Base):
     shipping_city = Column(String, nullable=False)
     shipping_postal_code = Column(String, nullable=False)
     
-    # Timestamps
+    # Timestamps (updated_at is set on insert too, so delta sync sees new orders)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now(), index=True)
     
     # Relationships
     user = relationship("User")  # Link to User model
@@ -49,14 +54,16 @@ class OrderItem(Base):
     id = Column(Integer, primary_key=True, index=True)
     
     # Foreign keys
-    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False, index=True)
     product_id = Column(Integer, ForeignKey("products.id"), nullable=False)
+    variant_id = Column(Integer, ForeignKey("product_variants.id"))  # Optional size/color variant
     
     # Item details
     quantity = Column(Integer, nullable=False)
-    unit_price = Column(Float, nullable=False)  # Price at time of order
-    total_price = Column(Float, nullable=False)  # quantity * unit_price
+    unit_price_santim = Column(Integer, nullable=False)  # Price at time of order, in santim
+    total_price_santim = Column(Integer, nullable=False)  # quantity * unit_price_santim
     
     # Relationships
     order = relationship("Order", back_populates="order_items")
-    product = relationship("Product")
\ No newline at end of file
+    product = relationship("Product")
+    variant = relationship("ProductVariant")
\ No newline at end of file
@@ -0,0 +1,33 @@
+"""
+Order archive models - where archived orders went, and what they sold
+The archived orders themselves live in monthly SQLite files (see
+app/services/order_archive.py). The main database only keeps these small rows,
+so lookups know which file to open and sales rollups still count old orders.
+"""
+from sqlalchemy import Column, Integer, String, DateTime, Index
+from sqlalchemy.sql import func
+from ..database import Base
+
+class ArchivedOrder(Base):
+    """Index entry for an order moved out of the orders table"""
+    __tablename__ = "archived_orders"
+    __table_args__ = (
+        # Newest-first order feeds, for everyone and per customer
+        Index("ix_archived_orders_created_at", "created_at"),
+        Index("ix_archived_orders_user_created", "user_id", "created_at"),
+    )
+
+    order_id = Column(Integer, primary_key=True, autoincrement=False)  # Same id as in the orders table
+    order_number = Column(String, unique=True, nullable=False)
+    user_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True))
+    partition = Column(String, nullable=False)  # Archive file the order is in, e.g. "2026_01"
+    archived_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)  # Delta sync reports newly archived orders
+
+class ArchivedProductSales(Base):
+    """Units sold and revenue per product from archived (delivered) orders"""
+    __tablename__ = "archived_product_sales"
+
+    product_id = Column(Integer, primary_key=True, autoincrement=False)
+    units_sold = Column(Integer, nullable=False, default=0)
+    revenue_santim = Column(Integer, nullable=False, default=0)
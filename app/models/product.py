@@ -1,7 +1,7 @@
 """
 Product model - represents products in the e-commerce store
 """
-from sqlalchemy import Column, Integer, String, Float, Text, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, Text, Boolean, DateTime, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..database import Base
@@ -15,6 +15,7 @@ class Category(Base):
     description = Column(Text)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now(), index=True)  # For delta sync
     
     # Relationship: One category can have many products
     products = relationship("Product", back_populates="category")
@@ -22,22 +23,59 @@ class Category(Base):
 class Product(Base):
     """Product model for store items"""
     __tablename__ = "products"
+    __table_args__ = (
+        # Active-product listings, and the low-stock range (stock_quantity < threshold)
+        Index("ix_products_active_stock", "is_active", "stock_quantity"),
+        # Category listings in id order, and a product's position in them (snapshot page patching)
+        Index("ix_products_category_active", "category_id", "is_active"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True, nullable=False)
     description = Column(Text)
-    price = Column(Float, nullable=False)
+    price_santim = Column(Integer, nullable=False)  # Price in santim (1 ETB = 100 santim)
     stock_quantity = Column(Integer, default=0)
     sku = Column(String, unique=True, index=True)  # Stock Keeping Unit
     is_active = Column(Boolean, default=True)
     image_url = Column(String)
     
     # Foreign key to link product to category
-    category_id = Column(Integer, ForeignKey("categories.id"))
+    category_id = Column(Integer, ForeignKey("categories.id"), index=True)
+    
+    # Timestamps (updated_at is set on insert too, so delta sync sees new products)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now(), index=True)
+    
+    # Relationship: Each product belongs to one category
+    category = relationship("Category", back_populates="products")
+    
+    # Relationship: One product can have many size/color variants
+    variants = relationship("ProductVariant", back_populates="product")
+
+class ProductVariant(Base):
+    """ProductVariant model - one size/color combination of a product with its own SKU and stock"""
+    __tablename__ = "product_variants"
+    __table_args__ = (
+        UniqueConstraint("product_id", "size", "color", name="uq_variant_product_size_color"),
+        # Faceted filters find matching variants first, then their products
+        Index("ix_variants_size_color_product", "size", "color", "product_id"),
+        Index("ix_variants_color_product", "color", "product_id"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), nullable=False, index=True)
+    
+    # Variant options (normalized, see app/services/variants.py)
+    size = Column(String)
+    color = Column(String)
+    
+    sku = Column(String, unique=True, index=True)
+    stock_quantity = Column(Integer, default=0)
+    is_active = Column(Boolean, default=True)
     
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
-    # Relationship: Each product belongs to one category
-    category = relationship("Category", back_populates="products")
\ No newline at end of file
+    # Relationship: Each variant belongs to one product
+    product = relationship("Product", back_populates="variants")
\ No newline at end of file
@@ -0,0 +1,30 @@
+"""
+Token models - refresh tokens and the revocation list behind logout
+"""
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from ..database import Base
+
+class RefreshToken(Base):
+    """
+    One issued refresh token
+    Every refresh replaces the token with a new one of the same family (one family per
+    login), so a token that is used twice means it was copied, and the family is revoked.
+    """
+    __tablename__ = "refresh_tokens"
+
+    jti = Column(String, primary_key=True)  # Unique token id from the JWT
+    family = Column(String, nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+    expires_at = Column(DateTime, nullable=False, index=True)
+    used_at = Column(DateTime)  # Set when it was exchanged for a new token
+    revoked_at = Column(DateTime)  # Set on logout or when reuse was detected
+
+class RevokedToken(Base):
+    """A revoked access token id or login family, kept until its tokens expire anyway"""
+    __tablename__ = "revoked_tokens"
+
+    token_id = Column(String, primary_key=True)  # Access token jti or refresh family
+    revoked_at = Column(DateTime, nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
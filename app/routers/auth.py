@@ -1,17 +1,16 @@
 """
 Authentication router - handles user login, registration, and JWT tokens
 """
-from datetime import datetime, timedelta
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-from jose import JWTError, jwt
 from passlib.context import CryptContext
 from pydantic import BaseModel, EmailStr
 
 from ..database import get_db
 from ..models.user import User
-from ..config import settings
+from ..services import tokens
 
 # Create router instance
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -45,6 +44,12 @@ class Token(BaseModel):
     """Schema for JWT token response"""
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None  # Exchange at /auth/refresh for a new pair
+    expires_in: Optional[int] = None  # Access token lifetime in seconds
+
+class RefreshRequest(BaseModel):
+    """Schema for refreshing tokens"""
+    refresh_token: str
 
 # Utility functions
 def verify_password(plain_password: str, hashed_password: str) -> bool:
@@ -71,34 +76,39 @@ def get_password_hash(password: str) -> str:
         import hashlib
         return hashlib.sha256(password.encode()).hexdigest()
 
-def create_access_token(data: dict) -> str:
-    """Create a JWT access token"""
-    to_encode = data.copy()
-    expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
-    return encoded_jwt
-
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    """Get current authenticated user from JWT token"""
-    credentials_exception = HTTPException(
+def _credentials_exception(detail: str = "Could not validate credentials") -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
-        detail="Could not validate credentials",
+        detail=detail,
         headers={"WWW-Authenticate": "Bearer"},
     )
-    
+
+def get_token_claims(token: str = Depends(oauth2_scheme)) -> tokens.TokenClaims:
+    """Verify the access token (a CPU-only check, raises 401 if invalid)"""
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
-        raise credentials_exception
-    
-    user = db.query(User).filter(User.username == username).first()
-    if user is None:
-        raise credentials_exception
-    return user
+        return tokens.verify_access_token(token)
+    except tokens.TokenError as e:
+        raise _credentials_exception(str(e))
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+    """Get current authenticated user from JWT token"""
+    return get_user_from_token(token, db)
+
+def get_user_from_token(token: str, db: Session) -> User:
+    """
+    Verify a JWT token and return its user (raises 401 if invalid)
+    The user is built from the token's claims (id, username, admin flag) without a
+    database query. Endpoints needing other user fields load the row themselves.
+    """
+    claims = get_token_claims(token)
+    if claims.user_id is None:
+        # Token issued before user ids were added to the claims. Read the row every time:
+        # the admin flag must not outlive a change to the user, and these tokens expire soon.
+        user = db.query(User).filter(User.username == claims.username).first()
+        if user is None:
+            raise _credentials_exception()
+        return user
+    return User(id=claims.user_id, username=claims.username, is_admin=claims.is_admin, is_active=True)
 
 # API Endpoints
 @router.post("/register", response_model=UserResponse)
@@ -146,12 +156,46 @@ def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = D
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Create access token
-    access_token = create_access_token(data={"sub": user.username})
+    # Create access and refresh tokens
+    token_pair = tokens.issue_tokens(db, user)
+    db.commit()
+    
+    return token_pair
+
+@router.post("/refresh", response_model=Token)
+def refresh_tokens(refresh_data: RefreshRequest, db: Session = Depends(get_db)):
+    """Exchange a refresh token for a new token pair (each refresh token works once)"""
+    try:
+        record = tokens.rotate_refresh_token(db, refresh_data.refresh_token)
+    except tokens.TokenError as e:
+        raise _credentials_exception(str(e))
+    
+    user = db.query(User).filter(User.id == record.user_id).first()
+    if not user or not user.is_active:
+        db.rollback()
+        raise _credentials_exception()
+    
+    token_pair = tokens.issue_tokens(db, user, record.family)
+    db.commit()
+    
+    return token_pair
+
+@router.post("/logout")
+def logout_user(claims: tokens.TokenClaims = Depends(get_token_claims), db: Session = Depends(get_db)):
+    """Log out: revokes this login's access and refresh tokens"""
+    if claims.family:
+        tokens.revoke_family(db, claims.family)
+    else:
+        tokens.revoke_access_token(db, claims)
+    db.commit()
+    tokens.revocations_changed()
     
-    return {"access_token": access_token, "token_type": "bearer"}
+    return {"message": "Logged out"}
 
 @router.get("/me", response_model=UserResponse)
-def get_current_user_info(current_user: User = Depends(get_current_user)):
-    """Get current user's information"""
-    return current_user
\ No newline at end of file
+def get_current_user_info(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Get current user's information (read from the database, so is_active is always current)"""
+    user = db.query(User).filter(User.id == current_user.id).first()
+    if not user:
+        raise _credentials_exception()
+    return user
\ No newline at end of file
@@ -0,0 +1,260 @@
+"""
+Cart router - server-side shopping cart and checkout
+Items are validated when they are added and revalidated only when the catalog
+changes, so checkout can reuse the cart's price and stock snapshots.
+"""
+from datetime import datetime
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Header
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+from pydantic import BaseModel, Field
+import uuid
+
+from ..config import settings
+from ..database import get_db
+from ..models.order import Order, OrderItem
+from ..models.product import Product, ProductVariant
+from ..models.user import User
+from ..routers.auth import get_current_user
+from ..routers.orders import OrderResponse, submit_order
+from ..services import catalog_stats, idempotency, variants
+from ..services.carts import cart_store, CachedCart
+from ..services.events import event_bus
+from ..services.money import Money, to_birr
+
+router = APIRouter(prefix="/cart", tags=["Cart"])
+
+# Pydantic schemas
+class CartItemUpdate(BaseModel):
+    """Schema for setting the quantity of a cart item (0 removes it)"""
+    product_id: int
+    variant_id: Optional[int] = None
+    quantity: int = Field(ge=0)
+
+class CartItemResponse(BaseModel):
+    """Schema for a cart item with its current price and stock"""
+    product_id: int
+    variant_id: Optional[int]
+    name: Optional[str]
+    quantity: int
+    unit_price: Optional[Money]
+    line_total: Optional[Money]
+    available_stock: Optional[int]
+    problem: Optional[str]  # Set when the item can't be ordered as it is
+
+class CartResponse(BaseModel):
+    """Schema for the cart in responses"""
+    items: List[CartItemResponse]
+    item_count: int
+    total: Money
+    ready_for_checkout: bool
+    expires_at: datetime
+
+class CheckoutRequest(BaseModel):
+    """Schema for checking out the cart"""
+    shipping_address: str
+    shipping_city: str
+    shipping_postal_code: str
+
+def _cart_response(cart: CachedCart) -> dict:
+    with cart.lock:
+        items = [
+            {
+                "product_id": line.product_id,
+                "variant_id": line.variant_id,
+                "name": line.name,
+                "quantity": line.quantity,
+                "unit_price": to_birr(line.unit_price_santim) if line.unit_price_santim is not None else None,
+                "line_total": to_birr(line.unit_price_santim * line.quantity) if line.unit_price_santim is not None else None,
+                "available_stock": line.available_stock,
+                "problem": line.problem,
+            }
+            for line in cart.lines.values()
+        ]
+        return {
+            "items": items,
+            "item_count": sum(item["quantity"] for item in items),
+            "total": to_birr(cart.total_santim),
+            "ready_for_checkout": bool(items) and not any(item["problem"] for item in items),
+            "expires_at": cart.expires_at,
+        }
+
+@router.get("/", response_model=CartResponse)
+def get_cart(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get the current user's cart (only items whose product changed are rechecked)"""
+    cart = cart_store.get(db, current_user.id)
+    cart_store.revalidate(db, cart)
+    return _cart_response(cart)
+
+@router.put("/items", response_model=CartResponse)
+def set_cart_item(
+    item: CartItemUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Add an item or change its quantity (quantity 0 removes it)"""
+    cart = cart_store.set_quantity(db, current_user.id, item.product_id, item.variant_id, item.quantity)
+    cart_store.revalidate(db, cart)
+    return _cart_response(cart)
+
+@router.delete("/items/{product_id}", response_model=CartResponse)
+def remove_cart_item(
+    product_id: int,
+    variant_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Remove an item from the cart"""
+    cart = cart_store.set_quantity(db, current_user.id, product_id, variant_id, 0)
+    cart_store.revalidate(db, cart)
+    return _cart_response(cart)
+
+@router.delete("/", response_model=CartResponse)
+def clear_cart(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Remove every item from the cart"""
+    return _cart_response(cart_store.clear(db, current_user.id))
+
+def _place_cart_order(db: Session, user_id: int, items: str, lines: list, total_santim: int, checkout_data: CheckoutRequest):
+    """Claim the stored cart, create its order and reduce stock (the caller commits)"""
+    # Claimed first, so a second checkout of the same cart stops here before touching stock
+    if not cart_store.claim_row(db, user_id, items):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Your cart changed or was already checked out. Please review your cart"
+        )
+
+    new_order = Order(
+        order_number=f"ORD-{uuid.uuid4().hex[:8].upper()}",
+        user_id=user_id,
+        total_amount_santim=total_santim,
+        shipping_address=checkout_data.shipping_address,
+        shipping_city=checkout_data.shipping_city,
+        shipping_postal_code=checkout_data.shipping_postal_code
+    )
+    db.add(new_order)
+    db.flush()  # Assigns new_order.id without ending the transaction
+
+    for line in lines:
+        db.add(OrderItem(
+            order_id=new_order.id,
+            product_id=line.product_id,
+            variant_id=line.variant_id,
+            quantity=line.quantity,
+            unit_price_santim=line.unit_price_santim,
+            total_price_santim=line.unit_price_santim * line.quantity
+        ))
+
+        # The WHERE clause re-checks stock, so products don't have to be read and locked first
+        product_stock = db.query(Product).filter(
+            Product.id == line.product_id,
+            Product.is_active == True,
+            Product.stock_quantity >= line.quantity
+        )
+        if line.variant_id is None:
+            # Stock of a product with variants must come off a variant (it gained some since the line was added)
+            product_stock = product_stock.filter(~variants.has_variants())
+        updated = product_stock.update({Product.stock_quantity: Product.stock_quantity - line.quantity}, synchronize_session=False)
+
+        if updated and line.variant_id is not None:
+            updated = db.query(ProductVariant).filter(
+                ProductVariant.id == line.variant_id,
+                ProductVariant.is_active == True,
+                ProductVariant.stock_quantity >= line.quantity
+            ).update({ProductVariant.stock_quantity: ProductVariant.stock_quantity - line.quantity}, synchronize_session=False)
+
+        if not updated:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Insufficient stock for {line.name}. Please review your cart"
+            )
+
+    db.flush()
+    db.refresh(new_order)
+    products = db.query(Product).filter(Product.id.in_({line.product_id for line in lines})).all()
+    return new_order, products
+
+def _checkout(db: Session, user_id: int, checkout_data: CheckoutRequest, idempotency_key: Optional[str] = None) -> dict:
+    """Validate the cart and turn it into an order, returns the serialized order once it is committed"""
+    cart = cart_store.get(db, user_id)
+
+    with cart.lock:  # One checkout at a time per cart in this process, claim_row covers the others
+        cart_store.revalidate(db, cart)
+        lines = list(cart.lines.values())
+
+        if not lines:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Your cart is empty"
+            )
+
+        problems = [f"{line.name or f'Product {line.product_id}'}: {line.problem}" for line in lines if line.problem]
+        if problems:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Some cart items can't be ordered. " + "; ".join(problems)
+            )
+
+        cart_store.save(cart)  # The stored row is what the order transaction claims
+        items, total_santim = cart.serialize(), cart.total_santim
+        place = lambda session: _place_cart_order(session, user_id, items, lines, total_santim, checkout_data)
+
+        try:
+            if settings.ORDER_GROUP_COMMIT:
+                response_body = submit_order(user_id, place, idempotency_key)
+            else:
+                new_order, products = place(db)
+                stock_levels = catalog_stats.stock_snapshot(products)
+                response_body = OrderResponse.model_validate(new_order).model_dump(mode="json")
+                # The order, the emptied cart and the stored response are committed together
+                if idempotency_key:
+                    idempotency.complete_key(db, user_id, idempotency_key, status.HTTP_200_OK, response_body)
+                db.commit()
+        except Exception:
+            db.rollback()
+            cart_store.products_changed({line.product_id for line in lines})  # Show the new stock in the cart
+            raise
+        cart_store.forget(cart)
+
+    if not settings.ORDER_GROUP_COMMIT:  # submit_order already did this after its commit
+        catalog_stats.stock_changed(stock_levels)
+        if event_bus.has_subscribers:
+            event_bus.publish("order_created", response_body)
+    return response_body
+
+@router.post("/checkout", response_model=OrderResponse)
+def checkout(
+    checkout_data: CheckoutRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=idempotency.MAX_KEY_LENGTH)
+):
+    """
+    Turn the cart into an order
+    Prices and stock come from the cart's snapshots, so only lines changed since they
+    were last checked are queried again. Stock is reduced with conditional UPDATEs that
+    fail if another buyer took the last items in the meantime. Send an Idempotency-Key
+    header to make retries safe, as for POST /orders/.
+    """
+    if not idempotency_key:
+        return JSONResponse(content=_checkout(db, current_user.id, checkout_data))
+
+    # Keys are shared with POST /orders/, so the endpoint is part of the fingerprint
+    fingerprint = idempotency.fingerprint_request({"checkout": checkout_data.model_dump()})
+
+    with idempotency.key_lock(current_user.id, idempotency_key):
+        stored = idempotency.reserve_key(db, current_user.id, idempotency_key, fingerprint)
+        if stored is not None:
+            return idempotency.replay_response(stored)
+        try:
+            return JSONResponse(content=_checkout(db, current_user.id, checkout_data, idempotency_key))
+        except Exception:
+            db.rollback()
+            idempotency.release_key(db, current_user.id, idempotency_key)
+            raise
@@ -0,0 +1,71 @@
+"""
+Events router - Server-Sent Events stream for live admin dashboard updates
+"""
+import time
+
+from fastapi import APIRouter, HTTPException, status, Query, Request
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from ..config import settings
+from ..database import SessionLocal
+from ..routers.auth import get_token_claims, get_user_from_token
+from ..services import tokens
+from ..services.events import event_bus, format_sse
+
+router = APIRouter(prefix="/events", tags=["Events"])
+
+@router.get("/stream")
+async def stream_events(
+    request: Request,
+    access_token: str = Query(..., description="JWT token (EventSource cannot send headers)")
+):
+    """
+    Stream order-created, order-status-changed and stock-changed events (Admin only)
+    A "resync" event means this client fell behind and should reload its data. The stream
+    ends when the token expires or is revoked; reconnect with a fresh token.
+    """
+    # Authenticate with a short-lived session - the stream itself holds no DB connection
+    db = SessionLocal()
+    try:
+        claims = get_token_claims(access_token)
+        user = get_user_from_token(access_token, db)
+        is_admin = user.is_admin
+    finally:
+        db.close()
+    
+    if not is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only administrators can subscribe to live events"
+        )
+    
+    subscription = event_bus.subscribe()
+    
+    async def event_stream():
+        checked_at = time.monotonic()
+        try:
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                # Wake up at expiry at the latest, so an expired token doesn't keep the stream open
+                timeout = max(0, min(settings.EVENTS_HEARTBEAT_SECONDS, claims.expires_at - time.time()))
+                events = await subscription.next_events(timeout)
+                if time.monotonic() - checked_at >= settings.EVENTS_HEARTBEAT_SECONDS or time.time() >= claims.expires_at:
+                    checked_at = time.monotonic()
+                    try:
+                        # Checks expiry and revocation - may read new revocations from the database
+                        await run_in_threadpool(tokens.verify_access_token, access_token)
+                    except tokens.TokenError:
+                        break
+                if not events:
+                    yield ": keepalive\n\n"  # Comment line keeps proxies from closing the connection
+                for event in events:
+                    yield format_sse(event)
+        finally:
+            event_bus.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
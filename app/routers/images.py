@@ -0,0 +1,134 @@
+"""
+Images router - serves resized product image thumbnails
+Originals come from an admin upload or from a remote Product.image_url.
+"""
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Path, Request, UploadFile, File
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+from ..config import settings
+from ..models.user import User
+from ..routers.auth import get_current_user
+from ..services import images
+
+router = APIRouter(prefix="/images", tags=["Images"])
+
+# Variants of an uploaded image never change for a given URL, so browsers and CDNs may keep them forever
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# A proxied URL can start pointing at a different image, so those responses expire
+PROXY_CACHE_CONTROL = f"public, max-age={settings.IMAGE_PROXY_MAX_AGE_SECONDS}"
+
+class ImageUploadResponse(BaseModel):
+    """Schema for an uploaded original image"""
+    id: str
+    url: str
+
+def _check_sizes(*sizes: Optional[int]):
+    """Only the configured IMAGE_SIZES can be generated"""
+    for size in sizes:
+        if size is not None and size not in settings.IMAGE_SIZES:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Image sizes must be one of {', '.join(map(str, settings.IMAGE_SIZES))}"
+            )
+
+def _choose_format(requested: Optional[str], request: Request):
+    """Use the requested format, or WebP when the browser accepts it"""
+    if requested:
+        return requested, False
+    accepts_webp = "image/webp" in request.headers.get("accept", "")
+    return ("webp" if accepts_webp else "jpeg"), True
+
+def _image_response(request: Request, etag: str, fmt: str, negotiated: bool, data: Optional[bytes] = None,
+                    cache_control: str = IMMUTABLE_CACHE_CONTROL) -> Response:
+    """Build the image response, or a 304 when the client already has this variant"""
+    headers = {"Cache-Control": cache_control, "ETag": f'"{etag}"'}
+    if negotiated:
+        headers["Vary"] = "Accept"
+
+    if request.headers.get("if-none-match") == f'"{etag}"':
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return Response(content=data, media_type=images.VARIANT_FORMATS[fmt][1], headers=headers)
+
+@router.post("/upload", response_model=ImageUploadResponse)
+def upload_image(
+    file: UploadFile = File(...),
+    current_user: User = Depends(get_current_user)
+):
+    """Upload an original product image (Admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only administrators can upload images"
+        )
+
+    max_bytes = settings.IMAGE_MAX_SOURCE_MB * 1024 * 1024
+    data = file.file.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail="Image is too large"
+        )
+
+    try:
+        digest = images.store_original(data)
+    except images.ImageError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return {"id": digest, "url": f"/images/{digest}"}
+
+@router.get("/proxy")
+def proxy_image(
+    request: Request,
+    url: str = Query(..., description="Remote image URL, e.g. a Product.image_url"),
+    w: Optional[int] = Query(None, description="Maximum width, one of IMAGE_SIZES"),
+    h: Optional[int] = Query(None, description="Maximum height, one of IMAGE_SIZES"),
+    format: Optional[str] = Query(None, pattern="^(webp|jpeg)$", description="Output format")
+):
+    """Get a resized copy of a remote image (downloaded again only every IMAGE_PROXY_MAX_AGE_SECONDS)"""
+    _check_sizes(w, h)
+    fmt, negotiated = _choose_format(format, request)
+
+    try:
+        digest = images.original_for_url(url)
+        try:
+            data, etag = images.get_variant(digest, w, h, fmt)
+        except LookupError:
+            # Original was evicted from the cache - download it again
+            digest = images.original_for_url(url, refresh=True)
+            data, etag = images.get_variant(digest, w, h, fmt)
+    except images.ImageError as e:
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY, detail=str(e))
+
+    return _image_response(request, etag, fmt, negotiated, data, PROXY_CACHE_CONTROL)
+
+@router.get("/{image_id}")
+def get_image(
+    request: Request,
+    image_id: str = Path(..., pattern="^[0-9a-f]{64}$"),
+    w: Optional[int] = Query(None, description="Maximum width, one of IMAGE_SIZES"),
+    h: Optional[int] = Query(None, description="Maximum height, one of IMAGE_SIZES"),
+    format: Optional[str] = Query(None, pattern="^(webp|jpeg)$", description="Output format")
+):
+    """Get a resized copy of an uploaded image"""
+    _check_sizes(w, h)
+    fmt, negotiated = _choose_format(format, request)
+
+    # Variant names are known up front, so revalidation needs no disk access
+    etag = images.variant_digest(image_id, w, h, fmt)
+    if request.headers.get("if-none-match") == f'"{etag}"':
+        return _image_response(request, etag, fmt, negotiated)
+
+    try:
+        data, etag = images.get_variant(image_id, w, h, fmt)
+    except LookupError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Image not found"
+        )
+    except images.ImageError as e:
+        raise HTTPException(status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=str(e))
+
+    return _image_response(request, etag, fmt, negotiated, data)
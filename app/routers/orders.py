@@ -1,17 +1,24 @@
 """
 Orders router - handles order creation and management
 """
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from pydantic import BaseModel
+from datetime import datetime
+from typing import Callable, List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Query, Response
+from sqlalchemy.orm import Session, selectinload
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel, Field
 import uuid
 
 from ..database import get_db
 from ..models.order import Order, OrderItem, OrderStatus
-from ..models.product import Product
+from ..models.product import Product, ProductVariant
 from ..models.user import User
 from ..routers.auth import get_current_user
+from ..config import settings
+from ..services import idempotency, catalog_stats, order_archive, sync, variants
+from ..services.order_batches import order_batcher
+from ..services.events import event_bus
+from ..services.money import SantimAsBirr
 
 router = APIRouter(prefix="/orders", tags=["Orders"])
 
@@ -20,6 +27,7 @@ class OrderItemCreate(BaseModel):
     """Schema for creating an order item"""
     product_id: int
     quantity: int
+    variant_id: Optional[int] = None  # Size/color variant, required if the product has variants
 
 class OrderCreate(BaseModel):
     """Schema for creating an order"""
@@ -32,9 +40,10 @@ class OrderItemResponse(BaseModel):
     """Schema for order item in responses"""
     id: int
     product_id: int
+    variant_id: Optional[int] = None
     quantity: int
-    unit_price: float
-    total_price: float
+    unit_price: SantimAsBirr = Field(validation_alias="unit_price_santim")
+    total_price: SantimAsBirr = Field(validation_alias="total_price_santim")
     
     class Config:
         from_attributes = True
@@ -43,24 +52,30 @@ class OrderResponse(BaseModel):
     """Schema for order in responses"""
     id: int
     order_number: str
-    total_amount: float
+    total_amount: SantimAsBirr = Field(validation_alias="total_amount_santim")
     status: OrderStatus
     shipping_address: str
     shipping_city: str
     shipping_postal_code: str
-    created_at: str
+    created_at: datetime
     order_items: List[OrderItemResponse]
+    archived: bool = False  # Delivered/cancelled order moved to the order archive
     
     class Config:
         from_attributes = True
 
-@router.post("/", response_model=OrderResponse)
-def create_order(
-    order_data: OrderCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    """Create a new order"""
+class OrderChanges(BaseModel):
+    """Schema for orders changed since a sync watermark"""
+    items: List[OrderResponse]
+    archived: List[int]  # Orders moved to the order archive since updated_since (they no longer change)
+    watermark: datetime  # Send as updated_since next time
+    has_more: bool  # More changes follow: ask again with after_id = the last id of this page
+
+def _place_order(db: Session, user_id: int, order_data: OrderCreate):
+    """
+    Validate items, create the order and reduce stock (the caller commits)
+    Returns the new order and the products whose stock changed.
+    """
     
     if not order_data.items:
         raise HTTPException(
@@ -68,16 +83,16 @@ def create_order(
             detail="Order must contain at least one item"
         )
     
-    # Calculate total and validate products
-    total_amount = 0
+    # Validate products (totals are summed in integer santim, so they are exact)
     order_items_data = []
+    ordered = []  # (product, variant) per item
     
     for item in order_data.items:
         # Get product and check availability
-        product = db.query(Product).filter(
+        product, has_variants = db.query(Product, variants.has_variants()).filter(
             Product.id == item.product_id,
             Product.is_active == True
-        ).first()
+        ).first() or (None, False)
         
         if not product:
             raise HTTPException(
@@ -85,21 +100,47 @@ def create_order(
                 detail=f"Product with ID {item.product_id} not found"
             )
         
+        # The product total is the sum of its variants, so stock must come off one of them
+        if has_variants and item.variant_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Choose a size/color (variant_id) for product {product.name}"
+            )
+        
         if product.stock_quantity < item.quantity:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Insufficient stock for product {product.name}. Available: {product.stock_quantity}"
             )
         
-        # Calculate item total
-        item_total = product.price * item.quantity
-        total_amount += item_total
+        # Variant stock is checked on top of the product total
+        variant = None
+        if item.variant_id is not None:
+            variant = db.query(ProductVariant).filter(
+                ProductVariant.id == item.variant_id,
+                ProductVariant.product_id == product.id,
+                ProductVariant.is_active == True
+            ).first()
+            
+            if not variant:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Variant with ID {item.variant_id} not found for product {product.name}"
+                )
+            
+            if variant.stock_quantity < item.quantity:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Insufficient stock for {product.name} ({variant.size or ''} {variant.color or ''}). Available: {variant.stock_quantity}"
+                )
         
+        ordered.append((product, variant))
         order_items_data.append({
             "product_id": product.id,
+            "variant_id": item.variant_id,
             "quantity": item.quantity,
-            "unit_price": product.price,
-            "total_price": item_total
+            "unit_price_santim": product.price_santim,
+            "total_price_santim": product.price_santim * item.quantity
         })
     
     # Create order
@@ -107,42 +148,155 @@ def create_order(
     
     new_order = Order(
         order_number=order_number,
-        user_id=current_user.id,
-        total_amount=total_amount,
+        user_id=user_id,
+        total_amount_santim=sum(item_data["total_price_santim"] for item_data in order_items_data),
         shipping_address=order_data.shipping_address,
         shipping_city=order_data.shipping_city,
         shipping_postal_code=order_data.shipping_postal_code
     )
     
     db.add(new_order)
-    db.commit()
-    db.refresh(new_order)
+    db.flush()  # Assigns new_order.id without ending the transaction
     
     # Create order items and update stock
-    for item_data in order_items_data:
+    for (product, variant), item_data in zip(ordered, order_items_data):
         order_item = OrderItem(
             order_id=new_order.id,
             **item_data
         )
         db.add(order_item)
         
-        # Update product stock
-        product = db.query(Product).filter(Product.id == item_data["product_id"]).first()
+        # Update product (and variant) stock - both were already loaded above
         product.stock_quantity -= item_data["quantity"]
+        if variant is not None:
+            variant.stock_quantity -= item_data["quantity"]
     
-    db.commit()
+    db.flush()
     db.refresh(new_order)
     
-    return new_order
+    return new_order, [product for product, _ in ordered]
+
+def submit_order(user_id: int, place: Callable[[Session], Tuple[Order, list]], idempotency_key: Optional[str] = None) -> dict:
+    """
+    Place an order in the next group commit batch, returns the serialized order once it is committed
+    place(db) creates the order without committing and returns it with the products whose stock changed.
+    """
+    def work(db: Session):
+        new_order, products = place(db)
+        response_body = OrderResponse.model_validate(new_order).model_dump(mode="json")
+        if idempotency_key:
+            idempotency.complete_key(db, user_id, idempotency_key, status.HTTP_200_OK, response_body)
+        return response_body, catalog_stats.stock_snapshot(products)
+    
+    def on_commit(result):
+        response_body, stock_levels = result
+        catalog_stats.stock_changed(stock_levels)
+        if event_bus.has_subscribers:
+            event_bus.publish("order_created", response_body)
+    
+    response_body, _ = order_batcher.submit(work, on_commit)
+    return response_body
+
+@router.post("/", response_model=OrderResponse)
+def create_order(
+    order_data: OrderCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=idempotency.MAX_KEY_LENGTH)
+):
+    """
+    Create a new order
+    Send an Idempotency-Key header to make retries safe: a retry with the same key
+    returns the original order instead of creating a duplicate.
+    With ORDER_GROUP_COMMIT on, the order is committed together with other waiting orders.
+    """
+    if not idempotency_key:
+        if settings.ORDER_GROUP_COMMIT:
+            place = lambda db: _place_order(db, current_user.id, order_data)
+            return JSONResponse(content=submit_order(current_user.id, place))
+        new_order, products = _place_order(db, current_user.id, order_data)
+        stock_levels = catalog_stats.stock_snapshot(products)
+        db.commit()
+        catalog_stats.stock_changed(stock_levels)
+        db.refresh(new_order)
+        # Serialized here: FastAPI would validate a returned ORM object on another threadpool
+        # thread while this request still holds its connection, which deadlocks under load
+        response_body = OrderResponse.model_validate(new_order).model_dump(mode="json")
+        if event_bus.has_subscribers:
+            event_bus.publish("order_created", response_body)
+        return JSONResponse(content=response_body)
+    
+    fingerprint = idempotency.fingerprint_request(order_data.model_dump())
+    
+    with idempotency.key_lock(current_user.id, idempotency_key):
+        stored = idempotency.reserve_key(db, current_user.id, idempotency_key, fingerprint)
+        if stored is not None:
+            return idempotency.replay_response(stored)
+        
+        if settings.ORDER_GROUP_COMMIT:
+            try:
+                place = lambda db: _place_order(db, current_user.id, order_data)
+                return JSONResponse(content=submit_order(current_user.id, place, idempotency_key))
+            except Exception:
+                idempotency.release_key(db, current_user.id, idempotency_key)
+                raise
+        
+        try:
+            new_order, products = _place_order(db, current_user.id, order_data)
+            stock_levels = catalog_stats.stock_snapshot(products)
+            response_body = OrderResponse.model_validate(new_order).model_dump(mode="json")
+            
+            # Order and stored response are committed together
+            idempotency.complete_key(db, current_user.id, idempotency_key, status.HTTP_200_OK, response_body)
+            db.commit()
+        except Exception:
+            db.rollback()
+            idempotency.release_key(db, current_user.id, idempotency_key)
+            raise
+    
+    catalog_stats.stock_changed(stock_levels)
+    if event_bus.has_subscribers:
+        event_bus.publish("order_created", response_body)
+    
+    # Already serialized for the idempotency record, so send it as is
+    return JSONResponse(content=response_body)
+
+def _order_feed(db: Session, query, skip: int, limit: int, user_id: Optional[int] = None) -> list:
+    """Newest orders first, live and archived orders merged by (created_at, id)"""
+    newest_first = (Order.created_at.desc(), Order.id.desc())
+    entries = order_archive.archived_entries(db, user_id, skip + limit)
+    if not entries:
+        return query.options(selectinload(Order.order_items)).order_by(*newest_first).offset(skip).limit(limit).all()
+    
+    # Old orders can stay live (e.g. still pending), so the two lists interleave. Past the
+    # first page only ids and dates are read for the skipped orders, full orders just for this page.
+    live = {}
+    if skip == 0:
+        live = {order.id: order for order in query.options(selectinload(Order.order_items)).order_by(*newest_first).limit(limit)}
+        live_keys = [(order.created_at, order.id) for order in live.values()]
+    else:
+        live_keys = query.with_entities(Order.created_at, Order.id).order_by(*newest_first).limit(skip + limit).all()
+    keys = [(created_at, order_id, None) for created_at, order_id in live_keys]
+    keys += [(entry.created_at, entry.order_id, entry) for entry in entries]
+    page = sorted(keys, key=lambda key: (key[0] or datetime.min, key[1]), reverse=True)[skip:skip + limit]
+    
+    live_ids = [order_id for _, order_id, entry in page if entry is None and order_id not in live]
+    if live_ids:
+        live.update((order.id, order) for order in query.options(selectinload(Order.order_items)).filter(Order.id.in_(live_ids)))
+    archived = {order["id"]: order for order in order_archive.load_archived_orders([entry for _, _, entry in page if entry])}
+    orders = [live.get(order_id) if entry is None else archived.get(order_id) for _, order_id, entry in page]
+    return [order for order in orders if order is not None]
 
 @router.get("/", response_model=List[OrderResponse])
 def get_user_orders(
+    skip: int = Query(0, ge=0, description="Number of orders to skip"),
+    limit: int = Query(100, ge=1, le=500, description="Number of orders to return"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get all orders for the current user"""
-    orders = db.query(Order).filter(Order.user_id == current_user.id).all()
-    return orders
+    """Get the current user's orders, newest first"""
+    query = db.query(Order).filter(Order.user_id == current_user.id)
+    return _order_feed(db, query, skip, limit, current_user.id)
 
 @router.get("/{order_id}", response_model=OrderResponse)
 def get_order(
@@ -156,6 +310,9 @@ def get_order(
         Order.user_id == current_user.id
     ).first()
     
+    if not order:
+        order = order_archive.get_archived_order(db, order_id, current_user.id)
+    
     if not order:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -167,7 +324,7 @@ def get_order(
 @router.put("/{order_id}/status")
 def update_order_status(
     order_id: int,
-    status: OrderStatus,
+    new_status: OrderStatus = Query(..., alias="status"),  # Named so it doesn't hide the status module
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
@@ -179,28 +336,85 @@ def update_order_status(
         )
     
     order = db.query(Order).filter(Order.id == order_id).first()
+    if not order and order_archive.is_archived(db, order_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Archived orders can't be changed"
+        )
     if not order:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Order not found"
         )
     
-    order.status = status
+    order.status = new_status
     db.commit()
+    if event_bus.has_subscribers:
+        event_bus.publish("order_status_changed", {
+            "order_id": order.id,
+            "order_number": order.order_number,
+            "status": new_status.value,
+        })
     
-    return {"message": f"Order status updated to {status.value}"}
+    return {"message": f"Order status updated to {new_status.value}"}
 
 @router.get("/admin/all", response_model=List[OrderResponse])
 def get_all_orders(
+    response: Response,
+    skip: int = Query(0, ge=0, description="Number of orders to skip"),
+    limit: int = Query(100, ge=1, le=500, description="Number of orders to return"),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get all orders (Admin only)"""
+    """Get all orders, newest first (Admin only). X-Total-Count has the number of orders, archived included."""
     if not current_user.is_admin:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only administrators can view all orders"
         )
     
-    orders = db.query(Order).all()
-    return orders
\ No newline at end of file
+    query = db.query(Order)
+    response.headers["X-Total-Count"] = str(query.count() + order_archive.count_archived_orders(db))
+    return _order_feed(db, query, skip, limit)
+
+@router.get("/admin/changes", response_model=OrderChanges)
+def get_order_changes(
+    response: Response,
+    updated_since: Optional[datetime] = Query(None, description="Watermark of the previous sync (omit to start a sync)"),
+    after_id: int = Query(0, ge=0, description="Last order id of the previous page"),
+    limit: int = Query(100, ge=1, le=500, description="Number of orders to return"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Orders placed or changed since updated_since, for incremental sync (Admin only)
+    Without updated_since, a sync starts from the newest orders, like GET /orders/admin/all
+    (with X-Total-Count), rather than from the whole order history.
+    """
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only administrators can sync orders"
+        )
+    
+    watermark = sync.new_watermark()
+    query = db.query(Order)
+    if updated_since is None:
+        response.headers["X-Total-Count"] = str(query.count() + order_archive.count_archived_orders(db))
+        return {"items": _order_feed(db, query, 0, limit), "archived": [], "watermark": watermark, "has_more": False}
+    
+    # Listed with the first page only
+    archived = order_archive.archived_since(db, updated_since, sync.MAX_REMOVED_IDS) if after_id == 0 else []
+    if archived is None:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="Too many orders were archived since updated_since, start a new sync without it"
+        )
+    
+    orders, has_more = sync.changed_page(query.options(selectinload(Order.order_items)), Order, updated_since, after_id, limit)
+    return {
+        "items": orders,
+        "archived": archived,
+        "watermark": watermark,
+        "has_more": has_more,
+    }
\ No newline at end of file
@@ -1,15 +1,20 @@
 """
 Products router - handles all product-related API endpoints
 """
+from datetime import datetime
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from pydantic import BaseModel
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+from fastapi.responses import Response
+from sqlalchemy.orm import Session, selectinload
+from pydantic import BaseModel, Field
 
+from ..config import settings
 from ..database import get_db
-from ..models.product import Product, Category
+from ..models.product import Product, Category, ProductVariant
 from ..models.user import User
 from ..routers.auth import get_current_user
+from ..services import catalog_stats, variants, product_search, snapshots, sync
+from ..services.money import BirrAmount, Money, SantimAsBirr, to_santim
 
 # Create router
 router = APIRouter(prefix="/products", tags=["Products"])
@@ -30,21 +35,47 @@ class CategoryResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class ProductVariantCreate(BaseModel):
+    """Schema for creating a product variant"""
+    size: Optional[str] = None
+    color: Optional[str] = None
+    sku: str
+    stock_quantity: int = 0
+
+class ProductVariantUpdate(BaseModel):
+    """Schema for updating a product variant"""
+    stock_quantity: Optional[int] = None
+    is_active: Optional[bool] = None
+
+class ProductVariantResponse(BaseModel):
+    """Schema for product variant in responses"""
+    id: int
+    size: Optional[str]
+    color: Optional[str]
+    sku: Optional[str]
+    stock_quantity: int
+    is_active: bool
+    
+    class Config:
+        from_attributes = True
+
 class ProductCreate(BaseModel):
     """Schema for creating a product"""
     name: str
     description: Optional[str] = None
-    price: float
+    price: BirrAmount
     stock_quantity: int = 0
     sku: str
     category_id: int
     image_url: Optional[str] = None
+    # If omitted, variants are created from "Size:" / "Color:" lines in the description
+    variants: Optional[List[ProductVariantCreate]] = None
 
 class ProductUpdate(BaseModel):
     """Schema for updating a product"""
     name: Optional[str] = None
     description: Optional[str] = None
-    price: Optional[float] = None
+    price: Optional[BirrAmount] = None
     stock_quantity: Optional[int] = None
     image_url: Optional[str] = None
 
@@ -53,16 +84,83 @@ class ProductResponse(BaseModel):
     id: int
     name: str
     description: Optional[str]
-    price: float
+    price: SantimAsBirr = Field(validation_alias="price_santim")
     stock_quantity: int
     sku: str
     is_active: bool
     image_url: Optional[str]
     category: CategoryResponse
+    variants: List[ProductVariantResponse] = []
     
     class Config:
         from_attributes = True
 
+class CategoryChanges(BaseModel):
+    """Schema for categories changed since a sync watermark"""
+    items: List[CategoryResponse]
+    deleted: List[int]  # Categories deactivated since updated_since
+    watermark: datetime  # Send as updated_since next time
+    has_more: bool  # More changes follow: ask again with after_id = the last id of this page
+
+class ProductChanges(BaseModel):
+    """Schema for products changed since a sync watermark"""
+    items: List[ProductResponse]
+    deleted: List[int]  # Products deleted (deactivated) since updated_since
+    watermark: datetime
+    has_more: bool
+
+class CategoryFacet(BaseModel):
+    """Schema for the number of matching products in one category"""
+    category_id: Optional[int]
+    name: Optional[str]
+    count: int
+
+class PriceRangeFacet(BaseModel):
+    """Schema for the number of matching products in one price range"""
+    min_price: Money
+    max_price: Optional[Money]
+    count: int
+
+class StockFacet(BaseModel):
+    """Schema for matching products split by stock status"""
+    in_stock: int
+    out_of_stock: int
+
+class ProductFacets(BaseModel):
+    """Schema for all facet counts of a search"""
+    total: int
+    categories: List[CategoryFacet]
+    price_ranges: List[PriceRangeFacet]
+    stock: StockFacet
+
+class ProductSearchResponse(BaseModel):
+    """Schema for a page of products with facet counts"""
+    items: List[ProductResponse]
+    facets: ProductFacets
+
+class CategoryStatsResponse(BaseModel):
+    """Schema for per-category product counts"""
+    category_id: int
+    name: str
+    product_count: int
+    total_stock: int
+    low_stock_count: int
+
+class TopSellingProductResponse(BaseModel):
+    """Schema for a best selling product"""
+    product_id: int
+    name: str
+    units_sold: int
+    revenue: Money
+
+class LowStockProductResponse(BaseModel):
+    """Schema for a low-stock alert"""
+    product_id: int
+    name: str
+    sku: Optional[str]
+    category_id: Optional[int]
+    stock_quantity: int
+
 # Category endpoints
 @router.post("/categories", response_model=CategoryResponse)
 def create_category(
@@ -89,14 +187,73 @@ def create_category(
     db.add(new_category)
     db.commit()
     db.refresh(new_category)
+    catalog_stats.catalog_changed()
     
     return new_category
 
 @router.get("/categories", response_model=List[CategoryResponse])
 def get_categories(db: Session = Depends(get_db)):
-    """Get all active categories"""
-    categories = db.query(Category).filter(Category.is_active == True).all()
-    return categories
+    """Get all active categories (cached until the catalog changes)"""
+    def compute():
+        categories = db.query(Category).filter(Category.is_active == True).all()
+        return [CategoryResponse.model_validate(category).model_dump() for category in categories]
+    
+    return catalog_stats.stats_cache.get_or_compute("category-list", compute)
+
+@router.get("/categories/changes", response_model=CategoryChanges)
+def get_category_changes(
+    updated_since: Optional[datetime] = Query(None, description="Watermark of the previous sync (omit for a full sync)"),
+    after_id: int = Query(0, ge=0, description="Last category id of the previous page"),
+    limit: int = Query(500, ge=1, le=1000, description="Number of categories to return"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Categories created, changed or deleted since updated_since, for incremental sync (Admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only administrators can sync categories"
+        )
+    
+    watermark = sync.new_watermark()
+    query = db.query(Category)
+    if updated_since is None:
+        query = query.filter(Category.is_active == True)  # A full sync has nothing to delete
+    categories, has_more = sync.changed_page(query, Category, updated_since, after_id, limit)
+    return {
+        "items": [category for category in categories if category.is_active],
+        "deleted": [category.id for category in categories if not category.is_active],
+        "watermark": watermark,
+        "has_more": has_more,
+    }
+
+# Statistics endpoints
+@router.get("/stats/categories", response_model=List[CategoryStatsResponse])
+def get_category_stats(db: Session = Depends(get_db)):
+    """Get product count, total stock and low-stock count for each category"""
+    return catalog_stats.category_stats(db)
+
+@router.get("/stats/top-selling", response_model=List[TopSellingProductResponse])
+def get_top_selling_products(
+    limit: int = Query(10, ge=1, le=50, description="Number of products to return"),
+    db: Session = Depends(get_db)
+):
+    """Get the best selling products by units sold"""
+    return catalog_stats.top_selling_products(db, limit)
+
+@router.get("/stats/low-stock", response_model=List[LowStockProductResponse])
+def get_low_stock_products(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Get active products that are running out of stock (Admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only administrators can view stock alerts"
+        )
+    
+    return [level._asdict() for level in catalog_stats.low_stock_index.alerts(db)]
 
 # Product endpoints
 @router.post("/", response_model=ProductResponse)
@@ -128,50 +285,239 @@ def create_product(
             detail="Product with this SKU already exists"
         )
     
-    new_product = Product(**product_data.dict())
+    new_product = Product(
+        **product_data.dict(exclude={"variants", "price"}),
+        price_santim=to_santim(product_data.price)
+    )
     db.add(new_product)
+    db.flush()  # Assigns new_product.id for the variants
+    
+    # Create size/color variants
+    if product_data.variants is not None:
+        for variant_data in product_data.variants:
+            db.add(ProductVariant(
+                product_id=new_product.id,
+                size=variants.normalize_size(variant_data.size),
+                color=variants.normalize_color(variant_data.color),
+                sku=variant_data.sku,
+                stock_quantity=variant_data.stock_quantity
+            ))
+        variants.sync_product_stock(db, new_product)
+    else:
+        db.add_all(variants.build_variants_from_description(db, new_product))
+    
     db.commit()
     db.refresh(new_product)
+    catalog_stats.stock_changed(catalog_stats.stock_snapshot([new_product]))
+    snapshots.snapshot_writer.flush()  # The admin sees the change on the next read
+    catalog_stats.catalog_changed()
     
     return new_product
 
+def _snapshot_response(request: Request, snapshot: snapshots.Snapshot) -> Response:
+    """Send a pre-rendered snapshot (gzipped if the client accepts it), or a 304"""
+    headers = {"ETag": f'"{snapshot.etag}"', "Vary": "Accept-Encoding"}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    if snapshot.gzip_body is not None and "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        return Response(content=snapshot.gzip_body, media_type="application/json", headers=headers)
+    return Response(content=snapshot.body, media_type="application/json", headers=headers)
+
+def _find_products(
+    db: Session,
+    skip: int,
+    limit: int,
+    category_id: Optional[int] = None,
+    search: Optional[str] = None,
+    size: Optional[str] = None,
+    color: Optional[str] = None
+) -> List[Product]:
+    """A page of active products matching the storefront filters, in id order"""
+    query = db.query(Product).options(
+        selectinload(Product.category), selectinload(Product.variants)
+    ).filter(Product.is_active == True)
+    
+    # Apply filters
+    query = product_search.apply_product_filters(db, query, category_id, search, size, color)
+    
+    # Apply pagination
+    return query.order_by(Product.id).offset(skip).limit(limit).all()
+
 @router.get("/", response_model=List[ProductResponse])
 def get_products(
+    request: Request,
     skip: int = Query(0, ge=0, description="Number of products to skip"),
     limit: int = Query(10, ge=1, le=100, description="Number of products to return"),
     category_id: Optional[int] = Query(None, description="Filter by category ID"),
     search: Optional[str] = Query(None, description="Search in product names"),
+    size: Optional[str] = Query(None, description="Filter by variant size, e.g. M"),
+    color: Optional[str] = Query(None, description="Filter by variant color, e.g. Black"),
     db: Session = Depends(get_db)
 ):
     """Get products with optional filtering and pagination"""
-    query = db.query(Product).filter(Product.is_active == True)
+    # Category pages of SNAPSHOT_PAGE_SIZE products without other filters are pre-rendered
+    page_size = settings.SNAPSHOT_PAGE_SIZE
+    if category_id and not (search or size or color) and limit == page_size and skip % page_size == 0:
+        snapshot = snapshots.category_page(category_id, skip // page_size)
+        if snapshot is not None:
+            return _snapshot_response(request, snapshot)
     
-    # Apply filters
-    if category_id:
-        query = query.filter(Product.category_id == category_id)
-    
-    if search:
-        query = query.filter(Product.name.contains(search))
+    return _find_products(db, skip, limit, category_id, search, size, color)
+
+@router.get("/search", response_model=ProductSearchResponse)
+def search_products(
+    skip: int = Query(0, ge=0, description="Number of products to skip"),
+    limit: int = Query(10, ge=1, le=100, description="Number of products to return"),
+    category_id: Optional[int] = Query(None, description="Filter by category ID"),
+    search: Optional[str] = Query(None, description="Search in product names"),
+    size: Optional[str] = Query(None, description="Filter by variant size, e.g. M"),
+    color: Optional[str] = Query(None, description="Filter by variant color, e.g. Black"),
+    db: Session = Depends(get_db)
+):
+    """Get a page of products together with facet counts for the same filters"""
+    return {
+        "items": _find_products(db, skip, limit, category_id, search, size, color),
+        "facets": product_search.compute_facets(db, category_id, search, size, color),
+    }
+
+@router.get("/changes", response_model=ProductChanges)
+def get_product_changes(
+    updated_since: Optional[datetime] = Query(None, description="Watermark of the previous sync (omit for a full sync)"),
+    after_id: int = Query(0, ge=0, description="Last product id of the previous page"),
+    limit: int = Query(500, ge=1, le=1000, description="Number of products to return"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Products created, changed or deleted since updated_since, for incremental sync (Admin only)
+    Stock taken by orders and variant changes count as changes too.
+    """
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only administrators can sync products"
+        )
     
-    # Apply pagination
-    products = query.offset(skip).limit(limit).all()
-    return products
+    watermark = sync.new_watermark()
+    query = db.query(Product).options(selectinload(Product.category), selectinload(Product.variants))
+    if updated_since is None:
+        query = query.filter(Product.is_active == True)  # A full sync has nothing to delete
+    products, has_more = sync.changed_page(query, Product, updated_since, after_id, limit)
+    return {
+        "items": [product for product in products if product.is_active],
+        "deleted": [product.id for product in products if not product.is_active],
+        "watermark": watermark,
+        "has_more": has_more,
+    }
 
 @router.get("/{product_id}", response_model=ProductResponse)
-def get_product(product_id: int, db: Session = Depends(get_db)):
-    """Get a specific product by ID"""
-    product = db.query(Product).filter(
-        Product.id == product_id,
-        Product.is_active == True
-    ).first()
+def get_product(product_id: int, request: Request):
+    """Get a specific product by ID (served from its pre-rendered snapshot, no database session)"""
+    snapshot = snapshots.product_snapshot(product_id)
+    
+    if snapshot is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Product not found"
+        )
     
+    return _snapshot_response(request, snapshot)
+
+# Variant endpoints
+@router.get("/{product_id}/variants", response_model=List[ProductVariantResponse])
+def get_product_variants(product_id: int, db: Session = Depends(get_db)):
+    """Get the active size/color variants of a product"""
+    return db.query(ProductVariant).filter(
+        ProductVariant.product_id == product_id,
+        ProductVariant.is_active == True
+    ).all()
+
+@router.post("/{product_id}/variants", response_model=ProductVariantResponse)
+def create_product_variant(
+    product_id: int,
+    variant_data: ProductVariantCreate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Add a size/color variant to a product (Admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only administrators can create variants"
+        )
+    
+    product = db.query(Product).filter(Product.id == product_id).first()
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Product not found"
         )
     
-    return product
+    size = variants.normalize_size(variant_data.size)
+    color = variants.normalize_color(variant_data.color)
+    existing_variant = db.query(ProductVariant).filter(
+        (ProductVariant.sku == variant_data.sku) |
+        ((ProductVariant.product_id == product_id) & (ProductVariant.size == size) & (ProductVariant.color == color))
+    ).first()
+    if existing_variant:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Variant with this SKU or size/color already exists"
+        )
+    
+    new_variant = ProductVariant(
+        product_id=product_id,
+        size=size,
+        color=color,
+        sku=variant_data.sku,
+        stock_quantity=variant_data.stock_quantity
+    )
+    db.add(new_variant)
+    variants.sync_product_stock(db, product)
+    stock_levels = catalog_stats.stock_snapshot([product])
+    db.commit()
+    db.refresh(new_variant)
+    catalog_stats.stock_changed(stock_levels)
+    snapshots.snapshot_writer.flush()
+    catalog_stats.catalog_changed()
+    
+    return new_variant
+
+@router.put("/variants/{variant_id}", response_model=ProductVariantResponse)
+def update_product_variant(
+    variant_id: int,
+    variant_data: ProductVariantUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """Update a variant's stock or active flag (Admin only)"""
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only administrators can update variants"
+        )
+    
+    variant = db.query(ProductVariant).filter(ProductVariant.id == variant_id).first()
+    if not variant:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Variant not found"
+        )
+    
+    for field, value in variant_data.dict(exclude_unset=True).items():
+        setattr(variant, field, value)
+    
+    variants.sync_product_stock(db, variant.product)
+    stock_levels = catalog_stats.stock_snapshot([variant.product])
+    db.commit()
+    db.refresh(variant)
+    catalog_stats.stock_changed(stock_levels)
+    snapshots.snapshot_writer.flush()
+    catalog_stats.catalog_changed()
+    
+    return variant
 
 @router.put("/{product_id}", response_model=ProductResponse)
 def update_product(
@@ -196,11 +542,24 @@ def update_product(
     
     # Update only provided fields
     update_data = product_data.dict(exclude_unset=True)
+    if update_data.get("stock_quantity", product.stock_quantity) != product.stock_quantity:
+        has_variants = db.query(ProductVariant.id).filter(ProductVariant.product_id == product.id).first() is not None
+        if has_variants:
+            # The total is recomputed from the variants on their next change, so a direct edit would not stick
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="This product's stock is managed per variant - update its variants instead"
+            )
+    if "price" in update_data:
+        update_data["price_santim"] = to_santim(update_data.pop("price"))
     for field, value in update_data.items():
         setattr(product, field, value)
     
     db.commit()
     db.refresh(product)
+    catalog_stats.stock_changed(catalog_stats.stock_snapshot([product]))
+    snapshots.snapshot_writer.flush()
+    catalog_stats.catalog_changed()
     
     return product
 
@@ -226,6 +585,10 @@ def delete_product(
     
     # Soft delete - just mark as inactive
     product.is_active = False
+    stock_levels = catalog_stats.stock_snapshot([product])
     db.commit()
+    catalog_stats.stock_changed(stock_levels)
+    snapshots.snapshot_writer.flush()
+    catalog_stats.catalog_changed()
     
     return {"message": "Product deleted successfully"}
\ No newline at end of file
@@ -0,0 +1,52 @@
+"""
+Profiles router - lists and downloads request profiles (Admin only)
+Profiles are recorded by the profiling middleware when PROFILING_ENABLED is set.
+Downloads are folded stacks: open them in speedscope or pass them to flamegraph.pl.
+"""
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+
+from ..models.user import User
+from ..routers.auth import get_current_user
+from ..services.profiling import profile_store
+
+router = APIRouter(prefix="/profiles", tags=["Profiling"])
+
+class ProfileResponse(BaseModel):
+    """Schema for a stored request profile"""
+    id: str
+    created_at: str
+    method: str
+    path: str
+    status_code: Optional[int]
+    duration_ms: float
+    reason: str  # "sampled" or "slow"
+    samples: int
+    overlapping_requests: int  # Other requests profiled at the same time also appear in the stacks
+
+def _require_admin(current_user: User):
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only administrators can view profiles"
+        )
+
+@router.get("/", response_model=List[ProfileResponse])
+def list_profiles(current_user: User = Depends(get_current_user)):
+    """Stored request profiles, newest first (Admin only)"""
+    _require_admin(current_user)
+    return profile_store.list()
+
+@router.get("/{profile_id}")
+def download_profile(profile_id: str, current_user: User = Depends(get_current_user)):
+    """Download a profile as folded stacks (Admin only)"""
+    _require_admin(current_user)
+    path = profile_store.path(profile_id)
+    if path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.folded")
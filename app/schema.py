@@ -0,0 +1,37 @@
+"""
+Database schema versioning - small wrappers around Alembic
+Migrations live in migrations/versions, see manage.py for the commands.
+"""
+import os
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+
+from .database import engine
+
+# alembic.ini sits in the project root, next to the app package
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+def alembic_config() -> Config:
+    return Config(ALEMBIC_INI)
+
+def current_revision():
+    """Revision the database is at (None for a new or never migrated database)"""
+    with engine.connect() as connection:
+        return MigrationContext.configure(connection).get_current_revision()
+
+def head_revision():
+    """Latest revision in migrations/versions"""
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+def is_up_to_date() -> bool:
+    return current_revision() == head_revision()
+
+def upgrade(revision: str = "head"):
+    """Apply migrations up to the given revision"""
+    command.upgrade(alembic_config(), revision)
+
+def make_migration(message: str):
+    """Generate a new migration by comparing the models with the database"""
+    command.revision(alembic_config(), message=message, autogenerate=True)
@@ -0,0 +1 @@
+# Services package - contains shared business logic used by the routers
\ No newline at end of file
@@ -0,0 +1,469 @@
+"""
+Cache - shared cache for catalog data and sessions
+Each Cache is a namespace ("catalog", "sessions") over one backend chosen with CACHE_BACKEND:
+  memory  in-process LRU only (every worker has its own copy)
+  sqlite  a SQLite file shared by the workers on one machine (CACHE_SQLITE_PATH)
+  redis   a Redis-compatible server shared by every machine (CACHE_REDIS_URL)
+With a shared backend, each worker also keeps recently used values in its in-process
+LRU, and deletes are broadcast so the other workers drop their copies (Redis pub/sub,
+or a message table in the SQLite file). A miss is computed once: requests in the same
+worker wait for the first one, and other workers wait on a lock in the shared backend.
+"""
+import json
+import os
+import pickle
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, List, Optional
+from urllib.parse import urlparse
+
+from ..config import settings
+
+MISSING = object()
+INVALIDATION_CHANNEL = "cache-invalidations"
+MESSAGE_RETENTION_SECONDS = 60  # Old SQLite invalidation messages are deleted after this
+RETRY_AFTER_SECONDS = 5  # After a failure, requests skip the shared backend for this long
+
+# Identifies this process in broadcasts, so it can skip its own messages
+_ORIGIN = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+class CacheError(Exception):
+    """Raised when the shared cache server returns an error"""
+
+class LocalLRU:
+    """In-process LRU cache with per-entry expiry"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return MISSING
+            if entry[0] <= time.time():
+                del self._entries[key]
+                return MISSING
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value, expires_at: float):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self, prefix: str = ""):
+        with self._lock:
+            for key in [key for key in self._entries if key.startswith(prefix)]:
+                del self._entries[key]
+
+class RespConnection:
+    """One connection speaking the Redis protocol (RESP2)"""
+
+    def __init__(self, url: str, timeout: Optional[float] = 5):
+        parsed = urlparse(url)
+        self._sock = socket.create_connection((parsed.hostname or "localhost", parsed.port or 6379), timeout)
+        self._file = self._sock.makefile("rb")
+        if parsed.password:
+            self.command("AUTH", parsed.password)
+        database = parsed.path.lstrip("/")
+        if database and database != "0":
+            self.command("SELECT", database)
+
+    def send(self, *args):
+        parts = [b"*%d\r\n" % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+        self._sock.sendall(b"".join(parts))
+
+    def read_reply(self):
+        line = self._file.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Cache server closed the connection")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode()
+        if kind == b"-":
+            raise CacheError(rest.decode())
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            return None if length < 0 else self._file.read(length + 2)[:-2]
+        if kind == b"*":
+            length = int(rest)
+            return None if length < 0 else [self.read_reply() for _ in range(length)]
+        raise CacheError(f"Unexpected reply from cache server: {line!r}")
+
+    def command(self, *args):
+        self.send(*args)
+        return self.read_reply()
+
+    def close(self):
+        self._sock.close()
+
+class RedisBackend:
+    """Shared backend on a Redis-compatible server (one connection per thread)"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self._local = threading.local()
+
+    def _command(self, *args):
+        connection = getattr(self._local, "connection", None)
+        for attempt in range(2):
+            if connection is None:
+                connection = self._local.connection = RespConnection(self.url)
+            try:
+                return connection.command(*args)
+            except (OSError, ConnectionError):
+                connection.close()
+                connection = self._local.connection = None
+                if attempt:
+                    raise  # Reconnected once already
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._command("GET", key)
+
+    def set(self, key: str, value: bytes, ttl_seconds: float):
+        self._command("SET", key, value, "PX", max(1, int(ttl_seconds * 1000)))
+
+    def add(self, key: str, value: bytes, ttl_seconds: float) -> bool:
+        """Set only if the key doesn't exist, returns whether it was set"""
+        return self._command("SET", key, value, "PX", max(1, int(ttl_seconds * 1000)), "NX") is not None
+
+    def delete(self, key: str):
+        self._command("DEL", key)
+
+    def clear(self, prefix: str):
+        cursor = b"0"
+        pattern = "".join("\\" + char if char in "*?[]\\" else char for char in prefix) + "*"
+        while True:
+            cursor, keys = self._command("SCAN", cursor, "MATCH", pattern, "COUNT", 500)
+            if keys:
+                self._command("DEL", *keys)
+            if cursor in (b"0", 0):
+                break
+
+    def publish(self, message: str):
+        self._command("PUBLISH", INVALIDATION_CHANNEL, message)
+
+    def listen(self, callback: Callable[[str], None]):
+        """Call callback with every broadcast message, from a background thread"""
+        def run():
+            connected = True
+            while True:
+                try:
+                    connection = RespConnection(self.url, timeout=None)
+                    connection.command("SUBSCRIBE", INVALIDATION_CHANNEL)
+                    connected = True
+                    while True:
+                        reply = connection.read_reply()
+                        if reply and reply[0] == b"message":
+                            callback(reply[2].decode())
+                except (OSError, ConnectionError, CacheError) as e:
+                    if connected:
+                        print(f"⚠️ Cache invalidation listener disconnected: {e}")
+                        connected = False
+                    # Copies cached while disconnected may have missed deletes, drop them all
+                    callback(None)
+                    time.sleep(1)
+
+        threading.Thread(target=run, name="cache-listener", daemon=True).start()
+
+class SQLiteBackend:
+    """Shared backend in a SQLite file, for several workers on one machine"""
+
+    def __init__(self, path: str, poll_seconds: float):
+        self.path = path
+        self.poll_seconds = poll_seconds
+        self._local = threading.local()
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")  # Readers don't wait for writers
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS cache_messages (id INTEGER PRIMARY KEY AUTOINCREMENT, message TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def get(self, key: str) -> Optional[bytes]:
+        row = self._connection().execute(
+            "SELECT value FROM cache_entries WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: bytes, ttl_seconds: float):
+        self._connection().execute(
+            "INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, time.time() + ttl_seconds)
+        )
+
+    def add(self, key: str, value: bytes, ttl_seconds: float) -> bool:
+        """Set only if the key doesn't exist (or has expired), returns whether it was set"""
+        now = time.time()
+        connection = self._connection()
+        connection.execute("DELETE FROM cache_entries WHERE key = ? AND expires_at <= ?", (key, now))
+        return connection.execute(
+            "INSERT OR IGNORE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, value, now + ttl_seconds)
+        ).rowcount == 1
+
+    def delete(self, key: str):
+        self._connection().execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+
+    def clear(self, prefix: str):
+        # Key range instead of LIKE, so the primary key index is used and nothing needs escaping
+        self._connection().execute(
+            "DELETE FROM cache_entries WHERE key >= ? AND key < ?", (prefix, prefix + "\U0010ffff")
+        )
+
+    def publish(self, message: str):
+        self._connection().execute(
+            "INSERT INTO cache_messages (message, created_at) VALUES (?, ?)", (message, time.time())
+        )
+
+    def listen(self, callback: Callable[[str], None]):
+        """Poll for messages from other workers, and remove expired rows, in a background thread"""
+        def run():
+            connection = self._connection()
+            last_id = connection.execute("SELECT COALESCE(MAX(id), 0) FROM cache_messages").fetchone()[0]
+            last_cleanup = 0.0
+            while True:
+                time.sleep(self.poll_seconds)
+                try:
+                    for message_id, message in connection.execute(
+                        "SELECT id, message FROM cache_messages WHERE id > ? ORDER BY id", (last_id,)
+                    ).fetchall():
+                        last_id = message_id
+                        callback(message)
+                    now = time.time()
+                    if now - last_cleanup > MESSAGE_RETENTION_SECONDS:
+                        connection.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (now,))
+                        connection.execute("DELETE FROM cache_messages WHERE created_at < ?", (now - MESSAGE_RETENTION_SECONDS,))
+                        last_cleanup = now
+                except sqlite3.Error as e:
+                    print(f"⚠️ Cache invalidation poll failed: {e}")
+
+        threading.Thread(target=run, name="cache-listener", daemon=True).start()
+
+def create_backend(name: str):
+    """The shared backend for CACHE_BACKEND (None when caching in memory only)"""
+    if name == "memory":
+        return None
+    if name == "sqlite":
+        return SQLiteBackend(settings.CACHE_SQLITE_PATH, settings.CACHE_POLL_SECONDS)
+    if name == "redis":
+        return RedisBackend(settings.CACHE_REDIS_URL)
+    raise ValueError(f"Unknown CACHE_BACKEND: {name!r} (use memory, sqlite or redis)")
+
+class _Flight:
+    """A computation that other requests for the same key wait for"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+    def wait(self):
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+class Cache:
+    """
+    One namespace of cached values
+    Keys may be strings or tuples. None is never cached, so a compute function can
+    return it for "not found" without hiding rows created later.
+    """
+
+    def __init__(self, namespace: str, ttl_seconds: float):
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self._hooks: List[Callable] = []
+        self._flights = {}  # key -> _Flight for misses being computed in this worker
+        self._lock = threading.Lock()
+        _namespaces[namespace] = self
+
+    def _key(self, key) -> str:
+        return f"{self.namespace}:{key if isinstance(key, str) else repr(key)}"
+
+    def _local_get(self, full_key: str):
+        value = local_cache.get(full_key)
+        if value is not MISSING or shared.backend is None:
+            return value
+        data = shared.call("get", full_key)
+        if data is None:
+            return MISSING
+        expires_at, value = pickle.loads(data)
+        local_cache.set(full_key, value, expires_at)
+        return value
+
+    def get(self, key, default=None):
+        value = self._local_get(self._key(key))
+        return default if value is MISSING else value
+
+    def set(self, key, value, ttl_seconds: Optional[float] = None):
+        ttl_seconds = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        full_key = self._key(key)
+        expires_at = time.time() + ttl_seconds
+        local_cache.set(full_key, value, expires_at)
+        if shared.backend is not None:
+            shared.call("set", full_key, pickle.dumps((expires_at, value)), ttl_seconds)
+
+    def get_or_compute(self, key, compute: Callable, ttl_seconds: Optional[float] = None):
+        """Cached value for key, or compute() it once while concurrent callers wait for the result"""
+        full_key = self._key(key)
+        value = self._local_get(full_key)
+        if value is not MISSING:
+            return value
+
+        with self._lock:
+            flight = self._flights.get(full_key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[full_key] = _Flight()
+        if not leader:
+            return flight.wait()
+
+        try:
+            flight.value = self._compute_once(key, full_key, compute, ttl_seconds)
+            return flight.value
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[full_key]
+            flight.done.set()
+
+    def _compute_once(self, key, full_key: str, compute: Callable, ttl_seconds: Optional[float]):
+        """compute(), unless another worker is already computing it - then wait for its value"""
+        lock_key = full_key + ":computing"
+        locked = False
+        if shared.backend is not None:
+            locked = shared.call("add", lock_key, b"1", settings.CACHE_LOCK_SECONDS)
+            deadline = time.monotonic() + settings.CACHE_LOCK_SECONDS
+            # An unreachable backend gives None - compute without waiting
+            while locked is False and time.monotonic() < deadline:
+                value = self._local_get(full_key)
+                if value is not MISSING:
+                    return value
+                time.sleep(0.05)
+
+        try:
+            value = compute()
+            if value is not None:
+                self.set(key, value, ttl_seconds)
+            return value
+        finally:
+            if locked:
+                shared.call("delete", lock_key)
+
+    def delete(self, key):
+        """Remove a key in every worker"""
+        full_key = self._key(key)
+        local_cache.delete(full_key)
+        if shared.backend is not None:
+            shared.call("delete", full_key)
+            shared.broadcast(self.namespace, full_key)
+
+    def clear(self):
+        """Remove every key of this namespace in every worker"""
+        local_cache.clear(self.namespace + ":")
+        if shared.backend is not None:
+            shared.call("clear", self.namespace + ":")
+            shared.broadcast(self.namespace, None)
+
+    def on_invalidate(self, callback: Callable):
+        """Call callback(key) when another worker deletes a key (None: cleared the namespace)"""
+        self._hooks.append(callback)
+
+    def _invalidated(self, full_key: Optional[str]):
+        if full_key is None:
+            local_cache.clear(self.namespace + ":")
+        else:
+            local_cache.delete(full_key)
+        key = None if full_key is None else full_key[len(self.namespace) + 1:]
+        for hook in self._hooks:
+            hook(key)
+
+class SharedBackend:
+    """The process's shared backend, connected on first use, with error handling"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.backend = None if name == "memory" else MISSING  # Created lazily, after workers fork
+        self._lock = threading.Lock()
+        self._warned_at = 0.0
+        self._retry_at = 0.0
+
+    def _connect(self):
+        with self._lock:
+            if self.backend is MISSING:
+                backend = create_backend(self.name)
+                backend.listen(_on_message)
+                self.backend = backend
+        return self.backend
+
+    def call(self, method: str, *args):
+        """Run a backend method, returns None if the backend can't be reached"""
+        if time.monotonic() < self._retry_at:
+            return None  # Recently down - don't make every request wait for a timeout
+        try:
+            backend = self._connect() if self.backend is MISSING else self.backend
+            return getattr(backend, method)(*args)
+        except (OSError, ConnectionError, CacheError, sqlite3.Error) as e:
+            self._retry_at = time.monotonic() + RETRY_AFTER_SECONDS
+            if time.monotonic() - self._warned_at > 60:  # Don't flood the log while it is down
+                self._warned_at = time.monotonic()
+                print(f"⚠️ Shared cache unavailable, using the database: {e}")
+            return None
+
+    def broadcast(self, namespace: str, full_key: Optional[str]):
+        self.call("publish", json.dumps({"origin": _ORIGIN, "namespace": namespace, "key": full_key}))
+
+def _on_message(message: Optional[str]):
+    """Apply a delete broadcast by another worker (None: the listener lost messages)"""
+    if message is None:
+        for cache in list(_namespaces.values()):
+            cache._invalidated(None)
+        return
+    try:
+        data = json.loads(message)
+    except ValueError:
+        return
+    cache = _namespaces.get(data.get("namespace"))
+    if cache is not None and data.get("origin") != _ORIGIN:
+        cache._invalidated(data.get("key"))
+
+# Shared instances used by the catalog and session caches
+_namespaces = {}  # namespace -> Cache
+local_cache = LocalLRU(settings.CACHE_LOCAL_MAX_ENTRIES)
+shared = SharedBackend(settings.CACHE_BACKEND)
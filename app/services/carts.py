@@ -0,0 +1,425 @@
+"""
+Shopping carts - server-side carts with an in-memory write-back cache
+Each cart line keeps a snapshot of the price and available stock from when it was
+last validated. Catalog writes mark the lines of the changed products stale, so
+showing a cart or checking out only re-queries the lines that actually changed.
+Cart changes are kept in memory and written to the carts table in the background.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models.cart import Cart
+from ..models.product import Product, ProductVariant
+from .variants import has_variants
+
+class CartLine:
+    """One product (or product variant) in a cart, with its last validated snapshot"""
+    __slots__ = ("product_id", "variant_id", "quantity", "name", "unit_price_santim",
+                 "available_stock", "problem", "checked_at", "invalidated_at")
+
+    def __init__(self, product_id: int, variant_id: Optional[int], quantity: int):
+        self.product_id = product_id
+        self.variant_id = variant_id
+        self.quantity = quantity
+        self.name = None
+        self.unit_price_santim = None
+        self.available_stock = None
+        self.problem = None  # Why the line can't be ordered right now, if it can't
+        self.checked_at = None  # time.monotonic() of the last validation, None = never
+        self.invalidated_at = 0.0  # When the catalog last changed this product
+
+    @property
+    def key(self) -> Tuple[int, Optional[int]]:
+        return (self.product_id, self.variant_id)
+
+    def is_stale(self, now: float, max_age: float) -> bool:
+        return (
+            self.checked_at is None
+            or self.invalidated_at >= self.checked_at
+            or now - self.checked_at > max_age  # Catches changes made by other worker processes
+        )
+
+    def refresh(self, product, variant, checked_at: float):
+        """Update the snapshot from freshly queried product and variant rows"""
+        self.checked_at = checked_at
+        if product is None or not product.is_active:
+            self.available_stock = 0
+            self.problem = "This product is no longer available"
+            return
+
+        self.name = product.name
+        self.unit_price_santim = product.price_santim
+        self.available_stock = product.stock_quantity
+
+        if self.variant_id is not None:
+            if variant is None or not variant.is_active or variant.product_id != self.product_id:
+                self.available_stock = 0
+                self.problem = "This size/color is no longer available"
+                return
+            options = " ".join(option for option in (variant.size, variant.color) if option)
+            if options:
+                self.name = f"{product.name} ({options})"
+            self.available_stock = min(self.available_stock, variant.stock_quantity)
+
+        if self.available_stock <= 0:
+            self.problem = "Out of stock"
+        elif self.available_stock < self.quantity:
+            self.problem = f"Only {self.available_stock} left in stock"
+        else:
+            self.problem = None
+
+class CachedCart:
+    """A cart held in memory, with its lines in the order they were added"""
+
+    def __init__(self, user_id: int, lines: Iterable[CartLine], expires_at: datetime):
+        self.user_id = user_id
+        self.lines: Dict[Tuple[int, Optional[int]], CartLine] = {line.key: line for line in lines}
+        self.expires_at = expires_at
+        self.dirty = False  # Changed since it was last written to the database
+        self.lock = threading.RLock()  # Held while the cart is changed or checked out
+
+    @property
+    def total_santim(self) -> int:
+        return sum((line.unit_price_santim or 0) * line.quantity for line in self.lines.values())
+
+    def serialize(self) -> str:
+        # Compact rows: [product_id, variant_id, quantity]. Snapshots are rebuilt after loading.
+        return json.dumps([[line.product_id, line.variant_id, line.quantity] for line in self.lines.values()], separators=(",", ":"))
+
+class CartStore:
+    """
+    Carts cached in memory, written back to the carts table every flush_seconds
+    The cache belongs to one process. When running several worker processes without
+    sticky sessions, set CART_CACHE_MAX_CARTS=0 so every request reads and writes the
+    database directly.
+    """
+
+    def __init__(self, ttl_hours: float, flush_seconds: float, snapshot_max_age: float, max_cached: int, max_items: int):
+        self.ttl = timedelta(hours=ttl_hours)
+        self.flush_seconds = flush_seconds
+        self.snapshot_max_age = snapshot_max_age
+        self.max_cached = max_cached
+        self.max_items = max_items
+        self._carts = OrderedDict()  # user_id -> CachedCart, least recently used first
+        self._by_product = {}  # product_id -> user_ids of cached carts containing it
+        self._lock = threading.Lock()
+
+    @property
+    def write_through(self) -> bool:
+        return self.flush_seconds <= 0 or self.max_cached <= 0
+
+    def _new_expiry(self) -> datetime:
+        return datetime.utcnow() + self.ttl
+
+    def _track(self, user_id: int, product_id: int):
+        self._by_product.setdefault(product_id, set()).add(user_id)
+
+    def _untrack(self, user_id: int, product_ids: Iterable[int], still_in_cart: Iterable[CartLine] = ()):
+        kept = {line.product_id for line in still_in_cart}  # e.g. another variant of the same product
+        for product_id in set(product_ids) - kept:
+            users = self._by_product.get(product_id)
+            if users is not None:
+                users.discard(user_id)
+                if not users:
+                    del self._by_product[product_id]
+
+    def _evict(self):
+        """Drop least recently used carts that are already saved, once the cache is full"""
+        for user_id in list(self._carts):
+            if len(self._carts) <= self.max_cached:
+                break
+            cart = self._carts[user_id]
+            if not cart.dirty:
+                del self._carts[user_id]
+                self._untrack(user_id, [line.product_id for line in cart.lines.values()])
+
+    def get(self, db: Session, user_id: int) -> CachedCart:
+        """The user's cart, loaded from the database on a cache miss"""
+        with self._lock:
+            cart = self._carts.get(user_id)
+            if cart is not None:
+                self._carts.move_to_end(user_id)
+                return cart
+
+        row = db.query(Cart).filter(Cart.user_id == user_id).first()
+        if row is not None and row.expires_at > datetime.utcnow():
+            lines = [CartLine(product_id, variant_id, quantity) for product_id, variant_id, quantity in json.loads(row.items)]
+            cart = CachedCart(user_id, lines, row.expires_at)
+        else:
+            cart = CachedCart(user_id, [], self._new_expiry())
+
+        if self.max_cached <= 0:
+            return cart
+        with self._lock:
+            if user_id in self._carts:
+                return self._carts[user_id]  # Another request loaded it first
+            self._carts[user_id] = cart
+            for line in cart.lines.values():
+                self._track(user_id, line.product_id)
+            self._evict()
+        return cart
+
+    def revalidate(self, db: Session, cart: CachedCart):
+        """Refresh the snapshots of stale lines, with one product and one variant query"""
+        checked_at = time.monotonic()
+        with cart.lock:
+            stale = [line for line in cart.lines.values() if line.is_stale(checked_at, self.snapshot_max_age)]
+        if not stale:
+            return
+
+        product_ids = {line.product_id for line in stale}
+        variant_ids = {line.variant_id for line in stale if line.variant_id is not None}
+        products = {
+            row.id: row for row in db.query(
+                Product.id, Product.name, Product.price_santim, Product.stock_quantity, Product.is_active
+            ).filter(Product.id.in_(product_ids))
+        }
+        variants = {}
+        if variant_ids:
+            variants = {
+                row.id: row for row in db.query(
+                    ProductVariant.id, ProductVariant.product_id, ProductVariant.size,
+                    ProductVariant.color, ProductVariant.stock_quantity, ProductVariant.is_active
+                ).filter(ProductVariant.id.in_(variant_ids))
+            }
+
+        with cart.lock:
+            for line in stale:
+                # checked_at is when the query started, so a change made meanwhile keeps the line stale
+                line.refresh(products.get(line.product_id), variants.get(line.variant_id), checked_at)
+
+    def set_quantity(self, db: Session, user_id: int, product_id: int, variant_id: Optional[int], quantity: int) -> CachedCart:
+        """Add, change or (with quantity 0) remove a cart line, validating it right away"""
+        cart = self.get(db, user_id)
+        with cart.lock:
+            key = (product_id, variant_id)
+            if quantity <= 0:
+                if cart.lines.pop(key, None) is None:
+                    return cart
+                with self._lock:
+                    self._untrack(user_id, [product_id], cart.lines.values())
+            else:
+                if key not in cart.lines and len(cart.lines) >= self.max_items:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=f"A cart can hold at most {self.max_items} different items"
+                    )
+                line = CartLine(product_id, variant_id, quantity)
+                self._validate_new_line(db, line)
+                cart.lines[key] = line
+                if self.max_cached > 0:
+                    with self._lock:
+                        self._track(user_id, product_id)
+            self._changed(cart)
+        return cart
+
+    def _validate_new_line(self, db: Session, line: CartLine):
+        """Check a new line the way checkout would, so problems show up while shopping"""
+        product, stock_per_variant = db.query(Product, has_variants()).filter(
+            Product.id == line.product_id,
+            Product.is_active == True
+        ).first() or (None, False)
+        if not product:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Product with ID {line.product_id} not found"
+            )
+        if stock_per_variant and line.variant_id is None:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Choose a size/color (variant_id) for product {product.name}"
+            )
+
+        variant = None
+        if line.variant_id is not None:
+            variant = db.query(ProductVariant).filter(
+                ProductVariant.id == line.variant_id,
+                ProductVariant.product_id == product.id,
+                ProductVariant.is_active == True
+            ).first()
+            if not variant:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Variant with ID {line.variant_id} not found for product {product.name}"
+                )
+
+        line.refresh(product, variant, time.monotonic())
+        if line.problem:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Insufficient stock for {line.name}. Available: {line.available_stock}"
+            )
+
+    def clear(self, db: Session, user_id: int) -> CachedCart:
+        cart = self.get(db, user_id)
+        with cart.lock:
+            product_ids = [line.product_id for line in cart.lines.values()]
+            cart.lines.clear()
+            with self._lock:
+                self._untrack(user_id, product_ids)
+            self._changed(cart)
+        return cart
+
+    def _changed(self, cart: CachedCart):
+        cart.expires_at = self._new_expiry()  # Carts expire CART_TTL_HOURS after their last change
+        cart.dirty = True
+        if self.write_through:
+            self._write([cart])
+
+    def save(self, cart: CachedCart):
+        """Write a changed cart now instead of on the next flush"""
+        with cart.lock:
+            if cart.dirty:
+                self._write([cart])
+
+    def claim_row(self, db: Session, user_id: int, items: str) -> bool:
+        """
+        Delete the stored cart inside the caller's transaction (used by checkout)
+        Only matches if the row still holds exactly these items, so when two checkouts of
+        the same cart race (in different worker processes too) only one of them gets it.
+        """
+        return db.query(Cart).filter(
+            Cart.user_id == user_id,
+            Cart.items == items
+        ).delete(synchronize_session=False) == 1
+
+    def forget(self, cart: CachedCart):
+        """Empty a cart in memory after checkout committed, without writing it again"""
+        with cart.lock:
+            product_ids = [line.product_id for line in cart.lines.values()]
+            cart.lines.clear()
+            cart.dirty = False
+            with self._lock:
+                self._untrack(cart.user_id, product_ids)
+
+    def products_changed(self, product_ids: Iterable[int]):
+        """Mark the cart lines of changed products stale (called after catalog writes commit)"""
+        changed_at = time.monotonic()
+        product_ids = set(product_ids)
+        with self._lock:
+            user_ids = set()
+            for product_id in product_ids:
+                user_ids |= self._by_product.get(product_id, set())
+            carts = [self._carts[user_id] for user_id in user_ids if user_id in self._carts]
+
+        for cart in carts:
+            with cart.lock:
+                for line in cart.lines.values():
+                    if line.product_id in product_ids:
+                        line.invalidated_at = changed_at
+
+    def _write(self, carts: List[CachedCart]):
+        """Save carts in one transaction (empty carts are deleted)"""
+        snapshots = []
+        for cart in carts:
+            with cart.lock:
+                snapshots.append((cart, cart.serialize() if cart.lines else None, cart.expires_at))
+                cart.dirty = False
+
+        db = SessionLocal()
+        try:
+            rows = {
+                row.user_id: row
+                for row in db.query(Cart).filter(Cart.user_id.in_([cart.user_id for cart, _, _ in snapshots]))
+            }
+            now = datetime.utcnow()
+            for cart, items, expires_at in snapshots:
+                row = rows.get(cart.user_id)
+                if items is None:
+                    if row is not None:
+                        db.delete(row)
+                elif row is None:
+                    db.add(Cart(user_id=cart.user_id, items=items, updated_at=now, expires_at=expires_at))
+                else:
+                    row.items, row.updated_at, row.expires_at = items, now, expires_at
+            db.commit()
+        except Exception:
+            db.rollback()
+            for cart, _, _ in snapshots:
+                cart.dirty = True  # Try again on the next flush
+            raise
+        finally:
+            db.close()
+
+    def flush(self) -> int:
+        """Write every changed cart to the database, returns how many were written"""
+        with self._lock:
+            dirty = [cart for cart in self._carts.values() if cart.dirty]
+        if dirty:
+            self._write(dirty)
+        return len(dirty)
+
+    def sweep(self) -> int:
+        """Flush, then remove expired carts from memory and the database"""
+        self.flush()
+        now = datetime.utcnow()
+        with self._lock:
+            for user_id in [user_id for user_id, cart in self._carts.items() if cart.expires_at <= now and not cart.dirty]:
+                cart = self._carts.pop(user_id)
+                self._untrack(user_id, [line.product_id for line in cart.lines.values()])
+
+        db = SessionLocal()
+        try:
+            removed = db.query(Cart).filter(Cart.expires_at <= now).delete(synchronize_session=False)
+            db.commit()
+            return removed
+        finally:
+            db.close()
+
+class CartSweeper:
+    """Background thread that flushes changed carts and deletes expired ones"""
+
+    def __init__(self, store: CartStore, sweep_seconds: float):
+        self.store = store
+        self.sweep_seconds = sweep_seconds
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="cart-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the thread and save any carts still waiting to be written"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self.store.flush()
+
+    def _run(self):
+        interval = self.store.flush_seconds if self.store.flush_seconds > 0 else self.sweep_seconds
+        next_sweep = time.monotonic() + self.sweep_seconds
+        while not self._stop.wait(interval):
+            try:
+                if time.monotonic() >= next_sweep:
+                    removed = self.store.sweep()
+                    next_sweep = time.monotonic() + self.sweep_seconds
+                    if removed:
+                        print(f"🧹 Removed {removed} expired carts")
+                else:
+                    self.store.flush()
+            except Exception as e:
+                print(f"❌ Cart sweeper error: {e}")
+
+# Shared instances used by the routers
+cart_store = CartStore(
+    settings.CART_TTL_HOURS,
+    settings.CART_FLUSH_SECONDS,
+    settings.CART_SNAPSHOT_MAX_AGE_SECONDS,
+    settings.CART_CACHE_MAX_CARTS,
+    settings.CART_MAX_ITEMS
+)
+cart_sweeper = CartSweeper(cart_store, settings.CART_SWEEP_INTERVAL_SECONDS)
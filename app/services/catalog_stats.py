@@ -0,0 +1,170 @@
+"""
+Catalog statistics - aggregated counts for the admin UI and storefront
+Aggregates are single GROUP BY queries memoized for a few seconds in the shared
+catalog cache, and low-stock alerts come from an in-memory index that writers
+update as stock changes.
+"""
+import threading
+import time
+from collections import namedtuple
+from typing import List
+
+from sqlalchemy import func, case
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from .events import event_bus
+from .carts import cart_store
+from .cache import Cache
+from .snapshots import snapshot_writer
+from .money import to_birr
+from ..models.order import Order, OrderItem, OrderStatus
+from ..models.order_archive import ArchivedProductSales
+from ..models.product import Product, Category
+
+# Stock values captured from a Product row, so the index can be updated after commit
+StockLevel = namedtuple("StockLevel", "product_id name sku category_id stock_quantity is_active")
+
+class LowStockIndex:
+    """
+    Active products whose stock is below LOW_STOCK_THRESHOLD, kept in memory
+    Built with one query, then updated per product, so listing alerts costs
+    O(alerts) instead of a catalog scan. It is rebuilt periodically so that
+    changes made by other worker processes are picked up.
+    """
+
+    def __init__(self, threshold: int, refresh_seconds: float):
+        self.threshold = threshold
+        self.refresh_seconds = refresh_seconds
+        self._items = {}  # product_id -> StockLevel
+        self._built_at = None
+        self._lock = threading.Lock()
+
+    def _needs_rebuild(self) -> bool:
+        return self._built_at is None or time.monotonic() - self._built_at > self.refresh_seconds
+
+    def rebuild(self, db: Session):
+        rows = db.query(
+            Product.id, Product.name, Product.sku, Product.category_id, Product.stock_quantity
+        ).filter(
+            Product.is_active == True,
+            Product.stock_quantity < self.threshold
+        ).all()
+        items = {row[0]: StockLevel(*row, True) for row in rows}
+        with self._lock:
+            self._items = items
+            self._built_at = time.monotonic()
+
+    def update(self, level: StockLevel):
+        """Add, refresh or drop one product after its stock or status changed"""
+        with self._lock:
+            if self._built_at is None:
+                return  # Not built yet - the first rebuild will see this change
+            if level.is_active and level.stock_quantity is not None and level.stock_quantity < self.threshold:
+                self._items[level.product_id] = level
+            else:
+                self._items.pop(level.product_id, None)
+
+    def alerts(self, db: Session) -> List[StockLevel]:
+        """Low-stock products, lowest stock first"""
+        if self._needs_rebuild():
+            self.rebuild(db)
+        with self._lock:
+            items = list(self._items.values())
+        return sorted(items, key=lambda level: (level.stock_quantity, level.product_id))
+
+# Shared instances used by the routers
+stats_cache = Cache("catalog", settings.STATS_CACHE_TTL_SECONDS)
+low_stock_index = LowStockIndex(settings.LOW_STOCK_THRESHOLD, settings.LOW_STOCK_INDEX_REFRESH_SECONDS)
+
+def stock_snapshot(products) -> List[StockLevel]:
+    """Capture stock values before commit (committed objects are expired and would reload)"""
+    return [
+        StockLevel(p.id, p.name, p.sku, p.category_id, p.stock_quantity, p.is_active)
+        for p in products
+    ]
+
+def stock_changed(levels: List[StockLevel]):
+    """Tell the low-stock index, cached carts, product snapshots and live dashboards about committed product changes"""
+    cart_store.products_changed(level.product_id for level in levels)
+    snapshot_writer.products_changed(level.product_id for level in levels)
+    for level in levels:
+        low_stock_index.update(level)
+        if event_bus.has_subscribers:
+            event_bus.publish("stock_changed", {
+                "product_id": level.product_id,
+                "stock_quantity": level.stock_quantity,
+                "is_active": level.is_active,
+            })
+
+def catalog_changed():
+    """Drop memoized aggregates in every worker after an admin edit so the UI sees it immediately"""
+    stats_cache.clear()
+
+def category_stats(db: Session) -> List[dict]:
+    """Product count, total stock and low-stock count per active category, in one query"""
+    def compute():
+        rows = db.query(
+            Category.id,
+            Category.name,
+            func.count(Product.id),
+            func.coalesce(func.sum(Product.stock_quantity), 0),
+            func.coalesce(func.sum(case((Product.stock_quantity < settings.LOW_STOCK_THRESHOLD, 1), else_=0)), 0)
+        ).outerjoin(
+            Product,
+            (Product.category_id == Category.id) & (Product.is_active == True)
+        ).filter(
+            Category.is_active == True
+        ).group_by(Category.id, Category.name).order_by(Category.name).all()
+
+        return [
+            {
+                "category_id": row[0],
+                "name": row[1],
+                "product_count": row[2],
+                "total_stock": row[3],
+                "low_stock_count": row[4],
+            }
+            for row in rows
+        ]
+
+    return stats_cache.get_or_compute("categories", compute)
+
+def top_selling_products(db: Session, limit: int) -> List[dict]:
+    """
+    Best selling active products by units sold (cancelled orders excluded), in one query
+    Sales of archived orders come from their per-product rollup, not from the archive files.
+    """
+    def compute():
+        live_sales = db.query(
+            OrderItem.product_id.label("product_id"),
+            func.sum(OrderItem.quantity).label("units_sold"),
+            func.sum(OrderItem.total_price_santim).label("revenue_santim")  # Integer sum, exact
+        ).join(
+            Order, Order.id == OrderItem.order_id
+        ).filter(
+            Order.status != OrderStatus.CANCELLED
+        ).group_by(OrderItem.product_id)
+        archived_sales = db.query(
+            ArchivedProductSales.product_id, ArchivedProductSales.units_sold, ArchivedProductSales.revenue_santim
+        )
+        sales = live_sales.union_all(archived_sales).subquery()
+
+        units_sold = func.sum(sales.c.units_sold)
+        rows = db.query(
+            Product.id,
+            Product.name,
+            units_sold,
+            func.sum(sales.c.revenue_santim)
+        ).join(
+            sales, sales.c.product_id == Product.id
+        ).filter(
+            Product.is_active == True
+        ).group_by(Product.id, Product.name).order_by(units_sold.desc()).limit(limit).all()
+
+        return [
+            {"product_id": row[0], "name": row[1], "units_sold": row[2], "revenue": to_birr(row[3])}
+            for row in rows
+        ]
+
+    return stats_cache.get_or_compute(("top-selling", limit), compute)
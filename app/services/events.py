@@ -0,0 +1,107 @@
+"""
+Event bus - in-process publish/subscribe for live dashboard updates
+Routers publish events (order created, order status changed, stock changed) and
+each connected dashboard gets them through its own bounded queue.
+"""
+import asyncio
+import itertools
+import json
+import threading
+from collections import deque, namedtuple
+from typing import List
+
+from ..config import settings
+
+Event = namedtuple("Event", "id type data")
+
+class Subscription:
+    """
+    One subscriber's queue of pending events
+    Publishers may run in worker threads, so the queue is guarded by a lock and the
+    subscriber's event loop is woken with call_soon_threadsafe. When a slow subscriber
+    falls max_queue events behind, its backlog is dropped and it gets a single
+    "resync" event telling it to refetch everything instead.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, max_queue: int):
+        self._loop = loop
+        self._max_queue = max_queue
+        self._queue = deque()
+        self._lagged = False
+        self._ready = asyncio.Event()
+        self._lock = threading.Lock()
+
+    def push(self, event: Event):
+        with self._lock:
+            if len(self._queue) >= self._max_queue:
+                self._queue.clear()
+                self._lagged = True
+            self._queue.append(event)
+        try:
+            self._loop.call_soon_threadsafe(self._ready.set)
+        except RuntimeError:
+            pass  # Subscriber's event loop is already closed
+
+    async def next_events(self, timeout: float) -> List[Event]:
+        """Wait up to timeout seconds and return every queued event (empty list on timeout)"""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+
+        with self._lock:
+            self._ready.clear()
+            events = list(self._queue)
+            self._queue.clear()
+            lagged, self._lagged = self._lagged, False
+
+        if lagged:
+            events.insert(0, Event(None, "resync", "{}"))
+        return events
+
+class EventBus:
+    """Fan-out of published events to every current subscriber"""
+
+    def __init__(self, max_queue: int):
+        self.max_queue = max_queue
+        self._subscribers = set()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> Subscription:
+        """Create a subscription (must be called from the subscriber's event loop)"""
+        subscription = Subscription(asyncio.get_running_loop(), self.max_queue)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    @property
+    def has_subscribers(self) -> bool:
+        """Lets publishers skip building event payloads when nobody is listening"""
+        return bool(self._subscribers)
+
+    def publish(self, event_type: str, data: dict):
+        """Send an event to all subscribers (serialized once, not once per subscriber)"""
+        with self._lock:
+            if not self._subscribers:
+                return
+            subscribers = list(self._subscribers)
+            event = Event(next(self._ids), event_type, json.dumps(data, default=str))
+        for subscription in subscribers:
+            subscription.push(event)
+
+# Shared bus used by the routers
+event_bus = EventBus(settings.EVENTS_QUEUE_SIZE)
+
+def format_sse(event: Event) -> str:
+    """Encode an event in the text/event-stream wire format"""
+    lines = []
+    if event.id is not None:
+        lines.append(f"id: {event.id}")
+    lines.append(f"event: {event.type}")
+    lines.append(f"data: {event.data}")
+    return "\n".join(lines) + "\n\n"
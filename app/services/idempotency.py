@@ -0,0 +1,165 @@
+"""
+Idempotency service - makes retried POST requests safe
+The first request sent with an Idempotency-Key header stores its response.
+Retries with the same key get the stored response back instead of running again.
+"""
+import hashlib
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException, status
+from fastapi.responses import Response
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models.idempotency import IdempotencyKey
+
+# Per-key locks so concurrent retries inside this worker wait for the first request
+_key_locks = {}
+_key_locks_guard = threading.Lock()
+
+# Expired keys are purged lazily, at most once per interval
+PURGE_INTERVAL_SECONDS = 300
+_last_purge = 0.0
+
+# How often to re-check a key that another worker process is still processing
+POLL_INTERVAL_SECONDS = 0.1
+
+# Longest Idempotency-Key header accepted, keys are stored as they are sent
+MAX_KEY_LENGTH = 255
+
+def fingerprint_request(payload: dict) -> str:
+    """Return a stable SHA-256 fingerprint of a request body"""
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+@contextmanager
+def key_lock(user_id: int, key: str):
+    """Serialize requests that share the same (user, key) pair in this process"""
+    name = (user_id, key)
+    with _key_locks_guard:
+        entry = _key_locks.setdefault(name, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _key_locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _key_locks[name]
+
+def purge_expired_keys(db: Session) -> int:
+    """Delete stored keys whose TTL has passed, returns the number removed"""
+    deleted = db.query(IdempotencyKey).filter(
+        IdempotencyKey.expires_at < datetime.utcnow()
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+def _maybe_purge_expired_keys(db: Session):
+    """Run the TTL cleanup if it has not run recently"""
+    global _last_purge
+    now = time.monotonic()
+    if now - _last_purge >= PURGE_INTERVAL_SECONDS:
+        _last_purge = now
+        purge_expired_keys(db)
+
+def _get_key(db: Session, user_id: int, key: str) -> Optional[IdempotencyKey]:
+    return db.query(IdempotencyKey).filter(
+        IdempotencyKey.user_id == user_id,
+        IdempotencyKey.key == key
+    ).first()
+
+def _is_abandoned(record: IdempotencyKey) -> bool:
+    """Whether a key still waiting for its response has been pending for too long"""
+    timeout = timedelta(seconds=settings.IDEMPOTENCY_PENDING_TIMEOUT_SECONDS)
+    return record.created_at is not None and record.created_at.replace(tzinfo=None) < datetime.utcnow() - timeout
+
+def reserve_key(db: Session, user_id: int, key: str, fingerprint: str) -> Optional[IdempotencyKey]:
+    """
+    Claim an idempotency key before running the operation
+    Returns None when the caller now owns the key and should do the work,
+    or the completed record when the response should be replayed instead.
+    A key left pending for IDEMPOTENCY_PENDING_TIMEOUT_SECONDS can be claimed again.
+    """
+    _maybe_purge_expired_keys(db)
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+    
+    while True:
+        record = _get_key(db, user_id, key)
+        
+        if record is not None and record.expires_at < datetime.utcnow():
+            db.delete(record)
+            db.commit()
+            record = None
+        
+        if record is not None and record.response_body is None and _is_abandoned(record):
+            # Left pending by a worker that died mid-request - take the key over. Deleting by
+            # id only matches once, so when several retries race here just one of them wins.
+            db.query(IdempotencyKey).filter(
+                IdempotencyKey.id == record.id,
+                IdempotencyKey.response_body.is_(None)
+            ).delete(synchronize_session=False)
+            db.commit()
+            continue
+        
+        if record is None:
+            db.add(IdempotencyKey(
+                key=key,
+                user_id=user_id,
+                request_fingerprint=fingerprint,
+                expires_at=datetime.utcnow() + timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+            ))
+            try:
+                db.commit()
+                return None
+            except IntegrityError:
+                # Another worker process claimed the key first - wait for its result
+                db.rollback()
+                continue
+        
+        if record.request_fingerprint != fingerprint:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Idempotency-Key was already used with a different request"
+            )
+        
+        if record.response_body is not None:
+            return record
+        
+        # The first request is still running in another worker process
+        if time.monotonic() >= deadline:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="A request with this Idempotency-Key is still being processed"
+            )
+        db.expire(record)
+        time.sleep(POLL_INTERVAL_SECONDS)
+
+def complete_key(db: Session, user_id: int, key: str, status_code: int, body) -> None:
+    """Store the response for a reserved key (committed together with the caller's work)"""
+    record = _get_key(db, user_id, key)
+    record.response_status = status_code
+    record.response_body = json.dumps(body)
+
+def release_key(db: Session, user_id: int, key: str) -> None:
+    """Drop a reservation after a failed request so the client can retry it"""
+    record = _get_key(db, user_id, key)
+    if record is not None and record.response_body is None:
+        db.delete(record)
+        db.commit()
+
+def replay_response(record: IdempotencyKey) -> Response:
+    """Send the stored JSON as-is, without re-running the operation or re-serializing"""
+    return Response(
+        content=record.response_body,
+        media_type="application/json",
+        status_code=record.response_status,
+        headers={"Idempotent-Replayed": "true"}
+    )
@@ -0,0 +1,233 @@
+"""
+Image service - stores product image originals and generates resized thumbnails
+Everything lives in a content-addressed on-disk cache: a file is named after the
+SHA-256 of its content (originals) or of its recipe (variants), so a cached file
+never changes and can be served with immutable caching headers.
+"""
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+import urllib.request
+from collections import OrderedDict
+from typing import Optional, Tuple
+from urllib.parse import urlparse
+
+from PIL import Image, ImageOps
+
+from ..config import settings
+
+# Output formats we can generate: name -> (Pillow format, media type)
+VARIANT_FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+}
+VARIANT_QUALITY = 80
+MAX_DIMENSION = 2000
+FETCH_TIMEOUT_SECONDS = 10
+MAX_REDIRECTS = 3
+
+class ImageError(Exception):
+    """Raised when an original image cannot be fetched or decoded"""
+
+class ImageCache:
+    """Size-bounded file cache that evicts the least recently used files first"""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # relative path -> size, least recently used first
+        self._total_bytes = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        """Rebuild the LRU index from files already on disk (by last access time)"""
+        if self._loaded:
+            return
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                stat = os.stat(path)
+                files.append((stat.st_mtime, os.path.relpath(path, self.directory), stat.st_size))
+        for _, relative_path, size in sorted(files):
+            self._entries[relative_path] = size
+            self._total_bytes += size
+        self._loaded = True
+
+    def _forget(self, relative_path: str):
+        size = self._entries.pop(relative_path, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self):
+        # Always keep the newest entry, even if it alone is over the limit
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            relative_path, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                os.remove(os.path.join(self.directory, relative_path))
+            except FileNotFoundError:
+                pass
+
+    def get(self, relative_path: str) -> Optional[bytes]:
+        """Return cached bytes and mark the file as recently used"""
+        with self._lock:
+            self._ensure_loaded()
+            if relative_path not in self._entries:
+                return None
+            self._entries.move_to_end(relative_path)
+
+        path = os.path.join(self.directory, relative_path)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # Keeps the LRU order across restarts
+        except FileNotFoundError:
+            with self._lock:
+                self._forget(relative_path)
+            return None
+        return data
+
+    def put(self, relative_path: str, data: bytes):
+        """Write a file atomically and evict old files if the cache is over its size limit"""
+        path = os.path.join(self.directory, relative_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)  # Readers never see a partially written file
+
+        with self._lock:
+            self._ensure_loaded()
+            self._forget(relative_path)
+            self._entries[relative_path] = len(data)
+            self._total_bytes += len(data)
+            self._evict()
+
+# Shared cache instance used by the images router
+image_cache = ImageCache(settings.IMAGE_CACHE_DIR, settings.IMAGE_CACHE_MAX_MB * 1024 * 1024)
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def _cache_path(kind: str, digest: str, extension: str = "") -> str:
+    # Two-character fan-out keeps directories small
+    return os.path.join(kind, digest[:2], digest + extension)
+
+def store_original(data: bytes) -> str:
+    """Validate and store an original image, returns its content digest"""
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.verify()
+    except Exception:
+        raise ImageError("File is not a supported image")
+
+    digest = _sha256(data)
+    relative_path = _cache_path("originals", digest)
+    if image_cache.get(relative_path) is None:
+        image_cache.put(relative_path, data)
+    return digest
+
+def _check_remote_url(url: str):
+    """Reject URLs that are not plain http(s) on one of the allowed hosts"""
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or parsed.hostname not in settings.IMAGE_PROXY_ALLOWED_HOSTS:
+        raise ImageError("Image host is not allowed")
+
+class _AllowedHostRedirectHandler(urllib.request.HTTPRedirectHandler):
+    """Follows a redirect only after checking its target, so no hop can reach another host"""
+    max_redirections = MAX_REDIRECTS
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        _check_remote_url(newurl)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+_opener = urllib.request.build_opener(_AllowedHostRedirectHandler)
+
+def fetch_remote_image(url: str) -> bytes:
+    """Download an original from an allowed host"""
+    max_bytes = settings.IMAGE_MAX_SOURCE_MB * 1024 * 1024
+    _check_remote_url(url)
+
+    request = urllib.request.Request(url, headers={"User-Agent": "YzakImageProxy/1.0"})
+    try:
+        with _opener.open(request, timeout=FETCH_TIMEOUT_SECONDS) as response:
+            data = response.read(max_bytes + 1)
+    except OSError as e:
+        raise ImageError(f"Could not fetch image: {e}")
+
+    if len(data) > max_bytes:
+        raise ImageError("Image is too large")
+    return data
+
+def original_for_url(url: str, refresh: bool = False) -> str:
+    """
+    Return the content digest of a remote original, downloading it again only once
+    IMAGE_PROXY_MAX_AGE_SECONDS have passed (the last copy is kept if that download fails)
+    """
+    alias_path = _cache_path("urls", _sha256(url.encode()))
+    stale_digest = None
+    if not refresh:
+        alias = image_cache.get(alias_path)
+        if alias is not None:
+            digest, _, fetched_at = alias.decode().partition(" ")
+            if time.time() - float(fetched_at or 0) < settings.IMAGE_PROXY_MAX_AGE_SECONDS:
+                return digest
+            stale_digest = digest
+
+    try:
+        digest = store_original(fetch_remote_image(url))
+    except ImageError:
+        if stale_digest is None:
+            raise
+        return stale_digest
+    image_cache.put(alias_path, f"{digest} {int(time.time())}".encode())
+    return digest
+
+def variant_digest(digest: str, width: Optional[int], height: Optional[int], fmt: str) -> str:
+    """Name of a resized variant, derived from the original and the resize recipe"""
+    recipe = f"{digest}:{width or 0}x{height or 0}:{fmt}:q{VARIANT_QUALITY}"
+    return _sha256(recipe.encode())
+
+def render_variant(data: bytes, width: Optional[int], height: Optional[int], fmt: str) -> bytes:
+    """
+    Resize an original to fit inside width x height (keeping aspect ratio)
+    Raises ImageError when Pillow cannot decode or convert it (verify() at upload misses some).
+    """
+    pil_format, _ = VARIANT_FORMATS[fmt]
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail((width or MAX_DIMENSION, height or MAX_DIMENSION), Image.LANCZOS)
+            if pil_format == "JPEG" and img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            output = io.BytesIO()
+            img.save(output, pil_format, quality=VARIANT_QUALITY, optimize=True)
+            return output.getvalue()
+    except Exception:
+        raise ImageError("Image could not be decoded")
+
+def get_variant(digest: str, width: Optional[int], height: Optional[int], fmt: str) -> Tuple[bytes, str]:
+    """
+    Return (bytes, etag) for a resized variant, generating and caching it on first use
+    Raises LookupError when neither the variant nor its original is cached, and ImageError
+    when the original cannot be decoded.
+    """
+    etag = variant_digest(digest, width, height, fmt)
+    relative_path = _cache_path("variants", etag, "." + fmt)
+
+    data = image_cache.get(relative_path)
+    if data is None:
+        original = image_cache.get(_cache_path("originals", digest))
+        if original is None:
+            raise LookupError("Original image not found")
+        data = render_variant(original, width, height, fmt)
+        image_cache.put(relative_path, data)
+
+    return data, etag
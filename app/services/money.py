@@ -0,0 +1,33 @@
+"""
+Money helpers - amounts are stored as integer santim (1 ETB = 100 santim)
+Integers add up exactly, unlike floats. The API still speaks Birr: request schemas
+take a Decimal with at most 2 decimal places and response schemas convert back.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Annotated, Union
+
+from pydantic import BeforeValidator, Field, PlainSerializer
+
+SANTIM_PER_BIRR = 100
+_CENT = Decimal("0.01")
+
+def to_santim(amount: Union[Decimal, int, float, str]) -> int:
+    """Convert a Birr amount to integer santim"""
+    return int((Decimal(str(amount)).quantize(_CENT, rounding=ROUND_HALF_UP) * SANTIM_PER_BIRR))
+
+def to_birr(santim: int) -> Decimal:
+    """Convert integer santim to an exact Birr Decimal"""
+    return (Decimal(santim) / SANTIM_PER_BIRR).quantize(_CENT)
+
+# Birr amount sent by clients, e.g. 2699.99
+BirrAmount = Annotated[Decimal, Field(ge=0, decimal_places=2)]
+
+# Birr amount in responses - JSON numbers like before, not Decimal strings
+Money = Annotated[Decimal, PlainSerializer(float, return_type=float, when_used="json")]
+
+# Response field read from a *_santim column, e.g. Field(validation_alias="price_santim")
+SantimAsBirr = Annotated[
+    Decimal,
+    BeforeValidator(lambda value: to_birr(value) if isinstance(value, int) else value),
+    PlainSerializer(float, return_type=float, when_used="json")
+]
@@ -0,0 +1,239 @@
+"""
+Order archive - moves finished orders out of the hot orders tables
+Delivered and cancelled orders older than ORDER_ARCHIVE_AFTER_DAYS are copied into
+monthly SQLite files (order_archive/orders_2026_01.db, ...) in small batches and then
+deleted from orders/order_items. The main database keeps an index row per archived
+order, so single orders and order feeds can still be read from the right file.
+"""
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import MetaData, Table, Column, Index, create_engine, select, func
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import engine
+from ..models.order import Order, OrderItem, OrderStatus
+from ..models.order_archive import ArchivedOrder, ArchivedProductSales
+from .sync import changed_since
+
+# Orders in these states never change again, so they are safe to archive
+ARCHIVABLE_STATUSES = [OrderStatus.DELIVERED, OrderStatus.CANCELLED]
+
+def _archive_table(table: Table, metadata: MetaData) -> Table:
+    """Same columns as a hot table, without foreign keys (users and products aren't in the file)"""
+    return Table(table.name, metadata, *[
+        Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable)
+        for column in table.columns
+    ])
+
+archive_metadata = MetaData()
+archived_orders_table = _archive_table(Order.__table__, archive_metadata)
+archived_items_table = _archive_table(OrderItem.__table__, archive_metadata)
+Index("ix_order_items_order_id", archived_items_table.c.order_id)
+
+_engines: Dict[str, Engine] = {}
+_engines_lock = threading.Lock()
+
+def partition_for(created_at: Optional[datetime]) -> str:
+    """Name of the monthly archive file an order belongs to"""
+    return created_at.strftime("%Y_%m") if created_at else "undated"
+
+def _archive_path(partition: str) -> str:
+    return os.path.join(settings.ORDER_ARCHIVE_DIR, f"orders_{partition}.db")
+
+def _archive_engine(partition: str, create: bool = False) -> Optional[Engine]:
+    """Engine for one archive file (None if it doesn't exist and create is False)"""
+    with _engines_lock:
+        archive_engine = _engines.get(partition)
+        if archive_engine is not None:
+            return archive_engine
+
+        path = _archive_path(partition)
+        if not os.path.exists(path):
+            if not create:
+                return None
+            os.makedirs(settings.ORDER_ARCHIVE_DIR, exist_ok=True)
+
+        archive_engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+        archive_metadata.create_all(archive_engine)
+        _engines[partition] = archive_engine
+        return archive_engine
+
+def _add_sales(connection, order_rows, item_rows):
+    """Fold the delivered orders of a batch into the per-product sales rollup"""
+    delivered = {row["id"] for row in order_rows if row["status"] == OrderStatus.DELIVERED}
+    sales = defaultdict(lambda: [0, 0])
+    for item in item_rows:
+        if item["order_id"] in delivered:
+            sales[item["product_id"]][0] += item["quantity"]
+            sales[item["product_id"]][1] += item["total_price_santim"]
+
+    rollup = ArchivedProductSales.__table__
+    for product_id, (units, revenue) in sales.items():
+        updated = connection.execute(
+            rollup.update().where(rollup.c.product_id == product_id).values(
+                units_sold=rollup.c.units_sold + units,
+                revenue_santim=rollup.c.revenue_santim + revenue
+            )
+        ).rowcount
+        if not updated:
+            connection.execute(rollup.insert().values(product_id=product_id, units_sold=units, revenue_santim=revenue))
+
+def _drop_copies(partition_of: Dict[int, str]):
+    """Remove archive copies of orders that stayed in the hot tables"""
+    ids_by_partition = defaultdict(list)
+    for order_id, partition in partition_of.items():
+        ids_by_partition[partition].append(order_id)
+    for partition, order_ids in ids_by_partition.items():
+        with _archive_engine(partition, create=True).begin() as archive:
+            archive.execute(archived_items_table.delete().where(archived_items_table.c.order_id.in_(order_ids)))
+            archive.execute(archived_orders_table.delete().where(archived_orders_table.c.id.in_(order_ids)))
+
+def archive_orders(older_than_days: Optional[float] = None, batch_size: Optional[int] = None, pause_seconds: float = 0.0) -> int:
+    """
+    Move finished orders older than older_than_days into the archive files, batch by batch
+    Each batch is first copied to its archive files, then deleted from the hot tables and
+    recorded in one short transaction. If the job is interrupted in between, the next
+    run copies the same orders again (replacing the copies) and carries on.
+    Returns the number of orders archived.
+    """
+    if older_than_days is None:
+        older_than_days = settings.ORDER_ARCHIVE_AFTER_DAYS
+    batch_size = batch_size or settings.ORDER_ARCHIVE_BATCH_SIZE
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    orders, items = Order.__table__, OrderItem.__table__
+
+    archived = 0
+    last_id = 0
+    while True:
+        with engine.begin() as connection:
+            # SQLite hands out max(id) + 1 as the next id, so the newest order always stays
+            # in the hot table - otherwise an archived order id could be given out again
+            newest_id = connection.execute(select(func.max(orders.c.id))).scalar() or 0
+            order_rows = connection.execute(
+                select(orders).where(
+                    orders.c.id > last_id,
+                    orders.c.id < newest_id,
+                    orders.c.status.in_(ARCHIVABLE_STATUSES),
+                    orders.c.created_at < cutoff
+                ).order_by(orders.c.id).limit(batch_size)
+            ).mappings().all()
+            if not order_rows:
+                break
+            order_ids = [row["id"] for row in order_rows]
+            item_rows = connection.execute(select(items).where(items.c.order_id.in_(order_ids))).mappings().all()
+
+        # 1. Copy the batch into the monthly archive files
+        partitions = defaultdict(list)
+        for row in order_rows:
+            partitions[partition_for(row["created_at"])].append(row)
+        partition_of = {row["id"]: partition for partition, rows in partitions.items() for row in rows}
+
+        for partition, rows in partitions.items():
+            ids = {row["id"] for row in rows}
+            with _archive_engine(partition, create=True).begin() as archive:
+                archive.execute(archived_orders_table.insert().prefix_with("OR REPLACE"), [dict(row) for row in rows])
+                partition_items = [dict(item) for item in item_rows if item["order_id"] in ids]
+                if partition_items:
+                    archive.execute(archived_items_table.insert().prefix_with("OR REPLACE"), partition_items)
+
+        # 2. Remove the orders from the hot tables and record where they went. The DELETE
+        # repeats the archive conditions and the copied status: an order changed since it
+        # was copied stays live, and its stale copy is dropped from the archive below.
+        with engine.begin() as connection:
+            moved = [
+                row for row in order_rows
+                if connection.execute(orders.delete().where(
+                    orders.c.id == row["id"],
+                    orders.c.status == row["status"],
+                    orders.c.status.in_(ARCHIVABLE_STATUSES),
+                    orders.c.created_at < cutoff
+                )).rowcount == 1
+            ]
+            moved_ids = {row["id"] for row in moved}
+            if moved:
+                connection.execute(ArchivedOrder.__table__.insert(), [
+                    {
+                        "order_id": row["id"],
+                        "order_number": row["order_number"],
+                        "user_id": row["user_id"],
+                        "created_at": row["created_at"],
+                        "partition": partition_of[row["id"]],
+                    }
+                    for row in moved
+                ])
+                _add_sales(connection, moved, [item for item in item_rows if item["order_id"] in moved_ids])
+                connection.execute(items.delete().where(items.c.order_id.in_(sorted(moved_ids))))
+
+        _drop_copies({row["id"]: partition_of[row["id"]] for row in order_rows if row["id"] not in moved_ids})
+        archived += len(moved)
+        last_id = order_ids[-1]
+        if pause_seconds:
+            time.sleep(pause_seconds)  # Give the app's writers a turn
+
+    return archived
+
+def load_archived_orders(entries: List[ArchivedOrder]) -> List[dict]:
+    """Read archived orders (with their items) from their files, in the order of entries"""
+    ids_by_partition = defaultdict(list)
+    for entry in entries:
+        ids_by_partition[entry.partition].append(entry.order_id)
+
+    loaded = {}
+    for partition, order_ids in ids_by_partition.items():
+        archive_engine = _archive_engine(partition)
+        if archive_engine is None:
+            continue  # Archive file was removed
+        with archive_engine.connect() as archive:
+            order_rows = archive.execute(
+                select(archived_orders_table).where(archived_orders_table.c.id.in_(order_ids))
+            ).mappings().all()
+            item_rows = archive.execute(
+                select(archived_items_table).where(archived_items_table.c.order_id.in_(order_ids)).order_by(archived_items_table.c.id)
+            ).mappings().all()
+
+        for row in order_rows:
+            loaded[row["id"]] = dict(row, order_items=[], archived=True)
+        for item in item_rows:
+            loaded[item["order_id"]]["order_items"].append(dict(item))
+
+    return [loaded[entry.order_id] for entry in entries if entry.order_id in loaded]
+
+def _entries_query(db: Session, user_id: Optional[int]):
+    query = db.query(ArchivedOrder)
+    if user_id is not None:
+        query = query.filter(ArchivedOrder.user_id == user_id)
+    return query
+
+def get_archived_order(db: Session, order_id: int, user_id: Optional[int] = None) -> Optional[dict]:
+    """An archived order by id (optionally only if it belongs to user_id)"""
+    entry = _entries_query(db, user_id).filter(ArchivedOrder.order_id == order_id).first()
+    if entry is None:
+        return None
+    orders = load_archived_orders([entry])
+    return orders[0] if orders else None
+
+def is_archived(db: Session, order_id: int) -> bool:
+    return db.query(ArchivedOrder.order_id).filter(ArchivedOrder.order_id == order_id).first() is not None
+
+def archived_entries(db: Session, user_id: Optional[int] = None, limit: int = 100) -> List[ArchivedOrder]:
+    """Index rows of the newest archived orders - no archive file is opened"""
+    return _entries_query(db, user_id).order_by(
+        ArchivedOrder.created_at.desc(), ArchivedOrder.order_id.desc()
+    ).limit(limit).all()
+
+def archived_since(db: Session, since: datetime, limit: int) -> Optional[List[int]]:
+    """Ids of the orders archived since a time, or None if there are more than limit"""
+    order_ids = [row[0] for row in db.query(ArchivedOrder.order_id).filter(
+        changed_since(ArchivedOrder.archived_at, since)
+    ).limit(limit + 1)]
+    return order_ids if len(order_ids) <= limit else None
+
+def count_archived_orders(db: Session, user_id: Optional[int] = None) -> int:
+    return _entries_query(db, user_id).count()
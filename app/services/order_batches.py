@@ -0,0 +1,154 @@
+"""
+Order batches - optional group commit for high-volume order placement
+With ORDER_GROUP_COMMIT on, POST /orders/ queues its work instead of committing itself.
+A single writer thread takes whatever orders are waiting (up to ORDER_BATCH_MAX_SIZE),
+applies them in one transaction and commits once, so a flash sale pays for one commit
+(and fsync) per batch instead of one per order. Each order runs in its own savepoint:
+an order that fails (out of stock, unknown product) is rolled back on its own and only
+its caller gets the error. Every caller waits on its own future for its result.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import SessionLocal
+
+class OrderJob:
+    """One queued order: the work to run in the batch transaction and the caller's future"""
+    __slots__ = ("work", "on_commit", "future", "result")
+
+    def __init__(self, work: Callable[[Session], Any], on_commit: Optional[Callable[[Any], None]]):
+        self.work = work
+        self.on_commit = on_commit
+        self.future = Future()
+        self.result = None
+
+class OrderBatcher:
+    """Background thread that applies queued orders in batches, one transaction per batch"""
+
+    def __init__(self, max_batch_size: int, max_wait_seconds: float):
+        self.max_batch_size = max_batch_size
+        self.max_wait_seconds = max_wait_seconds
+        self._queue = queue.Queue()
+        self._thread = None
+        # Batch sizes since start, for the benchmark and for tuning ORDER_BATCH_MAX_SIZE
+        self.batches = 0
+        self.orders = 0
+
+    def submit(self, work: Callable[[Session], Any], on_commit: Optional[Callable[[Any], None]] = None) -> Any:
+        """
+        Run work(db) in the next batch and return its result once the batch is committed
+        work must not commit. Its result must not hold ORM objects, as the writer's session
+        is gone by the time the caller sees it. on_commit(result) runs in the writer right
+        after the commit, in the order the orders were applied. Errors raised by work are
+        raised here, in the caller's thread.
+        """
+        job = OrderJob(work, on_commit)
+        if self._thread is None:
+            self._apply([job])  # Not running (scripts) - apply it right away
+        else:
+            self._queue.put(job)
+        return job.future.result()
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="order-batcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Apply the orders still queued, then stop the thread"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        # Orders queued while the thread was stopping
+        while True:
+            try:
+                job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                self._apply([job])
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            job = self._queue.get()
+            if job is None:
+                break
+            batch = [job]
+            # Take everything that queued up during the last commit, waiting a little for more if configured
+            deadline = time.monotonic() + self.max_wait_seconds
+            while len(batch) < self.max_batch_size:
+                try:
+                    job = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if job is None:
+                    stopping = True
+                    break
+                batch.append(job)
+            self._apply(batch)
+
+    def _apply(self, batch: List[OrderJob]):
+        """Apply a batch in one transaction, falling back to one transaction per order if the commit fails"""
+        try:
+            committed = self._commit(batch)
+        except Exception as e:
+            if len(batch) == 1:
+                batch[0].future.set_exception(e)
+                return
+            print(f"⚠️ Order batch of {len(batch)} failed to commit, applying the orders one by one: {e}")
+            for job in batch:
+                self._apply([job])
+            return
+
+        self.batches += 1
+        self.orders += len(committed)
+        for job in committed:
+            try:
+                if job.on_commit is not None:
+                    job.on_commit(job.result)
+            except Exception as e:
+                print(f"⚠️ Order follow-up failed after commit: {e}")  # The order itself is saved
+            job.future.set_result(job.result)
+
+    def _commit(self, batch: List[OrderJob]) -> List[OrderJob]:
+        """Run every job in its own savepoint and commit once, returns the jobs that succeeded"""
+        db = SessionLocal()
+        committed, failed = [], []
+        try:
+            if db.get_bind().dialect.name == "sqlite":
+                # Take the write lock up front. pysqlite would otherwise start the transaction
+                # at the first savepoint, and releasing that savepoint would commit on its own.
+                db.execute(text("BEGIN IMMEDIATE"))
+            for job in batch:
+                savepoint = db.begin_nested()
+                try:
+                    job.result = job.work(db)
+                    savepoint.commit()
+                    committed.append(job)
+                except Exception as e:
+                    savepoint.rollback()
+                    failed.append((job, e))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+        # Only now - if the commit had failed, these orders would be retried with the others
+        for job, e in failed:
+            job.future.set_exception(e)
+        return committed
+
+# Shared batcher used by the orders router, started with the app when ORDER_GROUP_COMMIT is on
+order_batcher = OrderBatcher(settings.ORDER_BATCH_MAX_SIZE, settings.ORDER_BATCH_WAIT_MS / 1000)
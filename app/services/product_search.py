@@ -0,0 +1,122 @@
+"""
+Product search - shared product filters and faceted search counts
+Facet counts (per category, price range and stock status) for the current
+filters are computed together in one GROUP BY query and memoized per filter set.
+"""
+from typing import Optional
+
+from sqlalchemy import func, case, exists
+from sqlalchemy.orm import Session, Query
+
+from ..config import settings
+from ..models.product import Product, ProductVariant, Category
+from .catalog_stats import stats_cache
+from .variants import normalize_size, normalize_color
+from .money import to_santim
+
+# Variant filters matching at most this many rows use an IN list instead of EXISTS
+SELECTIVE_VARIANT_MATCHES = 1000
+
+def apply_product_filters(
+    db: Session,
+    query: Query,
+    category_id: Optional[int] = None,
+    search: Optional[str] = None,
+    size: Optional[str] = None,
+    color: Optional[str] = None
+) -> Query:
+    """Add the storefront filters to a query over products"""
+    if category_id:
+        query = query.filter(Product.category_id == category_id)
+
+    if search:
+        query = query.filter(Product.name.contains(search))
+
+    # Size and color must match the same variant
+    if size or color:
+        variant_filters = [ProductVariant.is_active == True]
+        if size:
+            variant_filters.append(ProductVariant.size == normalize_size(size))
+        if color:
+            variant_filters.append(ProductVariant.color == normalize_color(color))
+
+        # Rare options: collect the few matching products through the size/color indexes.
+        # Common options: probe each product's variants and stop as soon as the page is full.
+        matching_products = db.query(ProductVariant.product_id).filter(*variant_filters)
+        if matching_products.limit(SELECTIVE_VARIANT_MATCHES + 1).count() <= SELECTIVE_VARIANT_MATCHES:
+            query = query.filter(Product.id.in_(matching_products))
+        else:
+            query = query.filter(exists().where(ProductVariant.product_id == Product.id, *variant_filters))
+
+    return query
+
+def price_ranges():
+    """(min, max) for each price facet, the last range has no upper bound"""
+    bounds = [0] + list(settings.PRICE_FACET_BOUNDS)
+    return [(low, high) for low, high in zip(bounds, bounds[1:] + [None])]
+
+def _price_range_index():
+    """SQL expression giving the position of a product's price in price_ranges()"""
+    bounds = settings.PRICE_FACET_BOUNDS
+    return case(
+        *[(Product.price_santim < to_santim(bound), position) for position, bound in enumerate(bounds)],
+        else_=len(bounds)
+    )
+
+def compute_facets(
+    db: Session,
+    category_id: Optional[int] = None,
+    search: Optional[str] = None,
+    size: Optional[str] = None,
+    color: Optional[str] = None
+) -> dict:
+    """
+    Facet counts for the current filters, from a single aggregated query
+    Category counts ignore the selected category, so shoppers can see how many
+    results the other categories would give. The other facets and the total
+    respect every filter.
+    """
+    key = ("facets", category_id, search, normalize_size(size), normalize_color(color))
+
+    def compute():
+        price_range = _price_range_index()
+        in_stock = case((Product.stock_quantity > 0, 1), else_=0)
+
+        query = db.query(
+            Product.category_id,
+            Category.name,
+            price_range,
+            in_stock,
+            func.count(Product.id)
+        ).outerjoin(
+            Category, Category.id == Product.category_id
+        ).filter(Product.is_active == True)
+        query = apply_product_filters(db, query, search=search, size=size, color=color)
+        rows = query.group_by(Product.category_id, Category.name, price_range, in_stock).all()
+
+        # Fold the grouped rows into the individual facets
+        category_counts = {}
+        price_counts = [0] * len(price_ranges())
+        stock_counts = {"in_stock": 0, "out_of_stock": 0}
+        total = 0
+        for row_category_id, category_name, range_position, row_in_stock, count in rows:
+            entry = category_counts.setdefault(row_category_id, {"category_id": row_category_id, "name": category_name, "count": 0})
+            entry["count"] += count
+
+            if category_id and row_category_id != category_id:
+                continue
+            total += count
+            price_counts[range_position] += count
+            stock_counts["in_stock" if row_in_stock else "out_of_stock"] += count
+
+        return {
+            "total": total,
+            "categories": sorted(category_counts.values(), key=lambda entry: -entry["count"]),
+            "price_ranges": [
+                {"min_price": low, "max_price": high, "count": count}
+                for (low, high), count in zip(price_ranges(), price_counts)
+            ],
+            "stock": stock_counts,
+        }
+
+    return stats_cache.get_or_compute(key, compute)
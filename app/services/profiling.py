@@ -0,0 +1,265 @@
+"""
+Request profiling - opt-in stack samples of sampled and slow requests
+While a profiled request runs, a background thread records the Python stack of every
+busy thread every PROFILING_INTERVAL_MS. Sync endpoints run in a thread pool, so stacks
+are taken process-wide, one flamegraph root per thread. A PROFILING_SAMPLE_RATE share
+of requests is always kept. When PROFILING_SLOW_MS is set, every request is recorded
+and kept only if it turned out to be slower than that. At most PROFILING_MAX_RECORDINGS
+requests are recorded at once; the sampler keeps one shared buffer of samples and each
+recording counts its own stretch of it when it closes. Profiles are written in the
+folded stack format (flamegraph.pl, inferno, speedscope) to PROFILING_DIR, which keeps
+only the newest PROFILING_MAX_FILES.
+"""
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from ..config import settings
+
+# Innermost frames of a thread that is waiting for work, not doing any
+IDLE_FRAMES = {
+    ("threading.py", "wait"),  # Thread pool workers, background threads
+    ("queue.py", "get"),
+    ("selectors.py", "select"),  # Event loop with nothing to do
+    ("base_events.py", "run_until_complete"),  # Event loop in C (uvloop)
+}
+MAX_STACK_DEPTH = 200
+PROFILE_ID = re.compile(r"^[0-9T]+-\d+-\d+$")
+
+class Recording:
+    """Stacks sampled while one request was running"""
+
+    def __init__(self, first_sample: int):
+        self.first_sample = first_sample  # Position in the sampler's buffer when the request started
+        self.stacks = Counter()  # folded stack -> samples, counted when the recording closes
+        self.samples = 0
+        self.overlapping = 0  # Most other requests recorded at the same time
+        self.started = time.perf_counter()
+        self.duration_ms = None
+
+class StackSampler:
+    """Background thread that samples busy threads while at least one recording is open"""
+
+    def __init__(self, interval_seconds: float, max_recordings: int):
+        self.interval_seconds = interval_seconds
+        self.max_recordings = max_recordings
+        self._recordings = set()
+        self._buffer = []  # Busy stacks of each sample since the oldest open recording started
+        self._buffer_start = 0  # Position of _buffer[0] among all samples taken
+        self._labels = {}  # code object -> frame label
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def open(self) -> Optional[Recording]:
+        """Start recording, or None when max_recordings requests are already being recorded"""
+        with self._lock:
+            if len(self._recordings) >= self.max_recordings:
+                return None
+            recording = Recording(self._buffer_start + len(self._buffer))
+            self._recordings.add(recording)
+            for other in self._recordings:
+                other.overlapping = max(other.overlapping, len(self._recordings) - 1)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return recording
+
+    def close(self, recording: Recording):
+        with self._lock:
+            if recording not in self._recordings:
+                return
+            self._recordings.discard(recording)
+            recording.duration_ms = (time.perf_counter() - recording.started) * 1000
+            samples = self._buffer[recording.first_sample - self._buffer_start:]
+
+            # Drop the samples no open recording needs any more
+            keep_from = min((other.first_sample for other in self._recordings),
+                            default=self._buffer_start + len(self._buffer))
+            del self._buffer[:keep_from - self._buffer_start]
+            self._buffer_start = keep_from
+
+        recording.samples = len(samples)
+        for stacks in samples:
+            recording.stacks.update(stacks)
+
+    def _run(self):
+        while True:
+            self._wake.wait()
+            with self._lock:
+                if not self._recordings:
+                    self._wake.clear()
+                    continue
+            self._sample()
+            time.sleep(self.interval_seconds)
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+            self._labels[code] = label
+        return label
+
+    def _sample(self):
+        own_id = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks = []
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            code = frame.f_code
+            if (os.path.basename(code.co_filename), code.co_name) in IDLE_FRAMES:
+                continue
+            labels = []
+            while frame is not None and len(labels) < MAX_STACK_DEPTH:
+                labels.append(self._label(frame.f_code))
+                frame = frame.f_back
+            labels.append(names.get(thread_id, f"thread-{thread_id}"))
+            stacks.append(";".join(reversed(labels)))
+
+        with self._lock:
+            if self._recordings:
+                self._buffer.append(stacks)
+
+def _short_path(filename: str) -> str:
+    """File name relative to the sys.path entry it was imported from"""
+    best = ""
+    for entry in sys.path:
+        if entry and filename.startswith(entry) and len(entry) > len(best):
+            best = entry
+    return os.path.relpath(filename, best) if best else filename
+
+class ProfileStore:
+    """Directory holding the newest max_files profiles, the oldest are deleted first"""
+
+    def __init__(self, directory: str, max_files: int):
+        self.directory = directory
+        self.max_files = max_files
+        self._counter = 0
+        self._lock = threading.Lock()
+
+    def _write(self, path: str, data: str):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(temp_path, path)  # Readers never see a partially written file
+
+    def save(self, recording: Recording, info: dict) -> str:
+        """Write a profile and its details, returns the profile id"""
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            self._counter += 1
+            # Ids sort by time, and several worker processes can share the directory
+            profile_id = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{os.getpid()}-{self._counter}"
+
+        folded = "".join(f"{stack} {count}\n" for stack, count in recording.stacks.most_common())
+        self._write(os.path.join(self.directory, profile_id + ".folded"), folded)
+        # The details file is written last - a profile is listed once it exists
+        info = dict(info, id=profile_id, samples=recording.samples, overlapping_requests=recording.overlapping)
+        self._write(os.path.join(self.directory, profile_id + ".json"), json.dumps(info))
+
+        self._evict()
+        return profile_id
+
+    def _ids(self) -> List[str]:
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-len(".json")] for name in names if name.endswith(".json"))
+
+    def _evict(self):
+        ids = self._ids()
+        for profile_id in ids[:max(0, len(ids) - self.max_files)]:
+            for extension in (".json", ".folded"):
+                try:
+                    os.remove(os.path.join(self.directory, profile_id + extension))
+                except FileNotFoundError:
+                    pass  # Another worker removed it first
+
+    def list(self) -> List[dict]:
+        """Details of the stored profiles, newest first"""
+        profiles = []
+        for profile_id in reversed(self._ids()):
+            try:
+                with open(os.path.join(self.directory, profile_id + ".json"), encoding="utf-8") as f:
+                    profiles.append(json.load(f))
+            except (FileNotFoundError, ValueError):
+                continue
+        return profiles
+
+    def path(self, profile_id: str) -> Optional[str]:
+        """Path of a profile's folded stacks (None for unknown or malformed ids)"""
+        if not PROFILE_ID.match(profile_id):
+            return None
+        path = os.path.join(self.directory, profile_id + ".folded")
+        return path if os.path.exists(path) else None
+
+# Shared instances used by the middleware and the profiles router
+stack_sampler = StackSampler(settings.PROFILING_INTERVAL_MS / 1000, settings.PROFILING_MAX_RECORDINGS)
+profile_store = ProfileStore(settings.PROFILING_DIR, settings.PROFILING_MAX_FILES)
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware that records sampled and slow requests
+    A request is timed until its response starts, which covers the endpoint and the
+    response serialization (streamed bodies, like the event stream, are not included).
+    """
+
+    def __init__(self, app, sample_rate: Optional[float] = None, slow_ms: Optional[float] = None):
+        self.app = app
+        self.sample_rate = settings.PROFILING_SAMPLE_RATE if sample_rate is None else sample_rate
+        self.slow_ms = settings.PROFILING_SLOW_MS if slow_ms is None else slow_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"].startswith("/profiles"):
+            await self.app(scope, receive, send)
+            return
+
+        sampled = random.random() < self.sample_rate
+        if not sampled and not self.slow_ms:
+            await self.app(scope, receive, send)
+            return
+
+        recording = stack_sampler.open()
+        if recording is None:
+            await self.app(scope, receive, send)
+            return
+        status_code = None
+
+        async def send_and_stop(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                stack_sampler.close(recording)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_stop)
+        finally:
+            stack_sampler.close(recording)
+            slow = bool(self.slow_ms) and recording.duration_ms >= self.slow_ms
+            if (sampled or slow) and recording.samples:
+                info = {
+                    "created_at": datetime.utcnow().isoformat(),
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "status_code": status_code,
+                    "duration_ms": round(recording.duration_ms, 1),
+                    "reason": "slow" if slow else "sampled",
+                }
+                try:
+                    await run_in_threadpool(profile_store.save, recording, info)
+                except OSError as e:
+                    print(f"⚠️ Could not save request profile: {e}")
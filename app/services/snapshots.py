@@ -0,0 +1,461 @@
+"""
+Product snapshots - pre-rendered JSON for product pages and category listings
+GET /products/{id} and the pages of GET /products/?category_id=... are rendered once,
+written to SNAPSHOT_DIR and kept in memory with a gzipped copy, so those requests
+are answered without a database query or pydantic validation. Writers report the
+products they changed, and a background thread re-renders just those products and
+patches them into the listing page that holds them; a whole category is rebuilt only
+when products join or leave it. Files are replaced, never edited, so other workers
+notice a rewrite from the file's inode and modification time. Each snapshot has its
+own lock, so a render for a read never waits for unrelated renders, and the writer
+thread also re-renders files older than SNAPSHOT_MAX_AGE_SECONDS, so a render from
+another worker that read older rows can't last.
+"""
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict, defaultdict, namedtuple
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session, selectinload
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models.product import Product, Category
+
+# A rendered response body, its gzipped copy (None when disabled) and its ETag
+Snapshot = namedtuple("Snapshot", "body gzip_body etag")
+
+# A re-rendered product: the category and body it was listed with before, and the ones
+# it has now (None when it had no snapshot, or is no longer shown)
+Rendered = namedtuple("Rendered", "product_id old_category old_body new_category new_body")
+
+RENDER_BATCH_SIZE = 500
+
+class SnapshotStore:
+    """Snapshot files on disk, with the most used ones kept in memory"""
+
+    def __init__(self, directory: str, max_entries: int, compress: bool, not_found_seconds: float = 0):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.compress = compress
+        self.not_found_seconds = not_found_seconds
+        self._memory = OrderedDict()  # name -> (file version, Snapshot), least recently used first
+        self._not_found = {}  # name -> monotonic time until which it is known not to exist
+        self._lock = threading.Lock()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def get(self, name: str) -> Optional[Snapshot]:
+        path = self._path(name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._memory.pop(name, None)
+            return None
+        version = (stat.st_ino, stat.st_mtime_ns)  # Every rewrite (by any worker) replaces the file
+
+        with self._lock:
+            entry = self._memory.get(name)
+            if entry is not None and entry[0] == version:
+                self._memory.move_to_end(name)
+                return entry[1]
+
+        try:
+            with open(path, "rb") as f:
+                body = f.read()
+        except FileNotFoundError:
+            return None
+        snapshot = Snapshot(
+            body,
+            gzip.compress(body, compresslevel=6, mtime=0) if self.compress else None,
+            hashlib.sha256(body).hexdigest()[:32]
+        )
+        with self._lock:
+            self._memory[name] = (version, snapshot)
+            self._memory.move_to_end(name)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+        return snapshot
+
+    def put(self, name: str, body: bytes, touch: bool = False):
+        """Write a snapshot atomically, unless it already has this content (then only touch its mtime if asked)"""
+        self.forget_not_found(name)
+        existing = self.get(name)
+        if existing is not None and existing.body == body:
+            if touch:
+                os.utime(self._path(name))
+            return
+        path = self._path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            f.write(body)
+        os.replace(temp_path, path)  # Readers never see a partially written file
+
+    def delete(self, name: str):
+        with self._lock:
+            self._memory.pop(name, None)
+        try:
+            os.remove(self._path(name))
+        except FileNotFoundError:
+            pass
+
+    def not_found(self, name: str) -> bool:
+        """Whether a render recently found nothing to write for name (no product or category)"""
+        with self._lock:
+            until = self._not_found.get(name)
+            if until is not None and until < time.monotonic():
+                del self._not_found[name]
+                until = None
+        return until is not None
+
+    def forget_not_found(self, name: str):
+        with self._lock:
+            self._not_found.pop(name, None)
+
+    def remember_not_found(self, name: str):
+        if not self.not_found_seconds:
+            return
+        with self._lock:
+            self._not_found[name] = time.monotonic() + self.not_found_seconds
+            if len(self._not_found) > self.max_entries:
+                self._not_found.pop(next(iter(self._not_found)))
+
+    def older_than(self, folder: str, seconds: float) -> List[str]:
+        """Names of the snapshot files under folder last written more than seconds ago"""
+        cutoff = time.time() - seconds
+        names = []
+        for root, _, files in os.walk(self._path(folder)):
+            for file_name in files:
+                path = os.path.join(root, file_name)
+                try:
+                    if file_name.endswith(".json") and os.stat(path).st_mtime < cutoff:
+                        names.append(os.path.relpath(path, self.directory).replace(os.sep, "/"))
+                except FileNotFoundError:
+                    pass
+        return names
+
+    def clear(self):
+        """Remove every snapshot (they are rendered again when next requested)"""
+        with self._lock:
+            self._memory.clear()
+            self._not_found.clear()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+class SnapshotLocks:
+    """One lock per snapshot, so renders of different products and categories run side by side"""
+
+    def __init__(self):
+        self._locks = {}  # name -> [lock, threads holding or waiting for it]
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def hold(self, name: str):
+        with self._lock:
+            entry = self._locks.setdefault(name, [threading.RLock(), 0])
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._locks[name]
+
+# Shared store used by the products router
+snapshot_store = SnapshotStore(
+    settings.SNAPSHOT_DIR, settings.SNAPSHOT_MEMORY_MAX_ENTRIES, settings.SNAPSHOT_GZIP, settings.SNAPSHOT_NOT_FOUND_SECONDS
+)
+snapshot_locks = SnapshotLocks()
+
+EMPTY_PAGE = Snapshot(b"[]", gzip.compress(b"[]", mtime=0) if settings.SNAPSHOT_GZIP else None, "empty")
+
+def _product_name(product_id: int) -> str:
+    return f"products/{product_id}.json"
+
+def _page_name(category_id: int, page: int) -> str:
+    return f"categories/{category_id}/page-{page}.json"
+
+def _index_name(category_id: int) -> str:
+    return f"categories/{category_id}/index.json"
+
+def _category_lock(category_id: int) -> str:
+    return f"categories/{category_id}"
+
+def _render_products(db: Session, product_ids: List[int], touch: bool = False) -> List[Rendered]:
+    """Write snapshots of the given products, returns what changed for each"""
+    # Imported here because the products router imports this module
+    from ..routers.products import ProductResponse
+
+    rendered = []
+    for start in range(0, len(product_ids), RENDER_BATCH_SIZE):
+        batch = product_ids[start:start + RENDER_BATCH_SIZE]
+        products = {product.id: product for product in db.query(Product).options(
+            selectinload(Product.category), selectinload(Product.variants)
+        ).filter(Product.id.in_(batch)).all()}
+
+        for product_id in batch:
+            name = _product_name(product_id)
+            with snapshot_locks.hold(name):
+                old = snapshot_store.get(name)
+                old_category = json.loads(old.body)["category"]["id"] if old is not None else None
+                product = products.get(product_id)
+                if product is not None and product.is_active:
+                    body = ProductResponse.model_validate(product).model_dump_json().encode()
+                    snapshot_store.put(name, body, touch=touch)
+                    rendered.append(Rendered(product_id, old_category, old and old.body, product.category_id, body))
+                else:
+                    snapshot_store.delete(name)
+                    rendered.append(Rendered(product_id, old_category, old and old.body, None, None))
+    return rendered
+
+def _render_category(db: Session, category_id: int, touch: bool = False):
+    """Rebuild a category's listing pages from its product snapshots (only changed pages are written)"""
+    product_ids = [row[0] for row in db.query(Product.id).filter(
+        Product.category_id == category_id,
+        Product.is_active == True
+    ).order_by(Product.id)]
+
+    bodies = {}
+    missing = []
+    for product_id in product_ids:
+        snapshot = snapshot_store.get(_product_name(product_id))
+        if snapshot is None:
+            missing.append(product_id)
+        else:
+            bodies[product_id] = snapshot.body
+    for rendered in _render_products(db, missing):
+        if rendered.new_body is not None:
+            bodies[rendered.product_id] = rendered.new_body
+
+    page_size = settings.SNAPSHOT_PAGE_SIZE
+    page_count = (len(product_ids) + page_size - 1) // page_size
+    for page in range(page_count):
+        page_ids = product_ids[page * page_size:(page + 1) * page_size]
+        snapshot_store.put(
+            _page_name(category_id, page),
+            b"[" + b",".join(bodies[product_id] for product_id in page_ids if product_id in bodies) + b"]",
+            touch=touch
+        )
+
+    old_index = snapshot_store.get(_index_name(category_id))
+    old_count = json.loads(old_index.body)["pages"] if old_index else 0
+    for page in range(page_count, old_count):
+        snapshot_store.delete(_page_name(category_id, page))
+    snapshot_store.put(_index_name(category_id), json.dumps({"pages": page_count}).encode(), touch=touch)
+
+def _patch_pages(db: Session, category_id: int, changes: List[Rendered]) -> bool:
+    """
+    Swap changed products into the listing pages that hold them, without rebuilding the category
+    Returns False if a page doesn't hold the product's old snapshot (then rebuild the category).
+    """
+    pages: Dict[str, bytes] = {}
+    for change in changes:
+        # Listings are in id order, so the products before this one decide its page
+        position = db.query(func.count(Product.id)).filter(
+            Product.category_id == category_id,
+            Product.is_active == True,
+            Product.id < change.product_id
+        ).scalar()
+        name = _page_name(category_id, position // settings.SNAPSHOT_PAGE_SIZE)
+        if name not in pages:
+            page = snapshot_store.get(name)
+            if page is None:
+                return False
+            pages[name] = page.body
+        if pages[name].count(change.old_body) != 1:
+            return False
+        pages[name] = pages[name].replace(change.old_body, change.new_body)
+
+    for name, body in pages.items():
+        snapshot_store.put(name, body)
+    return True
+
+def refresh_products(product_ids: Iterable[int], touch: bool = False):
+    """
+    Re-render changed products and patch them into their categories' listing pages
+    A category is rebuilt only when a product joins or leaves it (created, moved,
+    deactivated or deleted). Categories nobody has read yet are left for the first read.
+    """
+    product_ids = sorted(set(product_ids))
+    if not product_ids:
+        return
+    db = SessionLocal()
+    try:
+        rebuild, patches = set(), defaultdict(list)
+        for rendered in _render_products(db, product_ids, touch):
+            if rendered.old_body == rendered.new_body:
+                continue
+            if rendered.old_body is not None and rendered.new_body is not None and rendered.old_category == rendered.new_category:
+                patches[rendered.new_category].append(rendered)
+            else:
+                rebuild.update(category for category in (rendered.old_category, rendered.new_category) if category is not None)
+
+        for category_id in sorted(rebuild | set(patches)):
+            with snapshot_locks.hold(_category_lock(category_id)):
+                if snapshot_store.get(_index_name(category_id)) is None:
+                    snapshot_store.forget_not_found(_index_name(category_id))  # It may be new
+                    continue
+                if category_id in rebuild or not _patch_pages(db, category_id, patches[category_id]):
+                    _render_category(db, category_id)
+    finally:
+        db.close()
+
+def refresh_old(max_age_seconds: float):
+    """Re-render the products and categories whose snapshots are older than max_age_seconds"""
+    product_ids = sorted(int(name[len("products/"):-len(".json")]) for name in snapshot_store.older_than("products", max_age_seconds))
+    for start in range(0, len(product_ids), RENDER_BATCH_SIZE):
+        with snapshot_writer.flushing():  # Batch by batch, so changes reported meanwhile aren't held up long
+            refresh_products(product_ids[start:start + RENDER_BATCH_SIZE], touch=True)
+
+    for name in snapshot_store.older_than("categories", max_age_seconds):
+        if not name.endswith("/index.json"):
+            continue  # Pages are rewritten with their index
+        category_id = int(name.split("/")[1])
+        with snapshot_writer.flushing(), snapshot_locks.hold(_category_lock(category_id)):
+            db = SessionLocal()
+            try:
+                _render_category(db, category_id, touch=True)
+            finally:
+                db.close()
+
+def rebuild_all() -> int:
+    """Render every active product and category page, returns the number of products"""
+    snapshot_store.clear()
+    db = SessionLocal()
+    try:
+        product_ids = [row[0] for row in db.query(Product.id).filter(Product.is_active == True).order_by(Product.id)]
+        _render_products(db, product_ids)
+        for (category_id,) in db.query(Category.id).all():
+            _render_category(db, category_id)
+        return len(product_ids)
+    finally:
+        db.close()
+
+def product_snapshot(product_id: int) -> Optional[Snapshot]:
+    """The rendered product, rendering it on first use (None if it isn't an active product)"""
+    name = _product_name(product_id)
+    snapshot = snapshot_store.get(name)
+    if snapshot is None and not snapshot_store.not_found(name):
+        with snapshot_locks.hold(name):
+            snapshot = snapshot_store.get(name)  # Rendered while this one waited
+            if snapshot is None and not snapshot_store.not_found(name):
+                db = SessionLocal()
+                try:
+                    _render_products(db, [product_id])
+                finally:
+                    db.close()
+                snapshot = snapshot_store.get(name)
+                if snapshot is None:
+                    snapshot_store.remember_not_found(name)
+    return snapshot
+
+def _stored_page(category_id: int, page: int) -> Optional[Snapshot]:
+    index = snapshot_store.get(_index_name(category_id))
+    if index is None:
+        return None
+    if page >= json.loads(index.body)["pages"]:
+        return EMPTY_PAGE
+    return snapshot_store.get(_page_name(category_id, page))
+
+def category_page(category_id: int, page: int) -> Snapshot:
+    """One rendered page of a category listing, rendering the category on first use (empty if it doesn't exist)"""
+    snapshot = _stored_page(category_id, page)
+    if snapshot is None and not snapshot_store.not_found(_index_name(category_id)):
+        with snapshot_locks.hold(_category_lock(category_id)):
+            snapshot = _stored_page(category_id, page)  # Rendered while this one waited
+            if snapshot is None and not snapshot_store.not_found(_index_name(category_id)):
+                db = SessionLocal()
+                try:
+                    if db.query(Category.id).filter(Category.id == category_id).first() is None:
+                        snapshot_store.remember_not_found(_index_name(category_id))
+                    else:
+                        _render_category(db, category_id)
+                        snapshot = _stored_page(category_id, page)
+                finally:
+                    db.close()
+    return snapshot or EMPTY_PAGE
+
+class SnapshotWriter:
+    """Background thread that re-renders the snapshots of changed products, and of old ones"""
+
+    def __init__(self):
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # Held while rendering, so flush() also waits for a flush in progress
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._refreshed_at = time.monotonic()
+
+    def products_changed(self, product_ids: Iterable[int]):
+        with self._lock:
+            self._pending.update(product_ids)
+        if self._thread is None:
+            self.flush()  # Not running (scripts) - render right away
+        else:
+            self._wake.set()
+
+    @contextmanager
+    def flushing(self):
+        """Hold off flushes, so a render of older rows can't finish after a newer flush"""
+        with self._flush_lock:
+            yield
+
+    def flush(self):
+        """Re-render everything reported so far (failures are logged and retried on the next change)"""
+        with self._flush_lock:
+            with self._lock:
+                product_ids, self._pending = self._pending, set()
+            try:
+                refresh_products(product_ids)
+            except Exception as e:
+                with self._lock:
+                    self._pending.update(product_ids)
+                print(f"⚠️ Product snapshot refresh failed: {e}")
+
+    def refresh_old(self):
+        """Re-render old snapshots, checking about ten times per SNAPSHOT_MAX_AGE_SECONDS"""
+        max_age = settings.SNAPSHOT_MAX_AGE_SECONDS
+        if not max_age or time.monotonic() - self._refreshed_at < max_age / 10:
+            return
+        self._refreshed_at = time.monotonic()
+        try:
+            refresh_old(max_age)
+        except Exception as e:
+            print(f"⚠️ Old snapshot refresh failed: {e}")
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="snapshot-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(timeout=60)
+            self._wake.clear()
+            self.flush()
+            self.refresh_old()
+
+# Shared writer, started with the app
+snapshot_writer = SnapshotWriter()
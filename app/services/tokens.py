@@ -0,0 +1,287 @@
+"""
+Auth tokens - issuing, cheap verification and revocation
+Access tokens are short-lived JWTs that carry the user id and admin flag, so checking
+one is a signature check (memoized per token) plus a lookup in an in-memory revocation
+list: no password hashing and no database query per request. Refresh tokens are single
+use. Each refresh returns a new pair, and reusing an old refresh token revokes its
+whole login family, since it must have been copied. The shared sessions cache tells
+the other workers to re-read revocations.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta
+from typing import Optional
+
+from jose import JWTError, jwt
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..database import SessionLocal
+from .cache import Cache
+from .sync import new_watermark
+from ..models.token import RefreshToken, RevokedToken
+from ..models.user import User
+
+# What a verified access token says about its user (user_id is None for old tokens)
+TokenClaims = namedtuple("TokenClaims", "user_id username is_admin jti family expires_at")
+
+class TokenError(Exception):
+    """Raised when a token is invalid, expired, revoked or reused"""
+
+class DecodedTokenCache:
+    """LRU cache of verified access tokens, so each token's signature is checked only once"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._claims = OrderedDict()  # token -> TokenClaims, least recently used first
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[TokenClaims]:
+        with self._lock:
+            claims = self._claims.get(token)
+            if claims is not None:
+                self._claims.move_to_end(token)
+            return claims
+
+    def put(self, token: str, claims: TokenClaims):
+        with self._lock:
+            self._claims[token] = claims
+            while len(self._claims) > self.max_entries:
+                self._claims.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._claims.clear()
+
+class RevocationList:
+    """
+    Revoked access token ids and login families, held in memory
+    Revocations are stored in the revoked_tokens table, and other worker processes pick
+    them up by reading only the rows added since their last sync (every sync_seconds).
+    revoked_at is stamped before the commit, so each sync reads again from a watermark
+    that trails the clock, like the delta sync endpoints. Entries are dropped once every
+    token they could block has expired; TokenSweeper deletes the expired rows.
+    """
+
+    def __init__(self, sync_seconds: float):
+        self.sync_seconds = sync_seconds
+        self._revoked = {}  # token id -> expiry (unix time)
+        self._synced_at = None
+        self._generation = 0  # Bumped by request_sync, so a sync already running doesn't count
+        self._seen_until = datetime.min  # Watermark of the last sync: rows revoked since then are read
+        self._lock = threading.Lock()
+
+    def _needs_sync(self) -> bool:
+        return self._synced_at is None or time.monotonic() - self._synced_at > self.sync_seconds
+
+    def sync(self):
+        generation = self._generation
+        watermark = new_watermark()  # Taken before reading, like the delta sync endpoints
+        db = SessionLocal()
+        try:
+            rows = db.query(RevokedToken.token_id, RevokedToken.expires_at).filter(
+                RevokedToken.revoked_at >= self._seen_until,
+                RevokedToken.expires_at > datetime.utcnow()
+            ).all()
+        finally:
+            db.close()
+
+        with self._lock:
+            for token_id, expires_at in rows:
+                self._revoked[token_id] = _timestamp(expires_at)
+            self._seen_until = max(self._seen_until, watermark)
+            now_ts = time.time()
+            for token_id in [token_id for token_id, expires in self._revoked.items() if expires <= now_ts]:
+                del self._revoked[token_id]
+            # A sync requested while this one was reading may have missed its rows
+            if generation == self._generation:
+                self._synced_at = time.monotonic()
+
+    def request_sync(self):
+        """Read new revocations on the next check instead of waiting for sync_seconds"""
+        with self._lock:
+            self._generation += 1
+            self._synced_at = None
+
+    def is_revoked(self, *token_ids) -> bool:
+        if self._needs_sync():
+            self.sync()
+        return any(token_id in self._revoked for token_id in token_ids if token_id)
+
+    def revoke(self, db: Session, token_id: str, expires_at: datetime):
+        """Revoke in this process right away and store it for the others (the caller commits)"""
+        existing = db.query(RevokedToken).filter(RevokedToken.token_id == token_id).first()
+        if existing is None:
+            db.add(RevokedToken(token_id=token_id, revoked_at=datetime.utcnow(), expires_at=expires_at))
+        with self._lock:
+            self._revoked[token_id] = _timestamp(expires_at)
+
+def prune_expired() -> int:
+    """Delete revocations and refresh tokens that have expired, returns the number of rows removed"""
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        # Expired revocations can't block anything any more
+        removed = db.query(RevokedToken).filter(RevokedToken.expires_at <= now).delete(synchronize_session=False)
+        removed += db.query(RefreshToken).filter(RefreshToken.expires_at <= now).delete(synchronize_session=False)
+        db.commit()
+        return removed
+    finally:
+        db.close()
+
+class TokenSweeper:
+    """Background thread that deletes expired revocations and refresh tokens, off the request path"""
+
+    def __init__(self, sweep_seconds: float):
+        self.sweep_seconds = sweep_seconds
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="token-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.wait(self.sweep_seconds):
+            try:
+                removed = prune_expired()
+                if removed:
+                    print(f"🧹 Removed {removed} expired tokens")
+            except Exception as e:
+                print(f"❌ Token sweeper error: {e}")
+
+def _timestamp(value: datetime) -> float:
+    """Unix time of a naive UTC datetime"""
+    return (value - datetime(1970, 1, 1)).total_seconds()
+
+# Shared instances used by the auth router
+token_cache = DecodedTokenCache(settings.AUTH_TOKEN_CACHE_SIZE)
+revocation_list = RevocationList(settings.AUTH_REVOCATION_SYNC_SECONDS)
+session_cache = Cache("sessions", settings.SESSION_CACHE_TTL_SECONDS)
+token_sweeper = TokenSweeper(settings.AUTH_SWEEP_INTERVAL_SECONDS)
+
+def _sessions_invalidated(key):
+    if key is None or key == "revocations":
+        revocation_list.request_sync()  # Another worker logged someone out
+
+session_cache.on_invalidate(_sessions_invalidated)
+
+def revocations_changed():
+    """Make every worker read the new revocations now (call after the commit)"""
+    session_cache.delete("revocations")
+
+def create_access_token(user: User, family: Optional[str] = None) -> str:
+    """Create a short-lived JWT access token"""
+    expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    claims = {
+        "sub": user.username,
+        "uid": user.id,
+        "adm": bool(user.is_admin),
+        "jti": uuid.uuid4().hex,
+        "exp": expire,
+        "type": "access",
+    }
+    if family:
+        claims["fam"] = family
+    return jwt.encode(claims, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+def issue_tokens(db: Session, user: User, family: Optional[str] = None) -> dict:
+    """A new access/refresh token pair (the caller commits the stored refresh token)"""
+    family = family or uuid.uuid4().hex
+    jti = uuid.uuid4().hex
+    expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    db.add(RefreshToken(jti=jti, family=family, user_id=user.id, expires_at=expire))
+
+    refresh_token = jwt.encode(
+        {"sub": user.username, "uid": user.id, "jti": jti, "fam": family, "exp": expire, "type": "refresh"},
+        settings.SECRET_KEY,
+        algorithm=settings.ALGORITHM
+    )
+    return {
+        "access_token": create_access_token(user, family),
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
+def verify_access_token(token: str) -> TokenClaims:
+    """Check an access token without touching the database (raises TokenError)"""
+    claims = token_cache.get(token)
+    if claims is None:
+        try:
+            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        except JWTError:
+            raise TokenError("Could not validate credentials")
+        if payload.get("sub") is None or payload.get("type", "access") != "access":
+            raise TokenError("Could not validate credentials")
+
+        claims = TokenClaims(
+            payload.get("uid"), payload["sub"], bool(payload.get("adm")),
+            payload.get("jti"), payload.get("fam"), payload["exp"]
+        )
+        token_cache.put(token, claims)
+
+    # Cached tokens still expire and can still be revoked
+    if claims.expires_at <= time.time():
+        raise TokenError("Token has expired")
+    if revocation_list.is_revoked(claims.jti, claims.family):
+        raise TokenError("Token has been revoked")
+    return claims
+
+def rotate_refresh_token(db: Session, refresh_token: str) -> RefreshToken:
+    """
+    Use up a refresh token and return its record (the caller issues the next pair and commits)
+    A token can only be used once - using it again revokes the whole family.
+    """
+    try:
+        payload = jwt.decode(refresh_token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+    except JWTError:
+        raise TokenError("Invalid refresh token")
+    if payload.get("type") != "refresh" or not payload.get("jti"):
+        raise TokenError("Invalid refresh token")
+
+    now = datetime.utcnow()
+    # Conditional UPDATE, so two concurrent refreshes can't both succeed
+    used = db.query(RefreshToken).filter(
+        RefreshToken.jti == payload["jti"],
+        RefreshToken.used_at.is_(None),
+        RefreshToken.revoked_at.is_(None)
+    ).update({RefreshToken.used_at: now}, synchronize_session=False)
+
+    record = db.query(RefreshToken).filter(RefreshToken.jti == payload["jti"]).first()
+    if record is None:
+        raise TokenError("Invalid refresh token")
+    if not used:
+        if record.revoked_at is not None:
+            raise TokenError("Refresh token has been revoked")
+        revoke_family(db, record.family)  # Reused token - log the whole session out
+        db.commit()
+        revocations_changed()
+        raise TokenError("Refresh token has already been used")
+    return record
+
+def revoke_family(db: Session, family: str):
+    """Log a whole login session out: its refresh tokens and every access token it issued"""
+    now = datetime.utcnow()
+    db.query(RefreshToken).filter(
+        RefreshToken.family == family,
+        RefreshToken.revoked_at.is_(None)
+    ).update({RefreshToken.revoked_at: now}, synchronize_session=False)
+    # Access tokens of the family expire at most this long from now
+    revocation_list.revoke(db, family, now + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
+
+def revoke_access_token(db: Session, claims: TokenClaims):
+    """Revoke a single access token (used for old tokens that have no family)"""
+    if claims.jti:
+        revocation_list.revoke(db, claims.jti, datetime.utcfromtimestamp(claims.expires_at))
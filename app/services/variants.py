@@ -0,0 +1,119 @@
+"""
+Product variant helpers - option normalization and parsing of legacy descriptions
+Older products keep their sizes and colors as text in the description, e.g.
+"Size: S, M, L, XL\nColor: Black". These helpers turn that text into variant rows.
+"""
+import re
+from typing import Callable, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import func, case, exists
+from sqlalchemy.orm import Session
+
+from ..models.product import Product, ProductVariant
+
+_OPTION_LINE = re.compile(r"^\s*(size|sizes|color|colors|colour|colours)\s*:\s*(.+?)\s*$", re.IGNORECASE | re.MULTILINE)
+
+def normalize_size(size: Optional[str]) -> Optional[str]:
+    """Sizes are codes, so compare them upper-case ("m" -> "M")"""
+    if size is None or not size.strip():
+        return None
+    return " ".join(size.split()).upper()
+
+def normalize_color(color: Optional[str]) -> Optional[str]:
+    """Colors are compared with a capital first letter ("black" -> "Black")"""
+    if color is None or not color.strip():
+        return None
+    color = " ".join(color.split()).lower()
+    return color[0].upper() + color[1:]
+
+def parse_variant_options(description: Optional[str]) -> Tuple[List[str], List[str]]:
+    """Read the "Size:" and "Color:" lines of a description"""
+    sizes, colors = [], []
+    for label, values in _OPTION_LINE.findall(description or ""):
+        target = sizes if label.lower().startswith("size") else colors
+        normalize = normalize_size if target is sizes else normalize_color
+        for value in values.split(","):
+            value = normalize(value)
+            if value and value not in target:
+                target.append(value)
+    return sizes, colors
+
+def _variant_sku(product_sku: Optional[str], product_id: Optional[int], size: Optional[str], color: Optional[str]) -> str:
+    parts = [product_sku or f"P{product_id}"]
+    for option in (size, color):
+        if option:
+            parts.append(re.sub(r"[^A-Z0-9]+", "", option.upper())[:12])
+    return "-".join(parts)
+
+def unique_skus(skus: Iterable[str], stored: Callable[[List[str]], Set[str]]) -> List[str]:
+    """
+    The SKUs with repeats numbered (-2, -3, ...), so none repeats another or one already stored
+    Shortened options can coincide ("White with colorful borders" and "... stripes"), and
+    so can options that differ only in punctuation. stored(candidates) returns those taken.
+    """
+    skus = list(skus)
+    taken = set(stored(skus)) if skus else set()
+    unique = []
+    for sku in skus:
+        candidate, number = sku, 1
+        while candidate in taken:
+            number += 1
+            candidate = f"{sku}-{number}"
+            taken |= stored([candidate])
+        taken.add(candidate)
+        unique.append(candidate)
+    return unique
+
+def plan_variants(description: Optional[str], product_sku: Optional[str], stock_quantity: Optional[int],
+                  product_id: Optional[int] = None,
+                  stored: Callable[[List[str]], Set[str]] = lambda _: set()) -> List[dict]:
+    """
+    Variant rows (size, color, sku, stock_quantity) for each size/color combination in a description
+    The product's stock is split evenly across the variants (remainder to the first ones). SKUs
+    are unique within the product and against stored(); products without a SKU use their id instead.
+    """
+    sizes, colors = parse_variant_options(description)
+    if not sizes and not colors:
+        return []
+
+    combinations = [(size, color) for size in (sizes or [None]) for color in (colors or [None])]
+    share, remainder = divmod(stock_quantity or 0, len(combinations))
+    skus = unique_skus((_variant_sku(product_sku, product_id, size, color) for size, color in combinations), stored)
+
+    return [
+        {
+            "size": size,
+            "color": color,
+            "sku": sku,
+            "stock_quantity": share + (1 if position < remainder else 0),
+        }
+        for position, ((size, color), sku) in enumerate(zip(combinations, skus))
+    ]
+
+def stored_skus(db: Session) -> Callable[[List[str]], Set[str]]:
+    """unique_skus() lookup of the variant SKUs already in the database"""
+    return lambda skus: {row[0] for row in db.query(ProductVariant.sku).filter(ProductVariant.sku.in_(skus))}
+
+def build_variants_from_description(db: Session, product: Product) -> List[ProductVariant]:
+    """Create variant objects for a product from the "Size:" / "Color:" lines of its description"""
+    return [
+        ProductVariant(product_id=product.id, **row)
+        for row in plan_variants(product.description, product.sku, product.stock_quantity, product.id, stored_skus(db))
+    ]
+
+def has_variants():
+    """Column expression: whether a product has variant rows, i.e. its stock is managed per variant"""
+    return exists().where(ProductVariant.product_id == Product.id)
+
+def sync_product_stock(db: Session, product: Product):
+    """Keep Product.stock_quantity equal to the total stock of its active variants"""
+    db.flush()  # Sessions don't autoflush, so pending variant changes must be written first
+    variant_count, active_stock = db.query(
+        func.count(ProductVariant.id),
+        func.coalesce(func.sum(case((ProductVariant.is_active == True, ProductVariant.stock_quantity), else_=0)), 0)
+    ).filter(ProductVariant.product_id == product.id).one()
+    
+    # Products without variants keep managing their stock directly
+    if variant_count:
+        product.stock_quantity = active_stock
+    product.updated_at = func.now()  # Variants are part of the product for delta sync, even if the total stayed the same
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Money benchmark - float vs exact order totalling
+Sums the same generated order lines as floats, Decimals, integer santim in Python,
+NumPy int64 arrays (if NumPy is installed) and SQL SUM over REAL vs INTEGER columns,
+and shows how far each result is from the exact total.
+
+    python bench_money.py                 # 1,000,000 order lines
+    python bench_money.py --lines 200000
+"""
+import argparse
+import random
+import sqlite3
+import time
+from decimal import Decimal
+
+from app.services.money import to_birr
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def timed(label, function, exact_santim, results):
+    start = time.perf_counter()
+    total = function()
+    elapsed = time.perf_counter() - start
+    error = abs(Decimal(str(total)) - to_birr(exact_santim))
+    results.append((label, elapsed, total, error))
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare float and exact money totals")
+    parser.add_argument("--lines", type=int, default=1_000_000, help="Number of order lines")
+    args = parser.parse_args()
+
+    random.seed(42)
+    prices = [random.randint(1, 6000_00) for _ in range(args.lines)]  # santim
+    quantities = [random.randint(1, 5) for _ in range(args.lines)]
+    exact_santim = sum(price * quantity for price, quantity in zip(prices, quantities))
+
+    float_prices = [price / 100 for price in prices]
+    decimal_prices = [to_birr(price) for price in prices]
+
+    results = []
+    timed("Python float", lambda: sum(price * quantity for price, quantity in zip(float_prices, quantities)), exact_santim, results)
+    timed("Python Decimal", lambda: sum(price * quantity for price, quantity in zip(decimal_prices, quantities)), exact_santim, results)
+    timed("Python int santim", lambda: to_birr(sum(price * quantity for price, quantity in zip(prices, quantities))), exact_santim, results)
+
+    if numpy is not None:
+        price_array = numpy.array(prices, dtype=numpy.int64)
+        quantity_array = numpy.array(quantities, dtype=numpy.int64)
+        timed("NumPy int64 santim", lambda: to_birr(int(numpy.dot(price_array, quantity_array))), exact_santim, results)
+
+    connection = sqlite3.connect(":memory:")
+    connection.execute("CREATE TABLE lines_real (total REAL)")
+    connection.execute("CREATE TABLE lines_int (total INTEGER)")
+    connection.executemany("INSERT INTO lines_real VALUES (?)", ((price / 100 * quantity,) for price, quantity in zip(prices, quantities)))
+    connection.executemany("INSERT INTO lines_int VALUES (?)", ((price * quantity,) for price, quantity in zip(prices, quantities)))
+    timed("SQLite SUM(REAL)", lambda: connection.execute("SELECT SUM(total) FROM lines_real").fetchone()[0], exact_santim, results)
+    timed("SQLite SUM(INTEGER)", lambda: to_birr(connection.execute("SELECT SUM(total) FROM lines_int").fetchone()[0]), exact_santim, results)
+
+    print(f"💰 {args.lines:,} order lines, exact total ETB {to_birr(exact_santim):,}")
+    if numpy is None:
+        print("   (NumPy is not installed - skipping the vectorized run)")
+    print(f"{'method':<22}{'time (ms)':>12}{'error (ETB)':>16}")
+    for label, elapsed, total, error in results:
+        print(f"{label:<22}{elapsed * 1000:>12.1f}{error:>16}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Order benchmark - per-request commits vs group commit under concurrent buyers
+Starts the API with uvicorn on a throwaway SQLite database, once with a commit per
+order and once with ORDER_GROUP_COMMIT=true, and has N concurrent buyers place orders
+as fast as they can. Prints orders/sec, latency percentiles, the server's CPU time per
+order and the number of database commits per order for each buyer count. The load
+generator runs in this process, so use a machine with spare cores for it.
+
+    python bench_orders.py                            # 50, 200 and 500 buyers, 10 seconds each
+    python bench_orders.py --buyers 50 500 --seconds 5 --port 8765
+"""
+import argparse
+import asyncio
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Optional
+
+import httpx
+
+SHIPPING = {"shipping_address": "Bole Road", "shipping_city": "Addis Ababa", "shipping_postal_code": "1000"}
+MODES = [("per-request commit", "false"), ("group commit", "true")]
+
+def prepare_database(work_dir: str, buyer_count: int, product_count: int) -> list:
+    """Migrate and seed a database in work_dir, returns an access token per buyer"""
+    # Import the app only in this helper, pointed at the scratch database
+    os.environ["DATABASE_URL"] = f"sqlite:///{work_dir}/bench.db"
+    os.environ["SNAPSHOT_DIR"] = os.path.join(work_dir, "snapshots")
+    import manage
+    from app.database import engine
+    from app.models.user import User
+    from app.services.tokens import create_access_token
+
+    manage.migrate()
+    manage.seed(product_count)
+    with engine.begin() as connection:
+        # Plenty of stock, so no order fails and both runs do the same work
+        connection.exec_driver_sql("UPDATE products SET stock_quantity = 1000000000")
+        connection.exec_driver_sql("UPDATE product_variants SET stock_quantity = 1000000000")
+        connection.execute(User.__table__.insert(), [
+            {"username": f"bench{n}", "email": f"bench{n}@example.com", "full_name": f"Bench Buyer {n}",
+             "hashed_password": "x", "is_active": True, "is_admin": False}
+            for n in range(buyer_count)
+        ])
+        users = connection.exec_driver_sql("SELECT id, username FROM users WHERE username LIKE 'bench%'").fetchall()
+    engine.dispose()
+    return [create_access_token(User(id=user_id, username=username, is_admin=False)) for user_id, username in users]
+
+def variant_ids(work_dir: str) -> list:
+    """(product_id, variant_id) pairs to order - generated products all have variants, which orders must name"""
+    connection = sqlite3.connect(f"{work_dir}/bench.db")
+    try:
+        return connection.execute(
+            "SELECT product_variants.product_id, product_variants.id FROM product_variants"
+            " JOIN products ON products.id = product_variants.product_id"
+            " WHERE products.is_active = 1 AND product_variants.is_active = 1 LIMIT 1000"
+        ).fetchall()
+    finally:
+        connection.close()
+
+def commit_count(work_dir: str) -> int:
+    """SQLite's file change counter, which every committed write transaction bumps (rollback journal mode)"""
+    with open(f"{work_dir}/bench.db", "rb") as f:
+        header = f.read(28)
+    return int.from_bytes(header[24:28], "big")
+
+def cpu_seconds(pid: int) -> Optional[float]:
+    """User + system CPU time of a process so far (None where /proc isn't available)"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+def start_server(work_dir: str, port: int, group_commit: str) -> subprocess.Popen:
+    env = dict(os.environ, ORDER_GROUP_COMMIT=group_commit, DEBUG="false")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning",
+         "--timeout-keep-alive", "60"],  # Busy buyers can take longer than the default 5 s to send their next order
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL  # Failed orders are counted as errors instead
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline and server.poll() is None:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/products/categories").status_code == 200:
+                return server
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    server.kill()
+    raise SystemExit("❌ The server did not start")
+
+async def run_buyers(port: int, tokens: list, products: list, seconds: float) -> tuple:
+    """Every buyer places orders back to back until time is up, returns (latencies, errors, elapsed)"""
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=len(tokens), max_keepalive_connections=len(tokens))
+
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", limits=limits, timeout=60) as client:
+        start = time.perf_counter()
+        deadline = start + seconds
+
+        async def buyer(token: str):
+            nonlocal errors
+            headers = {"Authorization": f"Bearer {token}"}
+            while time.perf_counter() < deadline:
+                items = [{"product_id": product_id, "variant_id": variant_id, "quantity": 1}
+                         for product_id, variant_id in random.sample(products, 2)]
+                sent = time.perf_counter()
+                try:
+                    response = await client.post("/orders/", json={"items": items, **SHIPPING}, headers=headers)
+                    ok = response.status_code == 200
+                except httpx.TransportError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - sent)
+                else:
+                    errors += 1
+
+        await asyncio.gather(*(buyer(token) for token in tokens))
+        return latencies, errors, time.perf_counter() - start
+
+def percentile(values: list, share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * share))] if ordered else 0.0
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-request commits and group commit for order placement")
+    parser.add_argument("--buyers", type=int, nargs="+", default=[50, 200, 500], help="Concurrent buyer counts")
+    parser.add_argument("--seconds", type=float, default=10, help="Duration of each run")
+    parser.add_argument("--products", type=int, default=2000, help="Generated products")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    random.seed(42)
+    # On disk next to the app, not in a RAM-backed /tmp, so commits pay for a real fsync
+    work_dir = tempfile.mkdtemp(prefix="bench-orders-", dir=".")
+    try:
+        print(f"🗄️ Building a test database in {work_dir}")
+        tokens = prepare_database(work_dir, max(args.buyers), args.products)
+        products = variant_ids(work_dir)
+
+        results = []
+        for label, group_commit in MODES:
+            server = start_server(work_dir, args.port, group_commit)
+            try:
+                for buyers in args.buyers:
+                    commits, cpu = commit_count(work_dir), cpu_seconds(server.pid)
+                    latencies, errors, elapsed = asyncio.run(run_buyers(args.port, tokens[:buyers], products, args.seconds))
+                    orders = max(len(latencies), 1)
+                    cpu_per_order = (cpu_seconds(server.pid) - cpu) / orders if cpu is not None else None
+                    results.append((label, buyers, len(latencies) / elapsed, percentile(latencies, 0.5),
+                                    percentile(latencies, 0.99), cpu_per_order, (commit_count(work_dir) - commits) / orders, errors))
+                    print(f"   {label}, {buyers} buyers: {len(latencies)} orders")
+            finally:
+                server.terminate()
+                server.wait()
+
+        print(f"\n{'Mode':<20} {'Buyers':>7} {'Orders/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'CPU ms/order':>13} {'Commits/order':>14} {'Errors':>7}")
+        for label, buyers, rate, p50, p99, cpu_per_order, commits_per_order, errors in results:
+            cpu_text = f"{cpu_per_order * 1000:.1f}" if cpu_per_order is not None else "-"
+            print(f"{label:<20} {buyers:>7} {rate:>10.1f} {p50 * 1000:>9.1f} {p99 * 1000:>9.1f} {cpu_text:>13} "
+                  f"{commits_per_order:>14.2f} {errors:>7}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
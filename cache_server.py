@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Cache server - a small Redis-compatible stand-in for local development and testing
+Speaks enough of the Redis protocol for CACHE_BACKEND=redis (GET, SET with PX/EX/NX,
+DEL, SCAN, PUBLISH/SUBSCRIBE). Data is kept in memory only. Use a real Redis in production.
+
+    python cache_server.py --port 6379
+    CACHE_BACKEND=redis CACHE_REDIS_URL=redis://localhost:6379/0 uvicorn app.main:app --workers 4
+"""
+import argparse
+import asyncio
+import re
+import time
+
+class CacheServer:
+    """In-memory key/value store with expiry and pub/sub channels"""
+
+    def __init__(self):
+        self.values = {}  # key -> (value, expires_at or None)
+        self.subscribers = {}  # channel -> set of StreamWriters
+
+    def _get(self, key: bytes):
+        entry = self.values.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+            del self.values[key]
+            return None
+        return entry
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                command = await read_command(reader)
+                if command is None:
+                    break
+                reply = self.execute(command, writer)
+                if reply is not None:
+                    writer.write(reply)
+                    await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            for writers in self.subscribers.values():
+                writers.discard(writer)
+            writer.close()
+
+    def execute(self, command: list, writer: asyncio.StreamWriter):
+        name, args = command[0].upper(), command[1:]
+        if name == b"PING":
+            return simple("PONG")
+        if name in (b"AUTH", b"SELECT"):
+            return simple("OK")
+        if name == b"GET":
+            entry = self._get(args[0])
+            return bulk(entry[0] if entry else None)
+        if name == b"SET":
+            return self.set(args)
+        if name == b"DEL":
+            removed = sum(1 for key in args if self._get(key) is not None and self.values.pop(key, None))
+            return integer(removed)
+        if name == b"SCAN":
+            pattern = b"*"
+            options = [arg.upper() for arg in args[1::2]]
+            if b"MATCH" in options:
+                pattern = args[2 + 2 * options.index(b"MATCH")]
+            matcher = glob_regex(pattern)
+            keys = [key for key in list(self.values) if matcher.match(key) and self._get(key) is not None]
+            return array([bulk(b"0"), array([bulk(key) for key in keys])])
+        if name == b"PUBLISH":
+            writers = self.subscribers.get(args[0], set())
+            message = array([bulk(b"message"), bulk(args[0]), bulk(args[1])])
+            for subscriber in writers:
+                subscriber.write(message)
+            return integer(len(writers))
+        if name == b"SUBSCRIBE":
+            replies = []
+            for count, channel in enumerate(args, 1):
+                self.subscribers.setdefault(channel, set()).add(writer)
+                replies.append(array([bulk(b"subscribe"), bulk(channel), integer(count)]))
+            return b"".join(replies)
+        if name == b"FLUSHALL":
+            self.values.clear()
+            return simple("OK")
+        return error(f"ERR unknown command '{name.decode(errors='replace')}'")
+
+    def set(self, args: list):
+        key, value, options = args[0], args[1], [arg.upper() for arg in args[2:]]
+        expires_at = None
+        if b"PX" in options:
+            expires_at = time.monotonic() + int(args[3 + options.index(b"PX")]) / 1000
+        if b"EX" in options:
+            expires_at = time.monotonic() + int(args[3 + options.index(b"EX")])
+        exists = self._get(key) is not None
+        if (b"NX" in options and exists) or (b"XX" in options and not exists):
+            return bulk(None)
+        self.values[key] = (value, expires_at)
+        return simple("OK")
+
+async def read_command(reader: asyncio.StreamReader):
+    """One command as a list of bytes arguments (None when the client disconnects)"""
+    line = await reader.readline()
+    if not line:
+        return None
+    if not line.startswith(b"*"):
+        return line.split()  # Inline command, e.g. typed into telnet
+    arguments = []
+    for _ in range(int(line[1:])):
+        length = int((await reader.readline())[1:])
+        arguments.append((await reader.readexactly(length + 2))[:-2])
+    return arguments
+
+def glob_regex(pattern: bytes):
+    """Redis glob pattern (*, ?, [...] and backslash escapes) as a compiled regex"""
+    parts, i = [], 0
+    while i < len(pattern):
+        char = pattern[i:i + 1]
+        if char == b"\\" and i + 1 < len(pattern):
+            parts.append(re.escape(pattern[i + 1:i + 2]))
+            i += 1
+        elif char == b"*":
+            parts.append(b".*")
+        elif char == b"?":
+            parts.append(b".")
+        elif char == b"[":
+            end = pattern.find(b"]", i)
+            parts.append(pattern[i:end + 1] if end > 0 else re.escape(char))
+            i = end if end > 0 else i
+        else:
+            parts.append(re.escape(char))
+        i += 1
+    return re.compile(b"".join(parts) + b"\\Z", re.DOTALL)
+
+def simple(text: str) -> bytes:
+    return b"+" + text.encode() + b"\r\n"
+
+def error(text: str) -> bytes:
+    return b"-" + text.encode() + b"\r\n"
+
+def integer(number: int) -> bytes:
+    return b":%d\r\n" % number
+
+def bulk(value) -> bytes:
+    return b"$-1\r\n" if value is None else b"$%d\r\n%s\r\n" % (len(value), value)
+
+def array(items: list) -> bytes:
+    return b"*%d\r\n" % len(items) + b"".join(items)
+
+async def serve(host: str, port: int):
+    server = CacheServer()
+    listener = await asyncio.start_server(server.handle, host, port)
+    print(f"🗄️ Cache server listening on {host}:{port}")
+    async with listener:
+        await listener.serve_forever()
+
+def main():
+    parser = argparse.ArgumentParser(description="Redis-compatible cache server for development")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("👋 Cache server stopped")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Image service check - exercises the image endpoints against a local stub origin
+Starts a small HTTP server that plays the remote image host, points the image proxy
+at it and checks resizing, caching headers, re-fetching stale originals, size presets,
+the host allow-list (including redirects to other hosts), undecodable uploads and LRU
+eviction of the on-disk cache.
+
+    python check_images.py
+
+Exits with status 1 if any check fails, so it can run in CI.
+"""
+import io
+import os
+import sys
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# The app reads its settings at import time, so point it at scratch directories first
+WORK_DIR = tempfile.mkdtemp(prefix="yzak-images-")
+os.environ["DATABASE_URL"] = f"sqlite:///{WORK_DIR}/images.db"
+os.environ["IMAGE_CACHE_DIR"] = os.path.join(WORK_DIR, "image_cache")
+os.environ["SNAPSHOT_DIR"] = os.path.join(WORK_DIR, "snapshots")
+os.environ["IMAGE_PROXY_ALLOWED_HOSTS"] = "127.0.0.1"  # The stub is also reachable as "localhost", which is not allowed
+os.environ["DEBUG"] = "false"
+
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import manage
+from app.config import settings
+from app.main import app
+from app.services.images import ImageCache
+
+def make_jpeg(width: int, height: int) -> bytes:
+    output = io.BytesIO()
+    Image.new("RGB", (width, height), (200, 30, 60)).save(output, "JPEG")
+    return output.getvalue()
+
+class StubOrigin(BaseHTTPRequestHandler):
+    """Serves one photo, plus redirects to it on an allowed and a disallowed host name"""
+    photo = make_jpeg(1600, 1200)
+    requests = []  # (host header, path) of every request received
+
+    def do_GET(self):
+        StubOrigin.requests.append((self.headers.get("Host", "").split(":")[0], self.path))
+        port = self.server.server_address[1]
+        if self.path == "/photo.jpg":
+            self.send_response(200)
+            self.send_header("Content-Type", "image/jpeg")
+            self.send_header("Content-Length", str(len(self.photo)))
+            self.end_headers()
+            self.wfile.write(self.photo)
+        elif self.path in ("/redirect-allowed", "/redirect-other-host"):
+            host = "127.0.0.1" if self.path == "/redirect-allowed" else "localhost"
+            self.send_response(302)
+            self.send_header("Location", f"http://{host}:{port}/photo.jpg")
+            self.end_headers()
+        else:
+            self.send_response(404)
+            self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+def image_size(data: bytes) -> tuple:
+    with Image.open(io.BytesIO(data)) as img:
+        return img.size
+
+def main():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubOrigin)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    origin = f"http://127.0.0.1:{server.server_address[1]}"
+
+    print(f"🗄️ Using scratch directories in {WORK_DIR}")
+    manage.migrate()
+
+    results = []
+
+    def check(name: str, passed: bool, detail: str = ""):
+        results.append(passed)
+        print(f"{'✅' if passed else '❌'} {name}" + (f" - {detail}" if detail and not passed else ""))
+
+    with TestClient(app) as client:
+        url = f"{origin}/photo.jpg"
+        response = client.get("/images/proxy", params={"url": url, "w": 200}, headers={"Accept": "image/webp"})
+        check("proxy resizes a remote image", response.status_code == 200 and image_size(response.content)[0] == 200,
+              f"HTTP {response.status_code}")
+        check("negotiated WebP", response.headers.get("content-type") == "image/webp" and response.headers.get("vary") == "Accept",
+              str(response.headers))
+        cache_control = response.headers.get("cache-control", "")
+        check("proxied images expire", f"max-age={settings.IMAGE_PROXY_MAX_AGE_SECONDS}" in cache_control
+              and "immutable" not in cache_control, cache_control)
+        etag = response.headers.get("etag")
+
+        fetched = len(StubOrigin.requests)
+        response = client.get("/images/proxy", params={"url": url, "w": 400, "format": "jpeg"})
+        check("original is downloaded only once", response.status_code == 200 and len(StubOrigin.requests) == fetched,
+              f"{len(StubOrigin.requests) - fetched} extra origin requests")
+
+        max_age, settings.IMAGE_PROXY_MAX_AGE_SECONDS = settings.IMAGE_PROXY_MAX_AGE_SECONDS, 0
+        response = client.get("/images/proxy", params={"url": url, "w": 400, "format": "jpeg"})
+        settings.IMAGE_PROXY_MAX_AGE_SECONDS = max_age
+        check("stale original is downloaded again", response.status_code == 200 and len(StubOrigin.requests) == fetched + 1,
+              f"{len(StubOrigin.requests) - fetched} extra origin requests")
+
+        response = client.get("/images/proxy", params={"url": url, "w": 200},
+                              headers={"Accept": "image/webp", "If-None-Match": etag})
+        check("revalidation returns 304", response.status_code == 304, f"HTTP {response.status_code}")
+
+        response = client.get("/images/proxy", params={"url": url, "w": 333})
+        check("sizes outside IMAGE_SIZES are rejected", response.status_code == 400, f"HTTP {response.status_code}")
+
+        response = client.get("/images/proxy", params={"url": url.replace("127.0.0.1", "localhost"), "w": 200})
+        check("hosts outside the allow-list are rejected", response.status_code == 502, f"HTTP {response.status_code}")
+
+        response = client.get("/images/proxy", params={"url": f"{origin}/redirect-allowed", "w": 100})
+        check("redirect within the allowed hosts is followed", response.status_code == 200, f"HTTP {response.status_code}")
+
+        del StubOrigin.requests[:]
+        response = client.get("/images/proxy", params={"url": f"{origin}/redirect-other-host", "w": 100})
+        reached = [request for request in StubOrigin.requests if request[0] == "localhost"]
+        check("redirect to another host is never followed", response.status_code == 502 and not reached,
+              f"HTTP {response.status_code}, {len(reached)} requests to the other host")
+
+        admin = client.post("/auth/login", data={"username": "admin", "password": "admin"}).json()
+        admin_headers = {"Authorization": f"Bearer {admin['access_token']}"}
+        response = client.post("/images/upload", files={"file": ("photo.jpg", StubOrigin.photo, "image/jpeg")},
+                               headers=admin_headers)
+        image_url = response.json().get("url") if response.status_code == 200 else None
+        check("admin upload", image_url is not None, f"HTTP {response.status_code}")
+        if image_url:
+            response = client.get(image_url, params={"h": 100, "format": "jpeg"})
+            check("uploaded image variant", response.status_code == 200 and image_size(response.content)[1] == 100
+                  and "immutable" in response.headers.get("cache-control", ""),
+                  f"HTTP {response.status_code}, {response.headers.get('cache-control')}")
+
+        # A truncated JPEG passes the upload check but cannot be decoded
+        response = client.post("/images/upload", files={"file": ("cut.jpg", StubOrigin.photo[:len(StubOrigin.photo) // 2], "image/jpeg")},
+                               headers=admin_headers)
+        if response.status_code == 200:
+            response = client.get(response.json()["url"], params={"w": 100})
+        check("undecodable image gets 415", response.status_code == 415, f"HTTP {response.status_code}")
+
+    cache = ImageCache(os.path.join(WORK_DIR, "lru"), max_bytes=250)
+    for name in ("a", "b", "c"):
+        cache.put(name, b"x" * 100)
+        if name == "b":
+            cache.get("a")  # a is now more recent than b
+    check("LRU eviction drops the least recently used file", cache.get("b") is None and cache.get("a") is not None)
+
+    server.shutdown()
+    failures = results.count(False)
+    print(f"\n{'❌' if failures else '✅'} {failures} of {len(results)} checks failed")
+    sys.stdout.flush()
+    os._exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Query plan check - catches slow queries before they reach production
+Builds a throwaway SQLite database with a large generated catalog and order history,
+calls every API endpoint once, records the SQL each one runs and checks it with
+EXPLAIN QUERY PLAN. An endpoint fails when it scans a large table without an index
+(unless the scan is declared below, with the reason) or runs more queries than its budget.
+
+    python check_query_plans.py                     # 20,000 products and orders
+    python check_query_plans.py --products 100000 --orders 100000 -v
+
+Exits with status 1 if any endpoint fails, so it can run in CI.
+"""
+import argparse
+import os
+import random
+import re
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+# The app reads its settings at import time, so point it at a scratch database first
+WORK_DIR = tempfile.mkdtemp(prefix="yzak-plans-")
+os.environ["DATABASE_URL"] = f"sqlite:///{WORK_DIR}/plans.db"
+os.environ["ORDER_ARCHIVE_DIR"] = os.path.join(WORK_DIR, "order_archive")
+os.environ["SNAPSHOT_DIR"] = os.path.join(WORK_DIR, "snapshots")
+os.environ["CART_FLUSH_SECONDS"] = "0"  # Write carts immediately, so cart queries are counted
+os.environ["DEBUG"] = "false"
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import manage
+from app.database import engine
+from app.main import app
+from app.models.order import Order, OrderItem, OrderStatus
+from app.models.user import User
+from app.routers.auth import get_password_hash
+from app.services import catalog_stats, snapshots
+
+# Tables that grow with the business - a full scan of one of these is a failure
+LARGE_TABLES = {
+    "products", "product_variants", "orders", "order_items", "users", "carts",
+    "idempotency_keys", "refresh_tokens", "revoked_tokens", "archived_orders", "archived_product_sales",
+}
+
+SHIPPING = {"shipping_address": "Bole Road", "shipping_city": "Addis Ababa", "shipping_postal_code": "1000"}
+
+# (name, method, path, options)
+# auth: None, "user" or "admin". budget: most SQL statements the endpoint may run.
+# allow_scans: {table: reason} for scans that are expected.
+ENDPOINTS = [
+    ("list products", "GET", "/products/?limit=20", {
+        "budget": 4,
+        "allow_scans": {"products": "nearly every product is active, and the scan stops once the page is full"},
+    }),
+    ("list products by category", "GET", "/products/?category_id={category_id}&limit=20", {"budget": 4}),
+    ("list products by size and color", "GET", "/products/?size=M&color=Black&limit=20", {
+        "budget": 5,
+        "allow_scans": {"products": "common size/color: probes each product's variants and stops once the page is full"},
+    }),
+    ("search product names", "GET", "/products/?search=item 12&limit=20", {
+        "budget": 4,
+        "allow_scans": {"products": "substring search (LIKE '%...%') can't use an index"},
+    }),
+    ("product search with facets", "GET", "/products/search?category_id={category_id}", {
+        "budget": 6,
+        "allow_scans": {"products": "facet counts aggregate every active product once, then are cached"},
+    }),
+    ("get product", "GET", "/products/{product_id}", {"budget": 3}),
+    ("product variants", "GET", "/products/{product_id}/variants", {"budget": 1}),
+    ("categories", "GET", "/products/categories", {"budget": 1}),
+    ("product changes", "GET", "/products/changes?updated_since={since}", {"auth": "admin", "budget": 3}),
+    ("category changes", "GET", "/products/categories/changes?updated_since={since}", {"auth": "admin", "budget": 1}),
+    ("category stats", "GET", "/products/stats/categories", {"budget": 1}),
+    ("top selling", "GET", "/products/stats/top-selling", {
+        "budget": 1,
+        "allow_scans": {
+            "orders": "sales totals read every order line once, then are cached",
+            "order_items": "sales totals read every order line once, then are cached",
+            "products": "joined to the sales totals of every product sold, then cached",
+            "archived_product_sales": "one small row per product ever sold",
+        },
+    }),
+    ("low stock", "GET", "/products/stats/low-stock", {"auth": "admin", "budget": 1}),
+    ("login", "POST", "/auth/login", {"form": {"username": "plancheck", "password": "plancheck"}, "budget": 2}),
+    ("me", "GET", "/auth/me", {"auth": "user", "budget": 1}),
+    ("refresh tokens", "POST", "/auth/refresh", {"json": "refresh", "budget": 5}),
+    ("my orders", "GET", "/orders/", {"auth": "user", "budget": 3}),
+    ("get order", "GET", "/orders/{order_id}", {"auth": "user", "budget": 2}),
+    ("all orders", "GET", "/orders/admin/all?limit=50", {
+        "auth": "admin",
+        "budget": 5,  # Counts, the newest archive index rows to merge with, orders and their items
+        "allow_scans": {
+            "orders": "X-Total-Count counts every live order",
+            "archived_orders": "X-Total-Count counts every archived order (from an index)",
+        },
+    }),
+    ("order changes", "GET", "/orders/admin/changes?updated_since={since}", {"auth": "admin", "budget": 3}),
+    ("place order", "POST", "/orders/", {
+        "auth": "user", "budget": 13,
+        "json": {"items": [{"product_id": "{product_id}", "variant_id": "{variant_id}", "quantity": 1}], **SHIPPING},
+    }),
+    ("add to cart", "PUT", "/cart/items", {
+        "auth": "user", "budget": 6,
+        "json": {"product_id": "{product_id}", "variant_id": "{variant_id}", "quantity": 1},
+    }),
+    ("view cart", "GET", "/cart/", {"auth": "user", "budget": 2}),
+    ("checkout", "POST", "/cart/checkout", {"auth": "user", "budget": 14, "json": SHIPPING}),
+]
+
+class QueryRecorder:
+    """Collects every statement the app sends to the database while recording"""
+
+    def __init__(self):
+        self.statements = None
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, connection, cursor, statement, parameters, context, executemany):
+        if self.statements is not None:
+            if executemany:
+                parameters = parameters[0] if parameters else ()
+            self.statements.append((statement, parameters))
+
+    def start(self):
+        self.statements = []
+
+    def stop(self):
+        statements, self.statements = self.statements, None
+        return statements
+
+def seed_orders(order_count: int, user_count: int):
+    """Generated users and delivered/pending orders, inserted in bulk"""
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [
+            {"username": f"buyer{n}", "email": f"buyer{n}@example.com", "full_name": f"Buyer {n}",
+             "hashed_password": "x", "is_active": True, "is_admin": False}
+            for n in range(user_count)
+        ])
+        user_ids = [row[0] for row in connection.exec_driver_sql("SELECT id FROM users")]
+        products = connection.exec_driver_sql("SELECT id, price_santim FROM products").fetchall()
+
+    start = datetime.utcnow() - timedelta(days=365)
+    for batch_start in range(0, order_count, 5000):
+        orders, items = [], []
+        with engine.begin() as connection:
+            next_id = (connection.exec_driver_sql("SELECT MAX(id) FROM orders").scalar() or 0) + 1
+            for order_id in range(next_id, next_id + min(5000, order_count - batch_start)):
+                lines = random.sample(products, 2)
+                total = 0
+                for product_id, price in lines:
+                    items.append({"order_id": order_id, "product_id": product_id, "quantity": 1,
+                                  "unit_price_santim": price, "total_price_santim": price})
+                    total += price
+                orders.append({
+                    "id": order_id, "order_number": f"ORD-GEN{order_id}", "user_id": random.choice(user_ids),
+                    "total_amount_santim": total, "status": random.choice(list(OrderStatus)),
+                    "created_at": start + timedelta(minutes=order_id),
+                    "updated_at": start + timedelta(minutes=order_id), **SHIPPING,
+                })
+            connection.execute(Order.__table__.insert(), orders)
+            connection.execute(OrderItem.__table__.insert(), items)
+
+def query_plan(connection: sqlite3.Connection, statement: str, parameters) -> list:
+    if isinstance(parameters, dict):
+        parameters = tuple(parameters.values())
+    return [row[3] for row in connection.execute("EXPLAIN QUERY PLAN " + statement, parameters or ())]
+
+def table_aliases(statement: str) -> dict:
+    """alias -> table for "products AS products_1" style aliases in a statement"""
+    return {alias: table for table, alias in re.findall(r"\b(\w+) AS (\w+)\b", statement)}
+
+def full_scans(plan: list, statement: str) -> set:
+    """Large tables read from start to end by a plan (through an index or not)"""
+    aliases = table_aliases(statement)
+    tables = set()
+    for detail in plan:
+        match = re.match(r"SCAN (\w+)", detail)
+        if match:
+            table = aliases.get(match.group(1), match.group(1))
+            if table in LARGE_TABLES:
+                tables.add(table)
+    return tables
+
+def fill(value, context: dict):
+    """Substitute {placeholders} in paths and JSON bodies"""
+    if isinstance(value, str):
+        filled = value.format(**context)
+        return int(filled) if value.startswith("{") and filled.isdigit() else filled
+    if isinstance(value, dict):
+        return {key: fill(item, context) for key, item in value.items()}
+    if isinstance(value, list):
+        return [fill(item, context) for item in value]
+    return value
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the query plans of every endpoint")
+    parser.add_argument("--products", type=int, default=20000, help="Generated products")
+    parser.add_argument("--orders", type=int, default=20000, help="Generated orders")
+    parser.add_argument("--users", type=int, default=500, help="Generated customers")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Print every statement and its plan")
+    args = parser.parse_args()
+
+    random.seed(42)
+    print(f"🗄️ Building a test database in {WORK_DIR}")
+    manage.migrate()
+    manage.seed(args.products)
+    seed_orders(args.orders, args.users)
+    with engine.begin() as connection:
+        # The generated catalog was last edited a while ago, so delta syncs only see the check's own changes
+        connection.exec_driver_sql("UPDATE products SET updated_at = datetime('now', '-30 days')")
+        connection.exec_driver_sql("ANALYZE")  # Give SQLite's planner real statistics
+
+    recorder = QueryRecorder()
+    with TestClient(app) as client:
+        client.post("/auth/register", json={"username": "plancheck", "email": "plancheck@example.com",
+                                            "full_name": "Plan Check", "password": "plancheck"})
+        user_tokens = client.post("/auth/login", data={"username": "plancheck", "password": "plancheck"}).json()
+        admin_tokens = client.post("/auth/login", data={"username": "admin", "password": "admin"}).json()
+        headers = {
+            "user": {"Authorization": f"Bearer {user_tokens['access_token']}"},
+            "admin": {"Authorization": f"Bearer {admin_tokens['access_token']}"},
+        }
+
+        with engine.connect() as connection:
+            product_id, variant_id = connection.exec_driver_sql(
+                "SELECT product_id, id FROM product_variants WHERE is_active = 1 ORDER BY stock_quantity DESC, id DESC LIMIT 1"
+            ).one()
+            category_id = connection.exec_driver_sql("SELECT category_id FROM products WHERE id = ?", (product_id,)).scalar()
+        item = {"product_id": product_id, "variant_id": variant_id, "quantity": 1}
+        order_id = client.post("/orders/", json={"items": [item], **SHIPPING}, headers=headers["user"]).json()["id"]
+        client.put("/cart/items", json=item, headers=headers["user"])
+        context = {
+            "product_id": product_id, "variant_id": variant_id, "category_id": category_id, "order_id": order_id,
+            "since": (datetime.utcnow() - timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+
+        plans = sqlite3.connect(f"{WORK_DIR}/plans.db")
+        failures = 0
+        for name, method, path, options in ENDPOINTS:
+            snapshots.snapshot_writer.flush()  # Don't count re-renders left over from the previous request
+            catalog_stats.catalog_changed()  # Measure the uncached queries
+            catalog_stats.low_stock_index._built_at = None
+            snapshots.snapshot_store.clear()
+
+            kwargs = {"headers": headers.get(options.get("auth"), {})}
+            if options.get("json") == "refresh":
+                kwargs["json"] = {"refresh_token": user_tokens["refresh_token"]}
+            elif "json" in options:
+                kwargs["json"] = fill(options["json"], context)
+            if "form" in options:
+                kwargs["data"] = options["form"]
+
+            recorder.start()
+            response = client.request(method, fill(path, context), **kwargs)
+            statements = recorder.stop()
+            if options.get("json") == "refresh" and response.status_code == 200:
+                user_tokens = response.json()
+
+            problems = []
+            if response.status_code >= 400:
+                problems.append(f"HTTP {response.status_code}: {response.text[:200]}")
+            if len(statements) > options["budget"]:
+                problems.append(f"{len(statements)} queries, budget is {options['budget']}")
+
+            allowed = options.get("allow_scans", {})
+            for statement, parameters in statements:
+                if not statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE", "WITH")):
+                    continue
+                plan = query_plan(plans, statement, parameters)
+                scanned = full_scans(plan, statement) - set(allowed)
+                if scanned:
+                    problems.append(f"full scan of {', '.join(sorted(scanned))}:\n        {' '.join(statement.split())[:300]}\n        plan: {plan}")
+                if args.verbose:
+                    print(f"    {' '.join(statement.split())[:160]}\n      -> {plan}")
+
+            status = "❌" if problems else "✅"
+            print(f"{status} {name:<34} {len(statements):>3} queries (budget {options['budget']})")
+            for problem in problems:
+                print(f"    {problem}")
+            failures += bool(problems)
+
+    print(f"\n{'❌' if failures else '✅'} {failures} of {len(ENDPOINTS)} endpoints failed")
+    sys.stdout.flush()
+    # Skip interpreter shutdown work (background threads, large caches) - nothing is left to save
+    os._exit(1 if failures else 0)
+
+if __name__ == "__main__":
+    main()
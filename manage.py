@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Database management commands for Yzak Fashion Store
+
+    python manage.py migrate                    # Apply pending migrations
+    python manage.py makemigrations "message"   # Generate a migration from model changes
+    python manage.py status                     # Show current and latest revision
+    python manage.py seed                       # Load the sample catalog (skipped if it exists)
+    python manage.py seed --products 100000     # Also add a large generated catalog for load tests
+    python manage.py reset                      # Delete the SQLite database, then migrate and seed
+    python manage.py archive-orders --days 90   # Move old delivered/cancelled orders to the order archive
+    python manage.py snapshots                  # Pre-render every product page and category listing
+"""
+import argparse
+import os
+import random
+
+from app import schema
+from app.config import settings
+from app.database import engine, SessionLocal
+from app.models.user import User
+from app.models.product import Category, Product, ProductVariant
+from app.services.money import to_santim
+from app.services.order_archive import archive_orders
+from app.services.snapshots import rebuild_all, snapshot_store
+from app.services.variants import build_variants_from_description, plan_variants
+
+# Sample Ethiopian fashion catalog (prices in ETB)
+SAMPLE_CATEGORIES = [
+    ("Women's Clothing", "Dresses, tops, pants, and women's fashion"),
+    ("Men's Clothing", "Shirts, pants, jackets, and men's fashion"),
+    ("Women's Shoes", "Heels, sneakers, boots, and women's footwear"),
+    ("Men's Shoes", "Sneakers, dress shoes, boots, and men's footwear"),
+]
+
+SAMPLE_PRODUCTS = [
+    ("Elegant Black Dress", "Beautiful black evening dress\nSize: S, M, L, XL\nColor: Black", 2699.99, 25, "DRESS-001", "Women's Clothing", "https://images.unsplash.com/photo-1566479179817-c0ae8e5b4e8e?w=400&h=600&fit=crop"),
+    ("Classic White Sneakers", "Comfortable white sneakers for everyday wear\nSize: 36, 37, 38, 39, 40, 41, 42\nColor: White", 2399.99, 50, "SNEAK-001", "Women's Shoes", "https://images.unsplash.com/photo-1549298916-b41d501d3772?w=400&h=400&fit=crop"),
+    ("Men's Casual Shirt", "Cotton casual shirt, perfect for everyday wear\nSize: S, M, L, XL, XXL\nColor: Blue", 1399.99, 30, "SHIRT-001", "Men's Clothing", "https://images.unsplash.com/photo-1602810318383-e386cc2a3ccf?w=400&h=600&fit=crop"),
+    ("Leather Boots", "Premium leather boots for men\nSize: 40, 41, 42, 43, 44, 45\nColor: Brown", 3899.99, 20, "BOOT-001", "Men's Shoes", "https://images.unsplash.com/photo-1608256246200-53e8b47b2dc1?w=400&h=600&fit=crop"),
+    ("Traditional Ethiopian Dress", "Beautiful traditional Ethiopian habesha kemis\nSize: S, M, L, XL\nColor: White with colorful borders", 4599.99, 15, "TRAD-001", "Women's Clothing", "https://images.unsplash.com/photo-1594736797933-d0401ba2fe65?w=400&h=600&fit=crop"),
+    ("Women's High Heels", "Elegant high heel shoes for special occasions\nSize: 36, 37, 38, 39, 40\nColor: Black", 1899.99, 35, "HEEL-001", "Women's Shoes", "https://images.unsplash.com/photo-1543163521-1bf539c55dd2?w=400&h=400&fit=crop"),
+]
+
+# Options used for generated load-test products
+GENERATED_SIZES = ["XS", "S", "M", "L", "XL", "XXL", "36", "38", "40", "42"]
+GENERATED_COLORS = ["Black", "White", "Blue", "Red", "Green", "Brown"]
+GENERATED_BATCH_SIZE = 5000
+
+def migrate():
+    """Apply all pending migrations"""
+    schema.upgrade()
+    print(f"✅ Database schema is at revision {schema.current_revision()}")
+
+def seed_sample_data():
+    """Create the admin user and the sample catalog in one transaction"""
+    from app.routers.auth import get_password_hash
+
+    db = SessionLocal()
+    try:
+        if not db.query(User).filter(User.is_admin == True).first():
+            db.add(User(
+                username="admin",
+                email="admin@ecommerce.com",
+                full_name="System Administrator",
+                hashed_password=get_password_hash("admin"),
+                is_admin=True,
+                is_active=True
+            ))
+            print("✅ Admin user created: username='admin', password='admin'")
+
+        if db.query(Category).first():
+            print("✅ Sample catalog already loaded")
+            db.commit()
+            return
+
+        categories = {name: Category(name=name, description=description) for name, description in SAMPLE_CATEGORIES}
+        db.add_all(categories.values())
+
+        products = [
+            Product(
+                name=name, description=description, price_santim=to_santim(price), stock_quantity=stock,
+                sku=sku, category=categories[category], image_url=image_url
+            )
+            for name, description, price, stock, sku, category, image_url in SAMPLE_PRODUCTS
+        ]
+        db.add_all(products)
+        db.flush()  # Assigns product ids for the variants
+
+        for product in products:
+            db.add_all(build_variants_from_description(db, product))
+            db.flush()  # Later products' SKU checks see these
+
+        db.commit()
+        print(f"✅ Loaded {len(categories)} categories and {len(products)} products (prices in ETB)")
+    finally:
+        db.close()
+
+def seed_generated_products(count: int):
+    """Bulk-insert generated products with variants, in large batches of plain INSERTs"""
+    products_table = Product.__table__
+    variants_table = ProductVariant.__table__
+
+    with engine.begin() as connection:
+        category_ids = [row[0] for row in connection.execute(Category.__table__.select().with_only_columns(Category.id))]
+        next_id = (connection.execute(products_table.select().with_only_columns(products_table.c.id).order_by(products_table.c.id.desc()).limit(1)).scalar() or 0) + 1
+
+    for batch_start in range(0, count, GENERATED_BATCH_SIZE):
+        product_rows, variant_rows = [], []
+        for product_id in range(next_id + batch_start, next_id + min(batch_start + GENERATED_BATCH_SIZE, count)):
+            sizes = random.sample(GENERATED_SIZES, 3)
+            color = random.choice(GENERATED_COLORS)
+            description = f"Generated product\nSize: {', '.join(sizes)}\nColor: {color}"
+            stock = random.randint(0, 60)
+            sku = f"GEN-{product_id}"
+            product_rows.append({
+                "id": product_id,
+                "name": f"{color} item {product_id}",
+                "description": description,
+                "price_santim": random.randint(200_00, 6000_00),
+                "stock_quantity": stock,
+                "sku": sku,
+                "is_active": True,
+                "category_id": random.choice(category_ids),
+            })
+            variant_rows.extend(
+                dict(variant, product_id=product_id, is_active=True)
+                for variant in plan_variants(description, sku, stock, product_id)
+            )
+
+        # One transaction per batch keeps the database usable while seeding
+        with engine.begin() as connection:
+            connection.execute(products_table.insert(), product_rows)
+            connection.execute(variants_table.insert(), variant_rows)
+
+    print(f"✅ Generated {count} products with variants")
+
+def seed(generated_products: int = 0):
+    """Load the sample data, plus optional generated products"""
+    seed_sample_data()
+    if generated_products:
+        seed_generated_products(generated_products)
+    snapshot_store.clear()  # Rows were inserted directly, so rendered listings are out of date
+
+def reset():
+    """Delete the SQLite database file and build a fresh one"""
+    if not settings.DATABASE_URL.startswith("sqlite:///"):
+        raise SystemExit("❌ reset only works with SQLite databases")
+
+    path = settings.DATABASE_URL[len("sqlite:///"):]
+    engine.dispose()
+    if os.path.exists(path):
+        os.remove(path)
+        print("🗑️ Removed existing database")
+
+def archive(days: float, batch_size: int, pause_seconds: float, vacuum: bool):
+    """Move finished orders into the monthly archive files"""
+    archived = archive_orders(days, batch_size, pause_seconds)
+    print(f"📦 Archived {archived} orders to {settings.ORDER_ARCHIVE_DIR}")
+
+    if vacuum and settings.DATABASE_URL.startswith("sqlite"):
+        # SQLite reuses freed pages anyway, VACUUM also gives the space back to the disk
+        with engine.connect() as connection:
+            connection.exec_driver_sql("VACUUM")
+        print("🧹 Database file compacted")
+
+def build_snapshots():
+    """Render every product page and category listing ahead of the first requests"""
+    count = rebuild_all()
+    print(f"📸 Rendered snapshots of {count} products to {settings.SNAPSHOT_DIR}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Yzak Fashion Store database commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("migrate", help="Apply pending migrations")
+    make = commands.add_parser("makemigrations", help="Generate a migration from model changes")
+    make.add_argument("message")
+    commands.add_parser("status", help="Show the current and latest schema revision")
+    seed_parser = commands.add_parser("seed", help="Load sample data")
+    seed_parser.add_argument("--products", type=int, default=0, help="Also generate this many products")
+    reset_parser = commands.add_parser("reset", help="Delete the SQLite database, migrate and seed")
+    reset_parser.add_argument("--products", type=int, default=0, help="Also generate this many products")
+    archive_parser = commands.add_parser("archive-orders", help="Move old delivered/cancelled orders to the order archive")
+    archive_parser.add_argument("--days", type=float, default=settings.ORDER_ARCHIVE_AFTER_DAYS, help="Archive orders older than this many days")
+    archive_parser.add_argument("--batch-size", type=int, default=settings.ORDER_ARCHIVE_BATCH_SIZE, help="Orders moved per transaction")
+    archive_parser.add_argument("--pause", type=float, default=0.0, help="Seconds to wait between batches")
+    archive_parser.add_argument("--vacuum", action="store_true", help="Compact the SQLite file afterwards")
+    commands.add_parser("snapshots", help="Pre-render every product page and category listing")
+
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        migrate()
+    elif args.command == "makemigrations":
+        schema.make_migration(args.message)
+    elif args.command == "status":
+        print(f"Current revision: {schema.current_revision()}")
+        print(f"Latest revision:  {schema.head_revision()}")
+    elif args.command == "seed":
+        seed(args.products)
+    elif args.command == "reset":
+        reset()
+        migrate()
+        seed(args.products)
+    elif args.command == "archive-orders":
+        archive(args.days, args.batch_size, args.pause, args.vacuum)
+    elif args.command == "snapshots":
+        build_snapshots()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Alembic environment - connects migrations to the app's database and models
+"""
+from alembic import context
+
+from app.config import settings
+from app.database import Base, engine
+from app.models import user, product, order, idempotency  # Register all tables for autogenerate
+
+config = context.config
+
+# Autogenerate compares the database with these models
+target_metadata = Base.metadata
+
+def run_migrations_offline():
+    """Print the migration SQL instead of running it (alembic upgrade --sql)"""
+    context.configure(
+        url=settings.DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        render_as_batch=True
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    """Run migrations against the configured database"""
+    with engine.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            # SQLite can't ALTER most things, batch mode rebuilds tables instead
+            render_as_batch=True,
+            # Each migration commits on its own, so long backfills don't hold one big lock
+            transaction_per_migration=True
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,74 @@
+"""
+Helpers shared by the migration scripts
+The *_if_missing helpers let the first migrations adopt databases created by the
+old init_db.py or by create_all, where some tables and indexes already exist.
+backfill_in_batches runs data migrations online, in small separately committed chunks.
+"""
+import time
+from typing import Callable
+
+import sqlalchemy as sa
+from alembic import op
+
+def table_exists(table: str) -> bool:
+    return table in sa.inspect(op.get_bind()).get_table_names()
+
+def column_exists(table: str, column: str) -> bool:
+    return column in [c["name"] for c in sa.inspect(op.get_bind()).get_columns(table)]
+
+def index_exists(table: str, index: str) -> bool:
+    return index in [i["name"] for i in sa.inspect(op.get_bind()).get_indexes(table)]
+
+def create_table_if_missing(table: str, *columns, **kwargs):
+    if not table_exists(table):
+        op.create_table(table, *columns, **kwargs)
+
+def create_index_if_missing(index: str, table: str, columns: list, unique: bool = False):
+    if not index_exists(table, index):
+        op.create_index(index, table, columns, unique=unique)
+
+def add_column_if_missing(table: str, column: sa.Column):
+    # Plain ADD COLUMN - no table rebuild, so it is instant even on big tables
+    if column_exists(table, column.name):
+        return
+
+    bind = op.get_bind()
+    if bind.dialect.name == "sqlite" and column.foreign_keys:
+        # SQLite accepts REFERENCES in ADD COLUMN, Alembic would only do it with a table rebuild
+        target_table, target_column = next(iter(column.foreign_keys)).target_fullname.split(".")
+        op.execute(
+            f"ALTER TABLE {table} ADD COLUMN {column.name} {column.type.compile(bind.dialect)} "
+            f"REFERENCES {target_table} ({target_column})"
+        )
+    else:
+        op.add_column(table, column)
+
+def backfill_in_batches(
+    select_batch: Callable,
+    apply_batch: Callable,
+    batch_size: int = 500,
+    pause_seconds: float = 0.0
+) -> int:
+    """
+    Run a data migration in small chunks, walking the primary key
+    select_batch(connection, last_id, batch_size) returns the next rows (first column is the id),
+    apply_batch(connection, rows) writes the changes for them. Every statement commits on
+    its own short transaction, so the app's writers only ever wait for one chunk,
+    never for the whole backfill. Returns the number of rows processed.
+    """
+    processed = 0
+    last_id = 0
+    # Commit the migration's own transaction first, then use one transaction per chunk
+    with op.get_context().autocommit_block():
+        engine = op.get_bind().engine
+        while True:
+            with engine.begin() as connection:
+                rows = select_batch(connection, last_id, batch_size)
+                if not rows:
+                    break
+                apply_batch(connection, rows)
+            processed += len(rows)
+            last_id = rows[-1][0]
+            if pause_seconds:
+                time.sleep(pause_seconds)  # Give other writers a turn
+    return processed
@@ -0,0 +1,101 @@
+"""Initial schema: users, categories, products, orders and order items
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+
+Databases created by the old init_db.py or by create_all already have these
+tables, so only what is missing is created.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import create_table_if_missing, create_index_if_missing
+
+# Revision identifiers, used by Alembic
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+ORDER_STATUSES = ("PENDING", "CONFIRMED", "SHIPPED", "DELIVERED", "CANCELLED")
+
+def upgrade():
+    create_table_if_missing(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("email", sa.String(), nullable=False),
+        sa.Column("username", sa.String(), nullable=False),
+        sa.Column("hashed_password", sa.String(), nullable=False),
+        sa.Column("full_name", sa.String()),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("is_admin", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+    )
+    create_index_if_missing("ix_users_id", "users", ["id"])
+    create_index_if_missing("ix_users_email", "users", ["email"], unique=True)
+    create_index_if_missing("ix_users_username", "users", ["username"], unique=True)
+
+    create_table_if_missing(
+        "categories",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("description", sa.Text()),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    create_index_if_missing("ix_categories_id", "categories", ["id"])
+    create_index_if_missing("ix_categories_name", "categories", ["name"], unique=True)
+
+    create_table_if_missing(
+        "products",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("description", sa.Text()),
+        sa.Column("price", sa.Float(), nullable=False),
+        sa.Column("stock_quantity", sa.Integer()),
+        sa.Column("sku", sa.String()),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("image_url", sa.String()),
+        sa.Column("category_id", sa.Integer(), sa.ForeignKey("categories.id")),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+    )
+    create_index_if_missing("ix_products_id", "products", ["id"])
+    create_index_if_missing("ix_products_name", "products", ["name"])
+    create_index_if_missing("ix_products_sku", "products", ["sku"], unique=True)
+
+    create_table_if_missing(
+        "orders",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("order_number", sa.String(), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("total_amount", sa.Float(), nullable=False),
+        sa.Column("status", sa.Enum(*ORDER_STATUSES, name="orderstatus")),
+        sa.Column("shipping_address", sa.String(), nullable=False),
+        sa.Column("shipping_city", sa.String(), nullable=False),
+        sa.Column("shipping_postal_code", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+    )
+    create_index_if_missing("ix_orders_id", "orders", ["id"])
+    create_index_if_missing("ix_orders_order_number", "orders", ["order_number"], unique=True)
+
+    create_table_if_missing(
+        "order_items",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("order_id", sa.Integer(), sa.ForeignKey("orders.id"), nullable=False),
+        sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id"), nullable=False),
+        sa.Column("quantity", sa.Integer(), nullable=False),
+        sa.Column("unit_price", sa.Float(), nullable=False),
+        sa.Column("total_price", sa.Float(), nullable=False),
+    )
+    create_index_if_missing("ix_order_items_id", "order_items", ["id"])
+
+def downgrade():
+    op.drop_table("order_items")
+    op.drop_table("orders")
+    op.drop_table("products")
+    op.drop_table("categories")
+    op.drop_table("users")
@@ -0,0 +1,35 @@
+"""Idempotency keys for safe order retries
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import create_table_if_missing, create_index_if_missing
+
+# Revision identifiers, used by Alembic
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    create_table_if_missing(
+        "idempotency_keys",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("key", sa.String(), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("request_fingerprint", sa.String(), nullable=False),
+        sa.Column("response_status", sa.Integer()),
+        sa.Column("response_body", sa.Text()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.UniqueConstraint("user_id", "key", name="uq_idempotency_user_key"),
+    )
+    create_index_if_missing("ix_idempotency_keys_id", "idempotency_keys", ["id"])
+    create_index_if_missing("ix_idempotency_keys_expires_at", "idempotency_keys", ["expires_at"])
+
+def downgrade():
+    op.drop_table("idempotency_keys")
@@ -0,0 +1,156 @@
+"""Product variants, with sizes and colors backfilled from product descriptions
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import (
+    create_table_if_missing, create_index_if_missing, add_column_if_missing, backfill_in_batches
+)
+
+# Revision identifiers, used by Alembic
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+product_variants = sa.table(
+    "product_variants",
+    sa.column("product_id", sa.Integer),
+    sa.column("size", sa.String),
+    sa.column("color", sa.String),
+    sa.column("sku", sa.String),
+    sa.column("stock_quantity", sa.Integer),
+    sa.column("is_active", sa.Boolean),
+)
+
+# Frozen copy of app.services.variants.plan_variants as of this revision, so later
+# changes to the app's parsing don't change what this migration does
+_OPTION_LINE = re.compile(r"^\s*(size|sizes|color|colors|colour|colours)\s*:\s*(.+?)\s*$", re.IGNORECASE | re.MULTILINE)
+
+def _normalize_size(size):
+    if size is None or not size.strip():
+        return None
+    return " ".join(size.split()).upper()
+
+def _normalize_color(color):
+    if color is None or not color.strip():
+        return None
+    color = " ".join(color.split()).lower()
+    return color[0].upper() + color[1:]
+
+def _parse_variant_options(description):
+    sizes, colors = [], []
+    for label, values in _OPTION_LINE.findall(description or ""):
+        target = sizes if label.lower().startswith("size") else colors
+        normalize = _normalize_size if target is sizes else _normalize_color
+        for value in values.split(","):
+            value = normalize(value)
+            if value and value not in target:
+                target.append(value)
+    return sizes, colors
+
+def _variant_sku(product_sku, product_id, size, color):
+    parts = [product_sku or f"P{product_id}"]
+    for option in (size, color):
+        if option:
+            parts.append(re.sub(r"[^A-Z0-9]+", "", option.upper())[:12])
+    return "-".join(parts)
+
+def _unique_skus(skus, stored):
+    """Number repeated SKUs (-2, -3, ...), so none repeats another or one stored(candidates) returns"""
+    skus = list(skus)
+    taken = set(stored(skus)) if skus else set()
+    unique = []
+    for sku in skus:
+        candidate, number = sku, 1
+        while candidate in taken:
+            number += 1
+            candidate = f"{sku}-{number}"
+            taken |= stored([candidate])
+        taken.add(candidate)
+        unique.append(candidate)
+    return unique
+
+def plan_variants(description, product_sku, stock_quantity, product_id=None, stored=lambda _: set()):
+    """Variant rows for each size/color combination in a description, stock split evenly"""
+    sizes, colors = _parse_variant_options(description)
+    if not sizes and not colors:
+        return []
+
+    combinations = [(size, color) for size in (sizes or [None]) for color in (colors or [None])]
+    share, remainder = divmod(stock_quantity or 0, len(combinations))
+    skus = _unique_skus((_variant_sku(product_sku, product_id, size, color) for size, color in combinations), stored)
+
+    return [
+        {
+            "size": size,
+            "color": color,
+            "sku": sku,
+            "stock_quantity": share + (1 if position < remainder else 0),
+        }
+        for position, ((size, color), sku) in enumerate(zip(combinations, skus))
+    ]
+
+def _select_products(connection, last_id, batch_size):
+    # Only products without variants, so a re-run after an interruption continues where it stopped
+    return connection.execute(sa.text(
+        "SELECT id, description, sku, stock_quantity FROM products "
+        "WHERE id > :last_id AND id NOT IN (SELECT product_id FROM product_variants) "
+        "ORDER BY id LIMIT :batch_size"
+    ), {"last_id": last_id, "batch_size": batch_size}).fetchall()
+
+def _insert_variants(connection, rows):
+    planned = set()
+
+    # SKUs are unique across products too (ix_product_variants_sku): check the table and this batch
+    def stored(skus):
+        found = {row[0] for row in connection.execute(
+            sa.select(product_variants.c.sku).where(product_variants.c.sku.in_(skus))
+        )}
+        return found | (planned & set(skus))
+
+    new_variants = []
+    for product_id, description, sku, stock_quantity in rows:
+        for variant in plan_variants(description, sku, stock_quantity, product_id, stored):
+            planned.add(variant["sku"])
+            new_variants.append(dict(variant, product_id=product_id, is_active=True))
+    if new_variants:
+        connection.execute(product_variants.insert(), new_variants)
+
+def upgrade():
+    create_table_if_missing(
+        "product_variants",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id"), nullable=False),
+        sa.Column("size", sa.String()),
+        sa.Column("color", sa.String()),
+        sa.Column("sku", sa.String()),
+        sa.Column("stock_quantity", sa.Integer()),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+        sa.UniqueConstraint("product_id", "size", "color", name="uq_variant_product_size_color"),
+    )
+    create_index_if_missing("ix_product_variants_id", "product_variants", ["id"])
+    create_index_if_missing("ix_product_variants_product_id", "product_variants", ["product_id"])
+    create_index_if_missing("ix_product_variants_sku", "product_variants", ["sku"], unique=True)
+    create_index_if_missing("ix_variants_size_color_product", "product_variants", ["size", "color", "product_id"])
+    create_index_if_missing("ix_variants_color_product", "product_variants", ["color", "product_id"])
+
+    add_column_if_missing(
+        "order_items",
+        sa.Column("variant_id", sa.Integer(), sa.ForeignKey("product_variants.id"))
+    )
+
+    backfill_in_batches(_select_products, _insert_variants)
+
+def downgrade():
+    with op.batch_alter_table("order_items") as batch:
+        batch.drop_column("variant_id")
+    op.drop_table("product_variants")
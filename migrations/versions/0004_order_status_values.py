@@ -0,0 +1,49 @@
+"""Store order statuses as enum names
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+
+The old init_db.py created orders.status as VARCHAR DEFAULT 'pending', but the
+Order model maps Enum(OrderStatus), which stores names like 'PENDING'. Rows with
+lowercase values can't be loaded, so they are rewritten in small batches, and the
+column default becomes 'PENDING' so rows inserted outside the ORM load too.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import backfill_in_batches
+
+# Revision identifiers, used by Alembic
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+def _select_orders(connection, last_id, batch_size):
+    return connection.execute(sa.text(
+        "SELECT id FROM orders WHERE id > :last_id AND status != UPPER(status) "
+        "ORDER BY id LIMIT :batch_size"
+    ), {"last_id": last_id, "batch_size": batch_size}).fetchall()
+
+def _uppercase_status(connection, rows):
+    connection.execute(
+        sa.text("UPDATE orders SET status = UPPER(status) WHERE id = :id"),
+        [{"id": row[0]} for row in rows]
+    )
+
+def _status_column():
+    columns = sa.inspect(op.get_bind()).get_columns("orders")
+    return next(column for column in columns if column["name"] == "status")
+
+def upgrade():
+    backfill_in_batches(_select_orders, _uppercase_status)
+
+    # Only the old init_db.py schema has a default; SQLite needs a table rebuild to change it
+    status = _status_column()
+    if status["default"] is not None and status["default"] != status["default"].upper():
+        with op.batch_alter_table("orders") as batch:
+            batch.alter_column("status", existing_type=status["type"], server_default="PENDING")
+
+def downgrade():
+    pass  # Uppercase names are what the model has always expected
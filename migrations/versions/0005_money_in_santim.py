@@ -0,0 +1,75 @@
+"""Store money as integer santim instead of floats
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+
+Float prices can't represent most Birr amounts exactly, so order totals drifted by
+fractions of a santim. The new *_santim columns are added and filled in batches
+while the app keeps running, then the float columns are dropped with a table rebuild.
+
+Not an online migration: each rebuild holds the write lock while the table is copied
+(about 1.5 s for 400,000 order_items rows), and the old app can't insert into the
+rebuilt tables. Stop the old app, migrate, then start the new one.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import add_column_if_missing, backfill_in_batches, column_exists
+
+# Revision identifiers, used by Alembic
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+# (table, float column, santim column)
+MONEY_COLUMNS = [
+    ("products", "price", "price_santim"),
+    ("orders", "total_amount", "total_amount_santim"),
+    ("order_items", "unit_price", "unit_price_santim"),
+    ("order_items", "total_price", "total_price_santim"),
+]
+
+def _backfill_santim(table, float_column, santim_column):
+    def select_batch(connection, last_id, batch_size):
+        # Only unconverted rows, so a re-run after an interruption continues where it stopped
+        return connection.execute(sa.text(
+            f"SELECT id FROM {table} WHERE id > :last_id AND {santim_column} IS NULL "
+            f"ORDER BY id LIMIT :batch_size"
+        ), {"last_id": last_id, "batch_size": batch_size}).fetchall()
+
+    def apply_batch(connection, rows):
+        connection.execute(
+            sa.text(f"UPDATE {table} SET {santim_column} = CAST(ROUND({float_column} * 100) AS INTEGER) WHERE id = :id"),
+            [{"id": row[0]} for row in rows]
+        )
+
+    backfill_in_batches(select_batch, apply_batch)
+
+def upgrade():
+    for table, float_column, santim_column in MONEY_COLUMNS:
+        add_column_if_missing(table, sa.Column(santim_column, sa.Integer()))
+        if column_exists(table, float_column):
+            _backfill_santim(table, float_column, santim_column)
+
+    for table in ("products", "orders", "order_items"):
+        with op.batch_alter_table(table) as batch:
+            for column_table, float_column, santim_column in MONEY_COLUMNS:
+                if column_table != table:
+                    continue
+                if column_exists(table, float_column):
+                    batch.drop_column(float_column)
+                batch.alter_column(santim_column, existing_type=sa.Integer(), nullable=False)
+
+def downgrade():
+    for table, float_column, santim_column in MONEY_COLUMNS:
+        op.add_column(table, sa.Column(float_column, sa.Float()))
+        op.execute(f"UPDATE {table} SET {float_column} = {santim_column} / 100.0")
+
+    for table in ("products", "orders", "order_items"):
+        with op.batch_alter_table(table) as batch:
+            for column_table, float_column, santim_column in MONEY_COLUMNS:
+                if column_table == table:
+                    batch.drop_column(santim_column)
+                    batch.alter_column(float_column, existing_type=sa.Float(), nullable=False)
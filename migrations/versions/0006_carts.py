@@ -0,0 +1,31 @@
+"""Server-side shopping carts
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import create_table_if_missing, create_index_if_missing
+
+# Revision identifiers, used by Alembic
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    create_table_if_missing(
+        "carts",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False, unique=True),
+        sa.Column("items", sa.Text(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), server_default=sa.func.now()),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+    )
+    create_index_if_missing("ix_carts_id", "carts", ["id"])
+    create_index_if_missing("ix_carts_expires_at", "carts", ["expires_at"])
+
+def downgrade():
+    op.drop_table("carts")
@@ -0,0 +1,40 @@
+"""Order archive index and archived sales rollup
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import create_table_if_missing, create_index_if_missing
+
+# Revision identifiers, used by Alembic
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    create_table_if_missing(
+        "archived_orders",
+        sa.Column("order_id", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("order_number", sa.String(), nullable=False, unique=True),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True)),
+        sa.Column("partition", sa.String(), nullable=False),
+        sa.Column("archived_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    create_index_if_missing("ix_archived_orders_created_at", "archived_orders", ["created_at"])
+    create_index_if_missing("ix_archived_orders_user_created", "archived_orders", ["user_id", "created_at"])
+
+    create_table_if_missing(
+        "archived_product_sales",
+        sa.Column("product_id", sa.Integer(), primary_key=True, autoincrement=False),
+        sa.Column("units_sold", sa.Integer(), nullable=False),
+        sa.Column("revenue_santim", sa.Integer(), nullable=False),
+    )
+
+def downgrade():
+    op.drop_table("archived_product_sales")
+    op.drop_table("archived_orders")
@@ -0,0 +1,43 @@
+"""Refresh tokens and revoked token ids
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import create_table_if_missing, create_index_if_missing
+
+# Revision identifiers, used by Alembic
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    create_table_if_missing(
+        "refresh_tokens",
+        sa.Column("jti", sa.String(), primary_key=True),
+        sa.Column("family", sa.String(), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now()),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.Column("used_at", sa.DateTime()),
+        sa.Column("revoked_at", sa.DateTime()),
+    )
+    create_index_if_missing("ix_refresh_tokens_family", "refresh_tokens", ["family"])
+    create_index_if_missing("ix_refresh_tokens_expires_at", "refresh_tokens", ["expires_at"])
+
+    create_table_if_missing(
+        "revoked_tokens",
+        sa.Column("token_id", sa.String(), primary_key=True),
+        sa.Column("revoked_at", sa.DateTime(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+    )
+    create_index_if_missing("ix_revoked_tokens_revoked_at", "revoked_tokens", ["revoked_at"])
+    create_index_if_missing("ix_revoked_tokens_expires_at", "revoked_tokens", ["expires_at"])
+
+def downgrade():
+    op.drop_table("revoked_tokens")
+    op.drop_table("refresh_tokens")
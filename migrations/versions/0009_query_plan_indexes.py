@@ -0,0 +1,29 @@
+"""Indexes for the product, order and order item filters
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19
+"""
+from alembic import op
+
+from migrations.helpers import create_index_if_missing
+
+# Revision identifiers, used by Alembic
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    create_index_if_missing("ix_products_category_id", "products", ["category_id"])
+    create_index_if_missing("ix_products_active_stock", "products", ["is_active", "stock_quantity"])
+    create_index_if_missing("ix_orders_created_at", "orders", ["created_at"])
+    create_index_if_missing("ix_orders_user_created", "orders", ["user_id", "created_at"])
+    create_index_if_missing("ix_order_items_order_id", "order_items", ["order_id"])
+
+def downgrade():
+    op.drop_index("ix_order_items_order_id", table_name="order_items")
+    op.drop_index("ix_orders_user_created", table_name="orders")
+    op.drop_index("ix_orders_created_at", table_name="orders")
+    op.drop_index("ix_products_active_stock", table_name="products")
+    op.drop_index("ix_products_category_id", table_name="products")
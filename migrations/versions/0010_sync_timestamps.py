@@ -0,0 +1,50 @@
+"""updated_at on insert and indexes for the delta sync endpoints
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19
+
+The admin page syncs products, categories and orders with ?updated_since=. Until now
+updated_at was only set when a row changed, so it is filled from created_at for existing
+rows (in batches, while the app keeps running) and categories get the column too.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import add_column_if_missing, backfill_in_batches, create_index_if_missing
+
+# Revision identifiers, used by Alembic
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+SYNCED_TABLES = ["products", "categories", "orders"]
+
+def _backfill_updated_at(table):
+    def select_batch(connection, last_id, batch_size):
+        return connection.execute(sa.text(
+            f"SELECT id FROM {table} WHERE id > :last_id AND updated_at IS NULL ORDER BY id LIMIT :batch_size"
+        ), {"last_id": last_id, "batch_size": batch_size}).fetchall()
+
+    def apply_batch(connection, rows):
+        connection.execute(
+            sa.text(f"UPDATE {table} SET updated_at = COALESCE(created_at, CURRENT_TIMESTAMP) WHERE id = :id"),
+            [{"id": row[0]} for row in rows]
+        )
+
+    backfill_in_batches(select_batch, apply_batch)
+
+def upgrade():
+    add_column_if_missing("categories", sa.Column("updated_at", sa.DateTime(timezone=True)))
+    for table in SYNCED_TABLES:
+        _backfill_updated_at(table)
+        create_index_if_missing(f"ix_{table}_updated_at", table, ["updated_at"])
+    create_index_if_missing("ix_archived_orders_archived_at", "archived_orders", ["archived_at"])
+
+def downgrade():
+    op.drop_index("ix_archived_orders_archived_at", table_name="archived_orders")
+    for table in SYNCED_TABLES:
+        op.drop_index(f"ix_{table}_updated_at", table_name=table)
+    with op.batch_alter_table("categories") as batch:
+        batch.drop_column("updated_at")
@@ -0,0 +1,25 @@
+"""Index for category listings in id order
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19
+
+Product snapshots patch a changed product into the listing page that holds it, which
+needs the product's position among the category's active products. SQLite keeps the
+row id in every index, so (category_id, is_active) answers that count from the index.
+"""
+from alembic import op
+
+from migrations.helpers import create_index_if_missing
+
+# Revision identifiers, used by Alembic
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    create_index_if_missing("ix_products_category_active", "products", ["category_id", "is_active"])
+
+def downgrade():
+    op.drop_index("ix_products_category_active", table_name="products")